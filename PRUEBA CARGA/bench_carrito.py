@@ -0,0 +1,182 @@
+"""Concurrency benchmark for add-to-cart: bursts of clicks on the same product.
+
+Creates a "[seed]" product and --compradores users with empty carts. Then
+it releases --clicks threads per buyer at the same instant, and each
+thread adds --cantidad units of the product to its buyer's cart once.
+This is the double- and triple-click case:
+
+    python bench_carrito.py --project /path/to/django/project --settings tienda.settings \\
+        --compradores 10 --clicks 20 --stock 15
+
+It reports clicks accepted, refused for lack of stock and failed on a
+lock, along with the click throughput and p50/p99 latency. It then checks
+that no click was lost or doubled: every cart holds one row for the
+product, its quantity is exactly the units of its accepted clicks, and
+that quantity is within the stock. A click that fails on a lock is a
+click the user sees fail, so lock errors fail the run as well. The exit
+status is non-zero when a check fails.
+
+The add measured is shop.carrito_atomico.agregar_item, or the copy in
+tienda_parches/. --ingenuo runs the usual get_or_create, add and save()
+instead, to show the lost updates. Setup, cleanup and the SQLite notes
+are the same as for bench_checkout.py.
+"""
+import argparse
+import collections
+import importlib
+import os
+import random
+import sys
+import threading
+import time
+
+from bench_checkout import clear_buyers, load_parche, percentile, setup
+from seed_data import FieldFiller
+
+
+def load_add():
+    """(add function, out-of-stock and locked exceptions) from shop.carrito_atomico, else the local copy."""
+    try:
+        module = importlib.import_module('shop.carrito_atomico')
+    except ImportError:
+        module = load_parche('carrito_atomico')
+    return module.agregar_item, module.CantidadNoDisponible, module.CarritoOcupado
+
+
+def naive_add(out_of_stock):
+    """Read the item, add in Python, save the whole row: concurrent clicks overwrite each other."""
+    from django.apps import apps
+    shop = apps.get_app_config('shop')
+    Producto, ItemCarrito = shop.get_model('Producto'), shop.get_model('ItemCarrito')
+
+    def add(carrito, producto_id, cantidad):
+        producto = Producto.objects.get(pk=producto_id)
+        item, _ = ItemCarrito.objects.get_or_create(carrito_id=carrito, producto=producto,
+                                                    defaults={'cantidad': 0})
+        if item.cantidad + cantidad > producto.stock:
+            raise out_of_stock(producto_id, producto.stock)
+        item.cantidad += cantidad
+        item.save()
+    return add
+
+
+def run(opts, add, out_of_stock, locked, carritos, producto, ItemCarrito):
+    from django.db import OperationalError, connections
+    # One unmeasured click fills the per-process caches (e.g. whether the upsert index exists)
+    add(carritos[0], producto.pk, 1)
+    ItemCarrito.objects.filter(carrito_id=carritos[0]).delete()
+    barrier = threading.Barrier(len(carritos) * opts.clicks)
+    results = []
+    errors = []
+    lock = threading.Lock()
+
+    def click(carrito):
+        outcome = 'error'
+        started = time.perf_counter()
+        try:
+            barrier.wait()
+            started = time.perf_counter()
+            add(carrito, producto.pk, opts.cantidad)
+            outcome = 'ok'
+        except out_of_stock:
+            outcome = 'agotado'
+        except (locked, OperationalError):
+            outcome = 'bloqueo'
+        except Exception as exc:
+            # the naive add also fails with MultipleObjectsReturned once rows are duplicated
+            errors.append(exc)
+        finally:
+            with lock:
+                results.append((carrito, outcome, (time.perf_counter() - started) * 1000))
+            connections.close_all()
+
+    threads = [threading.Thread(target=click, args=(carrito,)) for carrito in carritos for _ in range(opts.clicks)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        print(f'  {len(errors)} clicks failed, first error: {errors[0]!r}')
+    return results, elapsed
+
+
+def report(opts, results, elapsed, carritos, producto, ItemCarrito):
+    counts = collections.Counter(outcome for _, outcome, _ in results)
+    accepted = collections.Counter(carrito for carrito, outcome, _ in results if outcome == 'ok')
+    latencies = sorted(ms for _, _, ms in results)
+    rows = collections.defaultdict(list)
+    for carrito, cantidad in (ItemCarrito.objects.filter(carrito_id__in=carritos, producto=producto)
+                              .values_list('carrito_id', 'cantidad')):
+        rows[carrito].append(cantidad)
+
+    print(f'{len(carritos)} carts x {opts.clicks} clicks of {opts.cantidad} unit(s), stock {producto.stock}, '
+          f'{"naive" if opts.ingenuo else "atomic"} add, {elapsed:.2f}s')
+    print(f'  accepted {counts["ok"]}  out of stock {counts["agotado"]}  lock errors {counts["bloqueo"]}  '
+          f'other errors {counts["error"]}')
+    print(f'  throughput {len(results) / elapsed:.1f} clicks/s')
+    print(f'  latency p50 {percentile(latencies, 50):.1f} ms  p99 {percentile(latencies, 99):.1f} ms')
+
+    duplicated = [carrito for carrito in carritos if len(rows[carrito]) > 1]
+    lost = [carrito for carrito in carritos if sum(rows[carrito]) != accepted[carrito] * opts.cantidad]
+    over = [carrito for carrito in carritos if sum(rows[carrito]) > producto.stock]
+    clicks = len(carritos) * opts.clicks
+    checks = [
+        (len(results) == clicks, f'{len(results)} results for {clicks} clicks'),
+        (not duplicated, f'{len(duplicated)} carts with more than one row for the product'),
+        (not lost, f'{len(lost)} carts whose quantity differs from their accepted clicks'),
+        (not over, f'{len(over)} carts over the stock'),
+        (not counts['bloqueo'], f'{counts["bloqueo"]} clicks failed on a lock'),
+        (not counts['error'], f'{counts["error"]} clicks failed with other errors'),
+    ]
+    for passed, text in checks:
+        print(f'  [{"ok" if passed else "FAIL"}] {text}')
+    return all(passed for passed, _ in checks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent add-to-cart benchmark for the shop app.')
+    parser.add_argument('--project', default='.', help='directory that contains the Django project')
+    parser.add_argument('--settings', help='settings module (default: $DJANGO_SETTINGS_MODULE)')
+    parser.add_argument('--app', default='shop', help='app label of the shop models')
+    parser.add_argument('--stock', type=int, default=15, help='units of the product')
+    parser.add_argument('--compradores', type=int, default=10, help='carts clicked at the same time')
+    parser.add_argument('--clicks', type=int, default=20, help='simultaneous clicks per cart')
+    parser.add_argument('--cantidad', type=int, default=1, help='units added by each click')
+    parser.add_argument('--ingenuo', action='store_true', help='measure a read-add-save add instead')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--keep', action='store_true', help='leave the created rows in place')
+    opts = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(opts.project))
+    if opts.settings:
+        os.environ['DJANGO_SETTINGS_MODULE'] = opts.settings
+    if not os.environ.get('DJANGO_SETTINGS_MODULE'):
+        parser.error('pass --settings or set DJANGO_SETTINGS_MODULE')
+    import django
+    django.setup()
+    from django.apps import apps
+    from django.contrib.auth import get_user_model
+
+    models_by_name = {m.__name__: m for m in apps.get_app_config(opts.app).get_models()}
+    User = get_user_model()
+    add, out_of_stock, locked = load_add()
+    if opts.ingenuo:
+        add = naive_add(out_of_stock)
+
+    clear_buyers(models_by_name, User)
+    producto, buyers = setup(opts, models_by_name, User, FieldFiller(random.Random(opts.seed)), with_items=False)
+    try:
+        carritos = list(models_by_name['Carrito'].objects.filter(usuario__in=buyers).values_list('pk', flat=True))
+        results, elapsed = run(opts, add, out_of_stock, locked, carritos, producto,
+                               models_by_name['ItemCarrito'])
+        passed = report(opts, results, elapsed, carritos, producto, models_by_name['ItemCarrito'])
+    finally:
+        if not opts.keep:
+            clear_buyers(models_by_name, User)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
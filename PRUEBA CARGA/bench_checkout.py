@@ -0,0 +1,261 @@
+"""Concurrency benchmark for checkout: many buyers, one bottle-short product.
+
+Creates a "[seed]" product with --stock units and --compradores users that
+each have --cantidad of it in their cart. Then it releases one thread per
+buyer at the same instant, and each thread runs the checkout once.
+--clicks N starts N threads per buyer instead, for the same buyer
+confirming twice (a double click):
+
+    python bench_checkout.py --project /path/to/django/project --settings tienda.settings \\
+        --stock 10 --compradores 50 --clicks 2
+
+It reports how many checkouts succeeded, ran out of stock or hit a lock
+error, along with the checkout throughput and p50/p99 latency. It then
+checks that nothing was oversold: successful checkouts never exceed the
+stock, the final stock equals the initial stock minus the units sold, and
+there is exactly one Pedido per successful checkout and never more than
+one per buyer. The exit status is
+non-zero when a check fails, so the benchmark can gate CI.
+
+The checkout measured is shop.checkout_atomico.confirmar_pedido, or the
+copy in tienda_parches/ when the shop does not have it yet. --ingenuo
+runs a read-check-save checkout instead, the usual way a view gets it
+wrong, to show the overselling this guards against.
+The rows the benchmark creates are deleted when it finishes. Buyers are
+named seed_compra_<n>, so seed_data.py --clear also removes leftovers.
+
+Run it against the database the shop really uses. A checkout that fails
+with a lock error is a failed purchase, so lock errors fail the run too.
+On SQLite that means OPTIONS={'transaction_mode': 'IMMEDIATE',
+'timeout': 20}, which makes writers wait for the lock instead of failing.
+"""
+import argparse
+import importlib
+import os
+import random
+import sys
+import threading
+import time
+
+from seed_data import SEED_MARK, SEED_PASSWORD, SEED_PREFIX, FieldFiller
+
+BUYER_PREFIX = f'{SEED_PREFIX}compra_'
+# the drop-in shop modules, used when the shop does not have them yet
+PARCHES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tienda_parches')
+PRODUCT_NAME = f'{SEED_MARK} Bench checkout'
+
+
+def load_parche(name):
+    """tienda_parches.<name>, imported as a package so its relative imports work."""
+    sys.path.insert(0, os.path.dirname(PARCHES))
+    return importlib.import_module(f'{os.path.basename(PARCHES)}.{name}')
+
+
+def load_checkout(path):
+    """(checkout function, out-of-stock exception) from a dotted path, else from the local copy."""
+    module_name, _, function = path.rpartition('.')
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError:
+        module = load_parche('checkout_atomico')
+        function = 'confirmar_pedido'
+    return getattr(module, function), module.StockInsuficiente, module.CarritoVacio
+
+
+def naive_checkout(out_of_stock, empty_cart):
+    """Read the stock, check it in Python, then save it: two buyers can both see the last unit."""
+    from django.apps import apps
+    from django.db import transaction
+    shop = apps.get_app_config('shop')
+    ItemCarrito, Pedido = shop.get_model('ItemCarrito'), shop.get_model('Pedido')
+
+    def checkout(usuario, **campos_pedido):
+        items = list(ItemCarrito.objects.filter(carrito__usuario=usuario).select_related('producto'))
+        if not items:
+            raise empty_cart()
+        for item in items:
+            if item.producto.stock < item.cantidad:
+                raise out_of_stock(item.producto)
+        if 'total' in {field.name for field in Pedido._meta.concrete_fields}:
+            campos_pedido.setdefault('total', sum(item.producto.precio * item.cantidad for item in items))
+        with transaction.atomic():
+            for item in items:
+                item.producto.stock -= item.cantidad
+                item.producto.save(update_fields=['stock'])
+            pedido = Pedido.objects.create(usuario=usuario, **campos_pedido)
+            ItemCarrito.objects.filter(pk__in=[item.pk for item in items]).delete()
+        return pedido
+    return checkout
+
+
+def clear_buyers(models_by_name, user_model):
+    """Delete the benchmark's buyers with their carts and pedidos, then its product."""
+    buyers = user_model.objects.filter(username__startswith=BUYER_PREFIX)
+    for name in ('Pedido', 'Carrito'):
+        model = models_by_name.get(name)
+        if model:
+            model.objects.filter(usuario__in=buyers).delete()
+    buyers.delete()
+    models_by_name['Producto'].objects.filter(nombre=PRODUCT_NAME).delete()
+
+
+def setup(opts, models_by_name, user_model, filler, with_items=True):
+    from django.contrib.auth.hashers import make_password
+    from django.db import transaction
+    Producto, Carrito, ItemCarrito = (models_by_name[name] for name in ('Producto', 'Carrito', 'ItemCarrito'))
+    password = make_password(SEED_PASSWORD)
+    with transaction.atomic():
+        producto = filler.fill(Producto, {'nombre': PRODUCT_NAME, 'descripcion': 'Benchmark',
+                                          'precio': 50000, 'stock': opts.stock}, 0)
+        producto.save()
+        user_model.objects.bulk_create([
+            user_model(username=f'{BUYER_PREFIX}{n}', password=password) for n in range(opts.compradores)])
+        # re-read: bulk_create only returns primary keys on some databases
+        buyers = list(user_model.objects.filter(username__startswith=BUYER_PREFIX).order_by('pk'))
+        Carrito.objects.bulk_create([Carrito(usuario=buyer) for buyer in buyers])
+        if with_items:
+            ItemCarrito.objects.bulk_create([
+                ItemCarrito(carrito=carrito, producto=producto, cantidad=opts.cantidad)
+                for carrito in Carrito.objects.filter(usuario__in=buyers)])
+    return producto, buyers
+
+
+def pedido_fields(Pedido, filler):
+    """Values for the Pedido fields the checkout does not fill itself."""
+    return {field.name: filler.value(field, 0)
+            for field in filler.required_fields(Pedido, {'usuario', 'total'}) if not field.is_relation}
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def run(opts, checkout, out_of_stock, empty_cart, buyers, campos_pedido):
+    from django.db import OperationalError, connections
+    barrier = threading.Barrier(len(buyers) * opts.clicks)
+    results = []
+    errors = []
+    lock = threading.Lock()
+
+    def buy(buyer):
+        outcome = 'error'
+        started = time.perf_counter()
+        try:
+            barrier.wait()
+            started = time.perf_counter()
+            checkout(buyer, **campos_pedido)
+            outcome = 'ok'
+        except out_of_stock:
+            outcome = 'agotado'
+        except empty_cart:
+            outcome = 'vacio'
+        except OperationalError:
+            outcome = 'bloqueo'
+        except Exception as exc:
+            # anything else, not only DatabaseError: a thread that dies leaves no result to count
+            errors.append(exc)
+        finally:
+            with lock:
+                results.append((outcome, (time.perf_counter() - started) * 1000))
+            connections.close_all()
+
+    threads = [threading.Thread(target=buy, args=(buyer,)) for buyer in buyers for _ in range(opts.clicks)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        print(f'  {len(errors)} checkouts failed, first error: {errors[0]!r}')
+    return results, elapsed
+
+
+def report(opts, results, elapsed, producto, buyers, Pedido):
+    from django.db.models import Count
+    counts = {outcome: 0 for outcome in ('ok', 'agotado', 'vacio', 'bloqueo', 'error')}
+    for outcome, _ in results:
+        counts[outcome] += 1
+    latencies = sorted(ms for _, ms in results)
+    ok_latencies = sorted(ms for outcome, ms in results if outcome == 'ok')
+    producto.refresh_from_db()
+    pedidos = Pedido.objects.filter(usuario__in=buyers).count()
+    repeated = (Pedido.objects.filter(usuario__in=buyers).values('usuario')
+                .annotate(n=Count('pk')).filter(n__gt=1).count())
+    sold = counts['ok'] * opts.cantidad
+
+    print(f'{len(buyers)} buyers x {opts.clicks} click(s) x {opts.cantidad} unit(s), stock {opts.stock}, '
+          f'{"naive" if opts.ingenuo else "atomic"} checkout, {elapsed:.2f}s')
+    print(f'  ok {counts["ok"]}  out of stock {counts["agotado"]}  already checked out {counts["vacio"]}  '
+          f'lock errors {counts["bloqueo"]}  '
+          f'other errors {counts["error"]}')
+    print(f'  throughput {len(results) / elapsed:.1f} attempts/s, {counts["ok"] / elapsed:.1f} orders/s')
+    print(f'  latency all p50 {percentile(latencies, 50):.1f} ms  p99 {percentile(latencies, 99):.1f} ms')
+    if ok_latencies:
+        print(f'  latency ok  p50 {percentile(ok_latencies, 50):.1f} ms  p99 {percentile(ok_latencies, 99):.1f} ms')
+
+    attempts = len(buyers) * opts.clicks
+    checks = [
+        (len(results) == attempts, f'{len(results)} results for {attempts} checkouts'),
+        (sold <= opts.stock, f'units sold {sold} <= initial stock {opts.stock}'),
+        (producto.stock >= 0, f'final stock {producto.stock} >= 0'),
+        (producto.stock == opts.stock - sold, f'final stock {producto.stock} == {opts.stock} - {sold}'),
+        (pedidos == counts['ok'], f'pedidos {pedidos} == successful checkouts {counts["ok"]}'),
+        (not repeated, f'{repeated} buyers with more than one pedido'),
+        (not counts['bloqueo'], f'{counts["bloqueo"]} checkouts failed on a lock'),
+        (not counts['error'], f'{counts["error"]} checkouts failed with other errors'),
+    ]
+    for passed, text in checks:
+        print(f'  [{"ok" if passed else "FAIL"}] {text}')
+    return all(passed for passed, _ in checks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent checkout benchmark for the shop app.')
+    parser.add_argument('--project', default='.', help='directory that contains the Django project')
+    parser.add_argument('--settings', help='settings module (default: $DJANGO_SETTINGS_MODULE)')
+    parser.add_argument('--app', default='shop', help='app label of the shop models')
+    parser.add_argument('--stock', type=int, default=10, help='units of the contended product')
+    parser.add_argument('--compradores', type=int, default=50, help='concurrent buyers')
+    parser.add_argument('--cantidad', type=int, default=1, help='units in each cart')
+    parser.add_argument('--clicks', type=int, default=1, help='simultaneous checkouts per buyer')
+    parser.add_argument('--checkout', default='shop.checkout_atomico.confirmar_pedido',
+                        help='dotted path of the checkout function')
+    parser.add_argument('--ingenuo', action='store_true', help='measure a read-check-save checkout instead')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--keep', action='store_true', help='leave the created rows in place')
+    opts = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(opts.project))
+    if opts.settings:
+        os.environ['DJANGO_SETTINGS_MODULE'] = opts.settings
+    if not os.environ.get('DJANGO_SETTINGS_MODULE'):
+        parser.error('pass --settings or set DJANGO_SETTINGS_MODULE')
+    import django
+    django.setup()
+    from django.apps import apps
+    from django.contrib.auth import get_user_model
+
+    models_by_name = {m.__name__: m for m in apps.get_app_config(opts.app).get_models()}
+    User = get_user_model()
+    filler = FieldFiller(random.Random(opts.seed))
+    checkout, out_of_stock, empty_cart = load_checkout(opts.checkout)
+    if opts.ingenuo:
+        checkout = naive_checkout(out_of_stock, empty_cart)
+
+    clear_buyers(models_by_name, User)
+    producto, buyers = setup(opts, models_by_name, User, filler)
+    try:
+        results, elapsed = run(opts, checkout, out_of_stock, empty_cart, buyers,
+                               pedido_fields(models_by_name['Pedido'], filler))
+        passed = report(opts, results, elapsed, producto, buyers, models_by_name['Pedido'])
+    finally:
+        if not opts.keep:
+            clear_buyers(models_by_name, User)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,22 @@
 import argparse
 import asyncio
+import collections
+import csv
+import datetime
+import gzip
+import json
+import math
+import os
 import random
+import re
+import socket
+import subprocess
+import sys
 import time
-from statistics import mean
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlencode
 import aiohttp
+import aiohttp.web
 
 BASE = 'http://127.0.0.1:8000'
 ENDPOINTS = [
@@ -12,63 +25,1339 @@ ENDPOINTS = [
     ('GET', '/carrito/'),
     ('GET', '/admin/'),
 ]
+PERCENTILES = (50, 90, 99)
+# per-second windows only need a rough shape, so they use a smaller histogram
+WINDOW_PRECISION = 2
+ID_SEGMENT_RE = re.compile(r'/\d+(?=/|$)')
+
+class Histogram:
+    """Fixed-memory latency histogram in the style of HdrHistogram.
+
+    Values are recorded in milliseconds and stored as integer microseconds in
+    log-linear buckets, so every value keeps `significant_figures` digits of
+    precision up to `max_value_ms`. Recording is O(1), memory does not grow
+    with the number of samples, and histograms with the same settings can be
+    merged.
+    """
+
+    def __init__(self, significant_figures=3, max_value_ms=60000):
+        if not 1 <= significant_figures <= 5:
+            raise ValueError('significant_figures must be between 1 and 5')
+        self.significant_figures = significant_figures
+        self.max_value_ms = max_value_ms
+        largest_single_unit = 2 * 10 ** significant_figures
+        self.sub_bucket_bits = (largest_single_unit - 1).bit_length()
+        self.sub_bucket_count = 1 << self.sub_bucket_bits
+        self.sub_bucket_half_bits = self.sub_bucket_bits - 1
+        self.sub_bucket_half = self.sub_bucket_count >> 1
+        self.sub_bucket_mask = self.sub_bucket_count - 1
+        self.max_units = int(max_value_ms * 1000)
+        bucket_count = 1
+        while (self.sub_bucket_count << (bucket_count - 1)) <= self.max_units:
+            bucket_count += 1
+        self.counts = [0] * ((bucket_count + 1) * self.sub_bucket_half)
+        self.total = 0
+        self.sum_units = 0
+        self.min_units = None
+        self.max_units_seen = 0
+
+    def _index(self, units):
+        bucket = (units | self.sub_bucket_mask).bit_length() - self.sub_bucket_bits
+        sub_bucket = units >> bucket
+        return ((bucket + 1) << self.sub_bucket_half_bits) + sub_bucket - self.sub_bucket_half
+
+    def _value_at(self, index):
+        bucket = (index >> self.sub_bucket_half_bits) - 1
+        sub_bucket = (index & (self.sub_bucket_half - 1)) + self.sub_bucket_half
+        if bucket < 0:
+            sub_bucket -= self.sub_bucket_half
+            bucket = 0
+        # highest value that lands in this slot
+        return (sub_bucket << bucket) + (1 << bucket) - 1
+
+    def record(self, value_ms, count=1):
+        units = min(max(int(value_ms * 1000), 0), self.max_units)
+        self.counts[self._index(units)] += count
+        self.total += count
+        self.sum_units += units * count
+        if self.min_units is None or units < self.min_units:
+            self.min_units = units
+        if units > self.max_units_seen:
+            self.max_units_seen = units
+
+    def merge(self, other):
+        if (other.significant_figures, other.max_value_ms) != (self.significant_figures, self.max_value_ms):
+            raise ValueError('cannot merge histograms with different settings')
+        for i, c in enumerate(other.counts):
+            if c:
+                self.counts[i] += c
+        self.total += other.total
+        self.sum_units += other.sum_units
+        if other.min_units is not None and (self.min_units is None or other.min_units < self.min_units):
+            self.min_units = other.min_units
+        self.max_units_seen = max(self.max_units_seen, other.max_units_seen)
+        return self
+
+    def percentile(self, p):
+        if not self.total:
+            return 0
+        target = max(1, math.ceil(self.total * p / 100))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c:
+                seen += c
+                if seen >= target:
+                    return min(self._value_at(i), self.max_units_seen) / 1000
+        return self.max_units_seen / 1000
+
+    def mean(self):
+        return self.sum_units / self.total / 1000 if self.total else 0
+
+    def min(self):
+        return (self.min_units or 0) / 1000
+
+    def max(self):
+        return self.max_units_seen / 1000
+
+    def to_dict(self):
+        """Sparse, JSON-friendly form; from_dict() restores an identical histogram."""
+        return {
+            'significant_figures': self.significant_figures,
+            'max_value_ms': self.max_value_ms,
+            'total': self.total,
+            'sum_units': self.sum_units,
+            'min_units': self.min_units,
+            'max_units': self.max_units_seen,
+            'counts': {str(i): c for i, c in enumerate(self.counts) if c},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        h = cls(data['significant_figures'], data['max_value_ms'])
+        for i, c in data['counts'].items():
+            h.counts[int(i)] = c
+        h.total = data['total']
+        h.sum_units = data['sum_units']
+        h.min_units = data['min_units']
+        h.max_units_seen = data['max_units']
+        return h
+
+    def summary(self, percentiles=PERCENTILES):
+        result = {'count': self.total, 'mean': round(self.mean(), 3), 'min': self.min()}
+        for p in percentiles:
+            result[f'p{p:g}'] = self.percentile(p)
+        result['max'] = self.max()
+        return result
+
+def endpoint_name(method, path):
+    """Group requests by route: drop the query string and collapse numeric ids."""
+    return f"{method} {ID_SEGMENT_RE.sub('/<id>', path.split('?', 1)[0])}"
+
+PHASES = ('queue', 'connect', 'send', 'ttfb', 'body')
+
+def phase_trace_config(stats):
+    """aiohttp tracing hooks that stamp each request's phases into the dict
+    passed as trace_request_ctx, and count new versus reused connections."""
+    def stamp(name):
+        async def handler(session, ctx, params):
+            if ctx.trace_request_ctx is not None:
+                ctx.trace_request_ctx[name] = time.time()
+        return handler
+
+    async def on_create_end(session, ctx, params):
+        stats['connections_created'] += 1
+        await stamp('connect_end')(session, ctx, params)
+
+    async def on_reuse(session, ctx, params):
+        stats['connections_reused'] += 1
+
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(stamp('request_start'))
+    config.on_connection_queued_start.append(stamp('queue_start'))
+    config.on_connection_queued_end.append(stamp('queue_end'))
+    config.on_connection_create_start.append(stamp('connect_start'))
+    config.on_connection_create_end.append(on_create_end)
+    config.on_connection_reuseconn.append(on_reuse)
+    config.on_request_headers_sent.append(stamp('headers_sent'))
+    config.on_request_end.append(stamp('response_headers'))
+    return config
+
+def phase_durations(marks, end):
+    """Milliseconds spent in each phase, from the timestamps phase_trace_config left in marks.
+
+    queue: waiting for a free connection; connect: DNS + TCP (+ TLS) for a new
+    connection; send: writing the request; ttfb: waiting for the response
+    headers; body: reading the body.
+    """
+    def span(a, b):
+        return (marks[b] - marks[a]) * 1000 if a in marks and b in marks else None
+    marks = dict(marks, body_end=end)
+    sent = 'headers_sent' if 'headers_sent' in marks else 'request_start'
+    connected = [k for k in ('connect_end', 'queue_end') if k in marks]
+    return {
+        'queue': span('queue_start', 'queue_end'),
+        'connect': span('connect_start', 'connect_end'),
+        'send': span(connected[0], 'headers_sent') if connected else span('request_start', 'headers_sent'),
+        'ttfb': span(sent, 'response_headers'),
+        'body': span('response_headers', 'body_end'),
+    }
+
+# metric;dur=12.5;desc="..." entries of a Server-Timing header
+SERVER_TIMING_RE = re.compile(r'([\w.-]+)[^,]*?;\s*dur=([\d.]+)')
+
+def parse_server_timing(header):
+    """{'db': 12.5, 'db_queries': 7.0, ...} from a Server-Timing header value."""
+    return {name: float(dur) for name, dur in SERVER_TIMING_RE.findall(header or '')}
+
+def record_result(stats, start, endpoint, status=None, marks=None, server_timing=None, cache=None):
+    """Count one request globally, per endpoint and in its one-second window.
+
+    status is None when the request failed without a response. marks are the
+    phase timestamps collected by phase_trace_config, server_timing the
+    response's Server-Timing header and cache its X-Cache header (HIT/MISS),
+    both aggregated per endpoint.
+    """
+    now = time.time()
+    latency = (now - start) * 1000
+    status_key = str(status) if status is not None else 'exception'
+    failed = status is None or status >= 400
+    endpoint_stats = stats['endpoints'].get(endpoint)
+    if endpoint_stats is None:
+        endpoint_stats = stats['endpoints'][endpoint] = new_bucket(stats['latency'].significant_figures)
+    window = stats['timeline'].get(int(now))
+    if window is None:
+        window = stats['timeline'][int(now)] = new_bucket(WINDOW_PRECISION)
+    buckets = [stats, endpoint_stats, window]
+    live = stats.get('live')
+    if live is not None:
+        live_bucket = live.get(endpoint)
+        if live_bucket is None:
+            live_bucket = live[endpoint] = new_bucket(WINDOW_PRECISION)
+        buckets.append(live_bucket)
+    for bucket in buckets:
+        if status is not None:
+            bucket['latency'].record(latency)
+            bucket['total'] += 1
+        if failed:
+            bucket['errors'] += 1
+        bucket['status'][status_key] = bucket['status'].get(status_key, 0) + 1
+    if marks and status is not None:
+        for phase, duration in phase_durations(marks, now).items():
+            if duration is not None:
+                histogram = stats['phases'].get(phase)
+                if histogram is None:
+                    histogram = stats['phases'][phase] = Histogram(stats['latency'].significant_figures)
+                histogram.record(duration)
+    if server_timing:
+        server = endpoint_stats.setdefault('server', {})
+        for metric, value in parse_server_timing(server_timing).items():
+            histogram = server.get(metric)
+            if histogram is None:
+                histogram = server[metric] = Histogram(stats['latency'].significant_figures)
+            histogram.record(value)
+    if cache:
+        outcomes = endpoint_stats.setdefault('cache', {})
+        outcome = cache.split()[0].upper()
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+async def send_request(session, method, path, start, stats):
+    # start is the time the request was meant to go out, so in open-loop mode
+    # the latency includes any time spent queued behind a slow server.
+    url = BASE + path
+    endpoint = endpoint_name(method, path)
+    marks = {}
+    try:
+        async with session.request(method, url, trace_request_ctx=marks) as resp:
+            await resp.read()
+            record_result(stats, start, endpoint, resp.status, marks, resp.headers.get('Server-Timing'),
+                          resp.headers.get('X-Cache'))
+    except Exception:
+        record_result(stats, start, endpoint)
 
 async def worker(name, session, end_time, stats):
     while time.time() < end_time:
         method, path = random.choice(ENDPOINTS)
-        url = BASE + path
-        start = time.time()
-        try:
-            if method == 'GET':
-                async with session.get(url) as resp:
-                    await resp.read()
-                    latency = (time.time() - start) * 1000
-                    stats['latencies'].append(latency)
-                    stats['total'] += 1
-                    if resp.status >= 400:
-                        stats['errors'] += 1
-        except Exception:
-            stats['errors'] += 1
+        await send_request(session, method, path, time.time(), stats)
         await asyncio.sleep(random.random() * 0.2)
 
-async def run(concurrency, duration):
+async def scheduled_call(launch, scheduled, late_ms, stats):
+    if (time.time() - scheduled) * 1000 > late_ms:
+        stats['late'] += 1
+    await launch(scheduled)
+
+def rate_at(stages, elapsed):
+    """Target rate at `elapsed` seconds into a list of (duration, from_rate, to_rate) stages."""
+    for duration, start, end in stages:
+        if elapsed < duration:
+            return start + (end - start) * elapsed / duration
+        elapsed -= duration
+    return stages[-1][2]
+
+def expected_arrivals(stages, elapsed):
+    """Requests due in the first `elapsed` seconds: the integral of rate_at over [0, elapsed]."""
+    total = 0.0
+    for duration, start, end in stages:
+        span = min(elapsed, duration)
+        total += start * span + (end - start) * span * span / (2 * duration)
+        elapsed -= span
+        if elapsed <= 0:
+            return total
+    return total + stages[-1][2] * elapsed
+
+def arrival_time(stages, count):
+    """Seconds until expected_arrivals reaches `count` (> 0); math.inf if the rate drops to 0 first."""
+    offset = 0.0
+    for duration, start, end in stages:
+        in_stage = (start + end) * duration / 2
+        if count <= in_stage:
+            # solve start*t + (end - start)*t^2/(2*duration) = count, in a form that is stable when end == start
+            a = (end - start) / (2 * duration)
+            return offset + 2 * count / (start + math.sqrt(max(start * start + 4 * a * count, 0.0)))
+        count -= in_stage
+        offset += duration
+    final = stages[-1][2]
+    return offset + count / final if final > 0 else math.inf
+
+async def open_loop(launch, stages, arrival, end_time, max_inflight, late_ms, stats):
+    """Call launch(scheduled_time) on a fixed schedule, independent of response times.
+
+    Send times come from the integral of the rate rather than from 1/rate at
+    the last send. A ramp from 0 then starts sending at once instead of
+    waiting out the first, tiny rate. Poisson arrivals add unit-mean
+    exponential steps to the expected count (time rescaling), so they follow
+    the same ramp.
+    """
+    inflight = set()
+    started = time.time()
+    count = 0.0
+    while True:
+        count += random.expovariate(1.0) if arrival == 'poisson' else 1.0
+        next_send = started + arrival_time(stages, count)
+        if next_send >= end_time:
+            break
+        delay = next_send - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(inflight) >= max_inflight:
+            stats['dropped'] += 1
+        else:
+            task = asyncio.create_task(scheduled_call(launch, next_send, late_ms, stats))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+        stats['scheduled'] += 1
+    if inflight:
+        await asyncio.gather(*inflight)
+
+# ---------------------------
+# Scenarios: scripted user journeys
+# ---------------------------
+LOGIN_PATH = '/login/'
+CATALOG_PATH = '/catalogo/'
+CART_PATH = '/carrito/'
+CHECKOUT_PATH = '/checkout/'
+SEARCH_PATH = '/busqueda/'
+SEARCH_TERMS = ['vino', 'tinto', 'blanco', 'rosado', 'reserva', 'espumante']
+DEFAULT_USERS = [('cliente1', 'Cliente123!')]
+
+CSRF_RE = re.compile(r'name=["\']csrfmiddlewaretoken["\']\s+value=["\']([^"\']+)')
+PRODUCT_LINK_RE = re.compile(r'href=["\'](/[^"\']*producto[^"\']*)["\']')
+ADD_TO_CART_RE = re.compile(r'action=["\'](/[^"\']*agregar[^"\']*)["\']')
+CHECKOUT_RE = re.compile(r'(?:href|action)=["\'](/[^"\']*checkout[^"\']*)["\']')
+
+class JourneyError(Exception):
+    pass
+
+class VirtualUser:
+    """One simulated shopper with its own cookie jar and CSRF token."""
+
+    def __init__(self, session_options, stats, credentials):
+        # CookieJar(unsafe=True) so cookies are kept for IP hosts like 127.0.0.1
+        self.session = aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True), **session_options)
+        self.stats = stats
+        self.credentials = credentials
+        self.csrf_token = None
+        self.html = ''
+        self.url = ''
+        self.scheduled_start = None
+
+    async def close(self):
+        await self.session.close()
+
+    async def request(self, method, path, data=None):
+        start = self.scheduled_start or time.time()
+        self.scheduled_start = None
+        headers = {}
+        if method == 'POST':
+            data = dict(data or {})
+            token = self.csrf_token or self.session.cookie_jar.filter_cookies(BASE).get('csrftoken')
+            token = getattr(token, 'value', token)
+            if token:
+                data['csrfmiddlewaretoken'] = token
+                headers['X-CSRFToken'] = token
+            headers['Referer'] = self.url or BASE + '/'
+        marks = {}
+        try:
+            async with self.session.request(method, BASE + path, data=data, headers=headers,
+                                            trace_request_ctx=marks) as resp:
+                self.html = await resp.text(errors='replace')
+                self.url = str(resp.url)
+                record_result(self.stats, start, endpoint_name(method, path), resp.status, marks,
+                              resp.headers.get('Server-Timing'), resp.headers.get('X-Cache'))
+                status = resp.status
+        except Exception as e:
+            record_result(self.stats, start, endpoint_name(method, path))
+            raise JourneyError(f'{method} {path}: {e}') from e
+        match = CSRF_RE.search(self.html)
+        if match:
+            self.csrf_token = match.group(1)
+        if status >= 400:
+            raise JourneyError(f'{method} {path}: HTTP {status}')
+        return self.html
+
+    def find(self, pattern, fallback=None):
+        paths = pattern.findall(self.html)
+        if paths:
+            return random.choice(paths)
+        if fallback:
+            return fallback
+        raise JourneyError(f'no match for {pattern.pattern} on {self.url}')
+
+async def step_home(user):
+    await user.request('GET', '/')
+
+async def step_login(user):
+    await user.request('GET', LOGIN_PATH)
+    username, password = user.credentials
+    await user.request('POST', LOGIN_PATH, {'username': username, 'password': password})
+    if LOGIN_PATH in user.url:
+        raise JourneyError(f'login rejected for {username}')
+
+async def step_catalog(user):
+    await user.request('GET', CATALOG_PATH)
+
+async def step_search(user):
+    await user.request('GET', SEARCH_PATH + '?' + urlencode({'q': random.choice(SEARCH_TERMS)}))
+
+async def step_product(user):
+    await user.request('GET', user.find(PRODUCT_LINK_RE))
+
+async def step_add_to_cart(user):
+    await user.request('POST', user.find(ADD_TO_CART_RE), {'cantidad': random.choice([1, 1, 1, 2, 3])})
+
+async def step_cart(user):
+    await user.request('GET', CART_PATH)
+
+async def step_checkout(user):
+    await user.request('POST', user.find(CHECKOUT_RE, CHECKOUT_PATH))
+
+# name: (weight, steps). Weights are relative: most visitors browse, few buy.
+JOURNEYS = {
+    'browse': (6, [step_home, step_catalog, step_product, step_catalog, step_product]),
+    'search': (3, [step_home, step_search, step_product]),
+    'buy': (1, [step_login, step_catalog, step_product, step_add_to_cart, step_cart, step_checkout]),
+}
+
+def think_time(opts):
+    if opts.think_dist == 'exponential':
+        return random.expovariate(1 / opts.think_time) if opts.think_time else 0
+    if opts.think_dist == 'uniform':
+        return random.uniform(0, 2 * opts.think_time)
+    return opts.think_time
+
+async def run_journey(session_options, opts, stats, start=None):
+    names = list(JOURNEYS)
+    name = random.choices(names, weights=[JOURNEYS[n][0] for n in names])[0]
+    user = VirtualUser(session_options, stats, random.choice(opts.users))
+    # only the first request of an open-loop journey is tied to the schedule
+    user.scheduled_start = start
+    try:
+        for i, step in enumerate(JOURNEYS[name][1]):
+            if i:
+                await asyncio.sleep(think_time(opts))
+            await step(user)
+        stats['journeys'] += 1
+    except JourneyError:
+        stats['journeys_failed'] += 1
+    finally:
+        await user.close()
+
+async def journey_worker(session_options, opts, end_time, stats):
+    while time.time() < end_time:
+        await run_journey(session_options, opts, stats)
+        await asyncio.sleep(think_time(opts))
+
+# ---------------------------
+# Access-log replay
+# ---------------------------
+# [18/Oct/2026:10:00:00 +0000] "GET /catalogo/?page=2 HTTP/1.1"  (nginx combined)
+# [18/Oct/2026 10:00:00] "GET /catalogo/?page=2 HTTP/1.1"        (Django runserver)
+ACCESS_LOG_RE = re.compile(r'\[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<path>\S+) HTTP/[\d.]+"')
+LOG_TIME_FORMATS = ('%d/%b/%Y:%H:%M:%S %z', '%d/%b/%Y %H:%M:%S')
+
+def parse_log_time(text):
+    for fmt in LOG_TIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            pass
+    return None
+
+def read_access_log(path, methods, exclude, shard=(0, 1)):
+    """Yield (timestamp, method, path) from an access log, one line at a time.
+
+    Requests that share a one-second timestamp are spread evenly over that
+    second so they don't all fire at once. Gzipped logs are read directly.
+    """
+    index, count = shard
+    opener = gzip.open if path.endswith('.gz') else open
+    group, group_time = [], None
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+        for n, line in enumerate(f):
+            if n % count != index:
+                continue
+            match = ACCESS_LOG_RE.search(line)
+            if not match or match['method'] not in methods or (exclude and exclude.search(match['path'])):
+                continue
+            timestamp = parse_log_time(match['time'])
+            if timestamp is None:
+                continue
+            if timestamp != group_time:
+                yield from spread(group, group_time)
+                group, group_time = [], timestamp
+            group.append((match['method'], match['path']))
+    yield from spread(group, group_time)
+
+def spread(group, timestamp):
+    for i, (method, path) in enumerate(group):
+        yield timestamp + i / len(group), method, path
+
+async def replay(session, opts, end_time, stats):
+    """Send the logged requests open-loop, at their original pace divided by
+    --replay-speed, or at --rate when one is given."""
+    entries = read_access_log(opts.replay, set(opts.replay_methods.split(',')),
+                              re.compile(opts.replay_exclude) if opts.replay_exclude else None,
+                              opts.replay_shard)
+    inflight = set()
+    started = next_send = time.time()
+    first_logged = None
+    for logged, method, path in entries:
+        if first_logged is None:
+            first_logged = logged
+        elif opts.rate:
+            next_send += random.expovariate(opts.rate) if opts.arrival == 'poisson' else 1.0 / opts.rate
+        if not opts.rate:
+            next_send = started + (logged - first_logged) / opts.replay_speed
+        if next_send >= end_time:
+            break
+        delay = next_send - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        stats['scheduled'] += 1
+        if len(inflight) >= opts.max_inflight:
+            stats['dropped'] += 1
+            continue
+
+        async def launch(scheduled, method=method, path=path):
+            await send_request(session, method, path, scheduled, stats)
+        task = asyncio.create_task(scheduled_call(launch, next_send, opts.late_ms, stats))
+        inflight.add(task)
+        task.add_done_callback(inflight.discard)
+    if inflight:
+        await asyncio.gather(*inflight)
+
+# ---------------------------
+# Live view: terminal dashboard and Prometheus endpoint
+# ---------------------------
+def prometheus_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class LiveMetrics:
+    """Rolls per-endpoint one-second buckets (stats['live']) into a short
+    window for the terminal dashboard and the /metrics endpoint."""
+
+    def __init__(self, opts, stats, window=10):
+        self.opts = opts
+        self.stats = stats
+        self.seconds = collections.deque(maxlen=window)
+        self.started = time.time()
+        self.task = None
+        self.runner = None
+
+    async def start(self):
+        self.stats['live'] = {}
+        self.task = asyncio.create_task(self.tick())
+        if self.opts.metrics_port:
+            app = aiohttp.web.Application()
+            app.router.add_get('/metrics', self.serve_metrics)
+            self.runner = aiohttp.web.AppRunner(app)
+            await self.runner.setup()
+            await aiohttp.web.TCPSite(self.runner, '127.0.0.1', self.opts.metrics_port).start()
+            print(f'Prometheus metrics on http://127.0.0.1:{self.opts.metrics_port}/metrics')
+
+    async def stop(self):
+        self.task.cancel()
+        if self.runner:
+            await self.runner.cleanup()
+        self.stats.pop('live', None)
+
+    async def tick(self):
+        while True:
+            await asyncio.sleep(1)
+            self.seconds.append(self.stats['live'])
+            self.stats['live'] = {}
+            if self.opts.live:
+                self.render_terminal()
+
+    def window(self):
+        merged = {}
+        for second in self.seconds:
+            for endpoint, bucket in second.items():
+                merge_stats(merged.setdefault(endpoint, new_bucket(WINDOW_PRECISION)), bucket)
+        return merged
+
+    def render_terminal(self):
+        last = self.seconds[-1] if self.seconds else {}
+        window = self.window()
+        lines = [f'=== {time.time() - self.started:5.0f}s  {sum(b["total"] for b in last.values())} req/s  '
+                 f'{sum(b["errors"] for b in last.values())} errors/s  '
+                 f'total={self.stats["total"]} errors={self.stats["errors"]} ===',
+                 f'{"endpoint":<32} {"req/s":>7} {"err/s":>6} {"p50":>8} {"p99":>8}  (last {len(self.seconds)}s)']
+        for endpoint, bucket in sorted(window.items()):
+            now = last.get(endpoint, {'total': 0, 'errors': 0})
+            lines.append(f'{endpoint:<32} {now["total"]:>7} {now["errors"]:>6} '
+                         f'{bucket["latency"].percentile(50):>8.1f} {bucket["latency"].percentile(99):>8.1f}')
+        if sys.stdout.isatty():
+            # redraw in place
+            sys.stdout.write('\x1b[H\x1b[2J')
+        print('\n'.join(lines), flush=True)
+
+    def render_prometheus(self):
+        stats = self.stats
+        out = ['# HELP loadtest_requests_total Requests completed, by endpoint and HTTP status.',
+               '# TYPE loadtest_requests_total counter']
+        for endpoint, bucket in sorted(stats['endpoints'].items()):
+            for status, count in sorted(bucket['status'].items()):
+                out.append(f'loadtest_requests_total{{endpoint="{prometheus_label(endpoint)}",'
+                           f'status="{status}"}} {count}')
+        out += ['# HELP loadtest_errors_total Requests that failed or returned 4xx/5xx.',
+                '# TYPE loadtest_errors_total counter']
+        for endpoint, bucket in sorted(stats['endpoints'].items()):
+            out.append(f'loadtest_errors_total{{endpoint="{prometheus_label(endpoint)}"}} {bucket["errors"]}')
+        out += [f'# HELP loadtest_request_duration_seconds Latency; quantiles cover the last {self.seconds.maxlen}s.',
+                '# TYPE loadtest_request_duration_seconds summary']
+        window = self.window()
+        for endpoint, bucket in sorted(stats['endpoints'].items()):
+            label = f'endpoint="{prometheus_label(endpoint)}"'
+            recent = window.get(endpoint)
+            if recent:
+                for q in (0.5, 0.9, 0.99):
+                    out.append(f'loadtest_request_duration_seconds{{{label},quantile="{q}"}} '
+                               f'{recent["latency"].percentile(q * 100) / 1000:.6g}')
+            out.append(f'loadtest_request_duration_seconds_sum{{{label}}} {bucket["latency"].sum_units / 1e6:.6f}')
+            out.append(f'loadtest_request_duration_seconds_count{{{label}}} {bucket["latency"].total}')
+        for counter in ('scheduled', 'dropped', 'late', 'journeys', 'journeys_failed'):
+            out += [f'# TYPE loadtest_{counter}_total counter', f'loadtest_{counter}_total {stats[counter]}']
+        return '\n'.join(out) + '\n'
+
+    async def serve_metrics(self, request):
+        return aiohttp.web.Response(text=self.render_prometheus(), content_type='text/plain',
+                                    headers={'X-Content-Type-Options': 'nosniff'})
+
+def new_bucket(precision):
+    return {'latency': Histogram(precision), 'total': 0, 'errors': 0, 'status': {}}
+
+def new_stats(precision):
+    stats = new_bucket(precision)
+    stats.update({'scheduled': 0, 'dropped': 0, 'late': 0, 'journeys': 0, 'journeys_failed': 0,
+                  'connections_created': 0, 'connections_reused': 0, 'endpoints': {}, 'timeline': {}, 'phases': {}})
+    return stats
+
+def merge_stats(into, other):
+    for key, value in other.items():
+        if key not in into:
+            into[key] = value
+        elif isinstance(value, dict):
+            merge_stats(into[key], value)
+        elif isinstance(value, Histogram):
+            into[key].merge(value)
+        else:
+            into[key] += value
+    return into
+
+def split(total, parts):
+    """Spread an integer total over parts as evenly as possible."""
+    return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+
+async def generate(opts, stats=None):
     timeout = aiohttp.ClientTimeout(total=30)
-    stats = {'latencies': [], 'total': 0, 'errors': 0}
-    end_time = time.time() + duration
-    connector = aiohttp.TCPConnector(limit=0)
-    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
-        tasks = [asyncio.create_task(worker(f'w{i}', session, end_time, stats)) for i in range(concurrency)]
-        await asyncio.gather(*tasks)
+    stats = stats or new_stats(opts.precision)
+    end_time = time.time() + opts.duration
+    # force_close opens a new connection for every request instead of keeping it alive
+    connector = aiohttp.TCPConnector(limit=0, force_close=opts.no_keepalive)
+    session_options = {'connector': connector, 'connector_owner': False, 'timeout': timeout,
+                       'trace_configs': [phase_trace_config(stats)]}
+    live = LiveMetrics(opts, stats) if opts.live or opts.metrics_port else None
+    if live:
+        await live.start()
+    try:
+        async with aiohttp.ClientSession(**session_options) as session:
+            if opts.scenario:
+                async def launch(scheduled):
+                    await run_journey(session_options, opts, stats, scheduled)
+                def closed_loop_worker(i):
+                    return journey_worker(session_options, opts, end_time, stats)
+            else:
+                async def launch(scheduled):
+                    method, path = random.choice(ENDPOINTS)
+                    await send_request(session, method, path, scheduled, stats)
+                def closed_loop_worker(i):
+                    return worker(f'w{i}', session, end_time, stats)
+            if opts.replay:
+                await replay(session, opts, end_time, stats)
+            elif opts.rate:
+                stages = opts.stages or [(opts.duration, opts.rate, opts.rate)]
+                await open_loop(launch, stages, opts.arrival, end_time, opts.max_inflight, opts.late_ms, stats)
+            else:
+                tasks = [asyncio.create_task(closed_loop_worker(i)) for i in range(opts.concurrency)]
+                await asyncio.gather(*tasks)
+    finally:
+        # the connections, dashboard and /metrics port must close even when a run fails
+        await connector.close()
+        if live:
+            await live.stop()
+    return stats
+
+def generate_in_process(opts):
+    # spawned and forkserver children start from a fresh import, so the
+    # target comes with the shard instead of from the parent's global
+    global BASE
+    BASE = opts.base
+    # forked children inherit the parent's random state; reseed so they
+    # don't all pick the same endpoints and arrival gaps
+    random.seed()
+    return asyncio.run(generate(opts))
+
+def shard_options(opts, processes):
+    """Give each process its share of the concurrency, rate and in-flight cap."""
+    if not opts.rate:
+        processes = min(processes, opts.concurrency)
+    shards = []
+    for concurrency, max_inflight in zip(split(opts.concurrency, processes), split(opts.max_inflight, processes)):
+        shard = argparse.Namespace(**vars(opts))
+        shard.base = BASE
+        shard.concurrency = concurrency
+        shard.max_inflight = max(1, max_inflight)
+        if opts.rate:
+            shard.rate = opts.rate / processes
+        if opts.stages:
+            shard.stages = [(d, start / processes, end / processes) for d, start, end in opts.stages]
+        # each process replays every n-th log line
+        shard.replay_shard = (len(shards), processes)
+        shards.append(shard)
+    return shards
+
+def bucket_report(bucket, histogram=True):
+    total = bucket['total']
+    report = {
+        'requests': total,
+        'errors': bucket['errors'],
+        'error_rate': round(bucket['errors'] / max(total + bucket['status'].get('exception', 0), 1), 4),
+        'status': dict(sorted(bucket['status'].items())),
+        'latency_ms': bucket['latency'].summary(),
+    }
+    if histogram:
+        report['histogram'] = bucket['latency'].to_dict()
+    if bucket.get('server'):
+        report['server_timing'] = {metric: h.summary() for metric, h in sorted(bucket['server'].items())}
+    if bucket.get('cache'):
+        hits = bucket['cache'].get('HIT', 0)
+        report['cache'] = dict(sorted(bucket['cache'].items()), hit_ratio=round(hits / sum(bucket['cache'].values()), 4))
+    return report
 
+def git_revision():
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        rev = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=here, capture_output=True, text=True, check=True)
+        dirty = subprocess.run(['git', 'status', '--porcelain'], cwd=here, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return {'revision': None, 'dirty': None}
+    return {'revision': rev.stdout.strip(), 'dirty': bool(dirty.stdout.strip())}
+
+def build_report(stats, opts):
+    """Turn merged stats into a plain dict that can be dumped as JSON."""
+    report = {
+        'run': dict(git_revision(), timestamp=time.strftime('%Y-%m-%dT%H:%M:%S')),
+        'settings': {k: v for k, v in vars(opts).items() if isinstance(v, (int, float, str, bool, type(None)))},
+        'base': BASE,
+        'overall': bucket_report(stats),
+        'counters': {k: stats[k] for k in ('scheduled', 'dropped', 'late', 'journeys', 'journeys_failed')},
+        'connections': {'created': stats['connections_created'], 'reused': stats['connections_reused']},
+        'phases_ms': {phase: stats['phases'][phase].summary() for phase in PHASES if phase in stats['phases']},
+        'endpoints': {name: bucket_report(b) for name, b in sorted(stats['endpoints'].items())},
+        'timeline': [],
+    }
+    if stats['timeline']:
+        first = min(stats['timeline'])
+        for second, bucket in sorted(stats['timeline'].items()):
+            window = bucket_report(bucket, histogram=False)
+            del window['status']
+            window.update({'second': second - first, 'timestamp': second})
+            report['timeline'].append(window)
+    return report
+
+def write_artifacts(report, directory):
+    """Write results.json plus endpoints.csv, status.csv and timeline.csv for plotting."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'results.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    latency_cols = ['mean', 'min'] + [f'p{p:g}' for p in PERCENTILES] + ['max']
+    with open(os.path.join(directory, 'endpoints.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['endpoint', 'requests', 'errors', 'error_rate'] + [f'{c}_ms' for c in latency_cols])
+        for name, row in [('ALL', report['overall'])] + list(report['endpoints'].items()):
+            writer.writerow([name, row['requests'], row['errors'], row['error_rate']] +
+                            [row['latency_ms'][c] for c in latency_cols])
+    with open(os.path.join(directory, 'status.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['endpoint', 'status', 'count'])
+        for name, row in [('ALL', report['overall'])] + list(report['endpoints'].items()):
+            for status, count in row['status'].items():
+                writer.writerow([name, status, count])
+    with open(os.path.join(directory, 'timeline.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['second', 'timestamp', 'requests', 'errors', 'error_rate'] + [f'{c}_ms' for c in latency_cols])
+        for row in report['timeline']:
+            writer.writerow([row['second'], row['timestamp'], row['requests'], row['errors'], row['error_rate']] +
+                            [row['latency_ms'][c] for c in latency_cols])
+
+def collect(opts):
+    if opts.agents:
+        return asyncio.run(control(opts))
+    if opts.processes > 1:
+        shards = shard_options(opts, opts.processes)
+        stats = new_stats(opts.precision)
+        with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+            for shard_stats in pool.map(generate_in_process, shards):
+                merge_stats(stats, shard_stats)
+        return stats
+    return asyncio.run(generate(opts))
+
+def run(opts):
+    stats = collect(opts)
     total = stats['total']
     errors = stats['errors']
-    lat = stats['latencies']
+    lat = stats['latency']
     print('\n=== Load test summary ===')
+    if opts.replay and not opts.rate:
+        print(f'Scheduled: {stats["scheduled"]} (replay of {opts.replay} at {opts.replay_speed:g}x)')
+    elif opts.rate:
+        profile = f', {opts.profile} profile' if opts.profile else ''
+        print(f'Scheduled: {stats["scheduled"]} ({opts.arrival}, {opts.rate}/s{profile})')
+    if opts.rate or opts.replay:
+        print(f'Dropped (over {opts.max_inflight} in flight): {stats["dropped"]}')
+        print(f'Late (> {opts.late_ms}ms behind schedule): {stats["late"]}')
+    if opts.scenario:
+        print(f'Journeys: {stats["journeys"]} completed, {stats["journeys_failed"]} failed')
     print(f'Total requests: {total}')
     print(f'Errors: {errors}')
-    if lat:
-        print(f'Latency ms: avg={mean(lat):.1f} p50={percentile(lat,50):.1f} p90={percentile(lat,90):.1f} p99={percentile(lat,99):.1f}')
-
-def percentile(data, p):
-    if not data:
-        return 0
-    data_sorted = sorted(data)
-    k = (len(data_sorted)-1) * (p/100)
-    f = int(k)
-    c = min(f+1, len(data_sorted)-1)
-    if f == c:
-        return data_sorted[int(k)]
-    d0 = data_sorted[f] * (c - k)
-    d1 = data_sorted[c] * (k - f)
-    return d0 + d1
+    if lat.total:
+        print(f'Latency ms: avg={lat.mean():.1f} p50={lat.percentile(50):.1f} p90={lat.percentile(90):.1f} p99={lat.percentile(99):.1f} max={lat.max():.1f}')
+    if stats['phases']:
+        phases = '  '.join(f'{phase}={stats["phases"][phase].percentile(50):.1f}/{stats["phases"][phase].percentile(99):.1f}'
+                           for phase in PHASES if phase in stats['phases'])
+        print(f'Phases ms (p50/p99): {phases}')
+    print(f'Connections: {stats["connections_created"]} opened, {stats["connections_reused"]} reused'
+          f'{" (keep-alive off)" if opts.no_keepalive else ""}')
+    if stats['endpoints']:
+        print(f'\n{"endpoint":<32} {"reqs":>7} {"errors":>6} {"avg":>8} {"p50":>8} {"p90":>8} {"p99":>8}')
+        for name, bucket in sorted(stats['endpoints'].items()):
+            h = bucket['latency']
+            print(f'{name:<32} {bucket["total"]:>7} {bucket["errors"]:>6} {h.mean():>8.1f} '
+                  f'{h.percentile(50):>8.1f} {h.percentile(90):>8.1f} {h.percentile(99):>8.1f}')
+        statuses = ' '.join(f'{code}={n}' for code, n in sorted(stats['status'].items()))
+        print(f'Status codes: {statuses}')
+    server_endpoints = {name: b for name, b in stats['endpoints'].items() if b.get('server')}
+    if server_endpoints:
+        metrics = sorted({m for b in server_endpoints.values() for m in b['server']})
+        print('\nServer-Timing p50 (client p50 for comparison)')
+        print(f'{"endpoint":<32} {"client":>8} ' + ' '.join(f'{m[:10]:>10}' for m in metrics))
+        for name, bucket in sorted(server_endpoints.items()):
+            values = ' '.join(f'{bucket["server"][m].percentile(50):>10.1f}' if m in bucket['server'] else f'{"-":>10}'
+                              for m in metrics)
+            print(f'{name:<32} {bucket["latency"].percentile(50):>8.1f} {values}')
+    cache_endpoints = {name: b['cache'] for name, b in stats['endpoints'].items() if b.get('cache')}
+    if cache_endpoints:
+        print('\nX-Cache')
+        print(f'{"endpoint":<32} {"hits":>7} {"misses":>7} {"ratio":>7}')
+        for name, outcomes in sorted(cache_endpoints.items()):
+            hits, total = outcomes.get('HIT', 0), sum(outcomes.values())
+            print(f'{name:<32} {hits:>7} {total - hits:>7} {hits / total:>7.1%}')
+
+    report = build_report(stats, opts)
+    if opts.output:
+        write_artifacts(report, opts.output)
+        print(f'Results written to {opts.output}')
+    if opts.save:
+        print(f'Run saved as {save_run(report, opts.results_dir)}')
+    return report
+
+# ---------------------------
+# Load profiles and saturation search
+# ---------------------------
+def parse_stages(spec, start_rate):
+    """'30:50,60:200' -> ramp to 50/s over 30s, then to 200/s over 60s."""
+    stages = []
+    previous = start_rate
+    for part in spec.split(','):
+        duration, target = part.split(':')
+        stages.append((float(duration), previous, float(target)))
+        previous = float(target)
+    return stages
+
+def profile_stages(opts):
+    d, r = opts.duration, opts.rate
+    if opts.profile == 'ramp':
+        return [(d, opts.start_rate, r)]
+    if opts.profile == 'step':
+        return [(d / opts.steps, r * i / opts.steps, r * i / opts.steps) for i in range(1, opts.steps + 1)]
+    if opts.profile == 'soak':
+        return [(d, r, r)]
+    if opts.profile == 'spike':
+        spike = opts.spike_rate or r * 5
+        return [(d * 0.4, r, r), (d * 0.2, spike, spike), (d * 0.4, r, r)]
+    return parse_stages(opts.profile, opts.start_rate)
+
+def meets_slo(stats, opts):
+    lat = stats['latency']
+    attempts = stats['total'] + stats['status'].get('exception', 0)
+    error_rate = stats['errors'] / max(attempts, 1)
+    if stats['dropped']:
+        return False, f'{stats["dropped"]} dropped'
+    if error_rate > opts.slo_errors:
+        return False, f'error rate {error_rate:.2%}'
+    if lat.percentile(99) > opts.slo_p99:
+        return False, f'p99 {lat.percentile(99):.1f}ms'
+    return True, 'ok'
+
+def find_max(opts):
+    """Raise the open-loop rate step by step until the p99 or error-rate SLO breaks,
+    then bisect between the last passing and first failing rate."""
+    steps = []
+
+    def attempt(rate):
+        step = argparse.Namespace(**vars(opts))
+        step.rate, step.stages, step.profile = rate, None, None
+        stats = collect(step)
+        ok, reason = meets_slo(stats, opts)
+        throughput = stats['total'] / opts.duration
+        lat = stats['latency']
+        steps.append({'rate': rate, 'throughput': round(throughput, 2), 'passed': ok, 'reason': reason,
+                      'errors': stats['errors'], 'dropped': stats['dropped'], 'latency_ms': lat.summary()})
+        print(f'  rate={rate:>9.1f}/s  achieved={throughput:>9.1f}/s  p99={lat.percentile(99):>8.1f}ms  '
+              f'errors={stats["errors"]:<5} {"PASS" if ok else "FAIL (" + reason + ")"}')
+        return ok
+
+    print(f'\n=== Saturation search: p99 <= {opts.slo_p99}ms, errors <= {opts.slo_errors:.2%} ===')
+    good, bad = None, None
+    rate = opts.rate
+    while rate <= opts.max_rate:
+        if not attempt(rate):
+            bad = rate
+            break
+        good = rate
+        rate *= opts.growth
+    if good is not None and bad is not None:
+        for _ in range(opts.bisect):
+            mid = (good + bad) / 2
+            if attempt(mid):
+                good = mid
+            else:
+                bad = mid
+
+    passing = [s for s in steps if s['passed']]
+    best = max(passing, key=lambda s: s['throughput']) if passing else None
+    if best:
+        print(f'Highest sustainable throughput: {best["throughput"]:.1f} req/s (target {best["rate"]:.1f}/s, '
+              f'p99={best["latency_ms"]["p99"]:.1f}ms)')
+    else:
+        print(f'No rate met the SLO; the first step at {opts.rate}/s already failed')
+    if bad is None:
+        print(f'Stopped at --max-rate {opts.max_rate}/s without breaking the SLO')
+    result = {'slo': {'p99_ms': opts.slo_p99, 'error_rate': opts.slo_errors}, 'steps': steps,
+              'max_sustainable': best}
+    if opts.output:
+        os.makedirs(opts.output, exist_ok=True)
+        with open(os.path.join(opts.output, 'find_max.json'), 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f'Results written to {opts.output}')
+    return result
+
+# ---------------------------
+# Distributed load generation: one controller, many agents
+# ---------------------------
+# Messages are JSON lines over TCP:
+#   agent -> controller  {"type": "hello", "host": ..., "cpus": ...}
+#   controller -> agent  {"type": "config", "base": ..., "options": {...}}
+#   agent -> controller  {"type": "ready"}
+#   controller -> agent  {"type": "start"}
+#   agent -> controller  {"type": "snapshot", ...} every second, then {"type": "result", "stats": {...}}
+CONTROL_PORT = 5557
+MESSAGE_LIMIT = 2 ** 26
+
+def stats_to_json(value):
+    if isinstance(value, Histogram):
+        return {'__histogram__': value.to_dict()}
+    if isinstance(value, dict):
+        return {str(k): stats_to_json(v) for k, v in value.items()}
+    return value
+
+def stats_from_json(value, key=None):
+    if isinstance(value, dict):
+        if '__histogram__' in value:
+            return Histogram.from_dict(value['__histogram__'])
+        # timeline buckets are keyed by epoch second
+        return {int(k) if key == 'timeline' else k: stats_from_json(v, k) for k, v in value.items()}
+    return value
+
+async def send_message(writer, message):
+    writer.write(json.dumps(message).encode() + b'\n')
+    await writer.drain()
+
+async def read_message(reader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError('peer closed the connection')
+    return json.loads(line)
+
+def parse_address(address, default_host):
+    host, _, port = address.rpartition(':')
+    return host or default_host, int(port or CONTROL_PORT)
+
+async def agent(controller):
+    """Connect to a controller, run each scenario it sends, and stream results back."""
+    global BASE
+    host, port = parse_address(controller, '127.0.0.1')
+    reader, writer = await asyncio.open_connection(host, port, limit=MESSAGE_LIMIT)
+    await send_message(writer, {'type': 'hello', 'host': socket.gethostname(), 'cpus': os.cpu_count()})
+    print(f'Agent connected to {host}:{port}')
+    try:
+        while True:
+            try:
+                config = await read_message(reader)
+            except ConnectionError:
+                break
+            BASE = config['base']
+            opts = argparse.Namespace(**config['options'])
+            stats = new_stats(opts.precision)
+            await send_message(writer, {'type': 'ready'})
+            await read_message(reader)
+            print(f'Agent running: {opts.rate or opts.concurrency} {"req/s" if opts.rate else "workers"} '
+                  f'for {opts.duration}s against {BASE}')
+            run_task = asyncio.create_task(generate(opts, stats))
+            while not run_task.done():
+                await asyncio.wait([run_task], timeout=1)
+                await send_message(writer, {'type': 'snapshot', 'total': stats['total'], 'errors': stats['errors'],
+                                            'latency': stats['latency'].to_dict()})
+            await send_message(writer, {'type': 'result', 'stats': stats_to_json(run_task.result())})
+    finally:
+        writer.close()
+
+async def control(opts):
+    """Wait for opts.agents agents, split the load between them, start them
+    together, show their merged progress and return the merged stats."""
+    connected = []
+    all_connected = asyncio.Event()
+
+    async def on_connect(reader, writer):
+        hello = await read_message(reader)
+        connected.append((reader, writer, hello))
+        print(f'  agent {len(connected)}/{opts.agents}: {hello["host"]} ({hello["cpus"]} cpus)')
+        if len(connected) == opts.agents:
+            all_connected.set()
+
+    host, port = parse_address(opts.listen, '0.0.0.0')
+    server = await asyncio.start_server(on_connect, host, port, limit=MESSAGE_LIMIT)
+    print(f'Controller listening on {host}:{port}, waiting for {opts.agents} agents')
+    try:
+        await all_connected.wait()
+        shards = shard_options(opts, opts.agents)
+        # with less concurrency than agents, the extra agents sit this run out
+        agents = connected[:len(shards)]
+        for (reader, writer, _), shard in zip(agents, shards):
+            await send_message(writer, {'type': 'config', 'base': BASE, 'options': vars(shard)})
+        for reader, _, _ in agents:
+            await read_message(reader)
+        for _, writer, _ in agents:
+            await send_message(writer, {'type': 'start'})
+
+        latest = {}
+        results = {}
+        started = time.time()
+
+        async def follow(i, reader):
+            while True:
+                message = await read_message(reader)
+                if message['type'] == 'result':
+                    results[i] = stats_from_json(message['stats'])
+                    return
+                latest[i] = message
+
+        followers = [asyncio.create_task(follow(i, reader)) for i, (reader, _, _) in enumerate(agents)]
+        while not all(f.done() for f in followers):
+            await asyncio.wait(followers, timeout=1)
+            if latest:
+                merged = Histogram(opts.precision)
+                for snapshot in latest.values():
+                    merged.merge(Histogram.from_dict(snapshot['latency']))
+                total = sum(m['total'] for m in latest.values())
+                errors = sum(m['errors'] for m in latest.values())
+                print(f'  t={time.time() - started:>5.0f}s  requests={total:<8} errors={errors:<6} '
+                      f'p50={merged.percentile(50):.1f}ms p99={merged.percentile(99):.1f}ms  '
+                      f'agents={sum(not f.done() for f in followers)} running')
+        # an agent that dies mid-run loses its share, not everyone else's
+        for i, ((_, _, hello), f) in enumerate(zip(agents, followers)):
+            if f.exception():
+                print(f'  agent {i + 1} ({hello["host"]}) failed before sending its results: {f.exception()!r}')
+        if len(results) < len(agents):
+            print(f'  merging results from {len(results)} of {len(agents)} agents')
+    finally:
+        for _, writer, _ in connected:
+            writer.close()
+        server.close()
+        await server.wait_closed()
+
+    stats = new_stats(opts.precision)
+    for agent_stats in results.values():
+        merge_stats(stats, agent_stats)
+    return stats
+
+# ---------------------------
+# Results store and regression gate
+# ---------------------------
+RESULTS_DIR = 'resultados_carga'
+
+def save_run(report, directory):
+    os.makedirs(directory, exist_ok=True)
+    revision = (report['run']['revision'] or 'norev')[:8]
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}_{revision}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+def load_run(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def mann_whitney(baseline, candidate):
+    """Mann-Whitney U test on two histograms with the same settings.
+
+    Returns (probability that a candidate sample is slower than a baseline
+    sample, two-sided p-value from the normal approximation with tie
+    correction), or (0.5, 1.0) when either side is empty. The buckets are
+    compared index by index, so different settings raise ValueError.
+    """
+    if (candidate.significant_figures, candidate.max_value_ms) != (baseline.significant_figures,
+                                                                   baseline.max_value_ms):
+        raise ValueError(f'cannot compare histograms with different settings '
+                         f'(precision {baseline.significant_figures} vs {candidate.significant_figures}, '
+                         f'max {baseline.max_value_ms} vs {candidate.max_value_ms} ms); '
+                         f'record both runs with the same --precision')
+    n1, n2 = candidate.total, baseline.total
+    n = n1 + n2
+    if not n1 or not n2:
+        return 0.5, 1.0
+    rank = rank_sum = ties = 0
+    for c1, c2 in zip(candidate.counts, baseline.counts):
+        t = c1 + c2
+        if t:
+            rank_sum += c1 * (rank + (t + 1) / 2)
+            rank += t
+            ties += t ** 3 - t
+    u = rank_sum - n1 * (n1 + 1) / 2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 0.5, 1.0
+    z = (u - n1 * n2 / 2) / math.sqrt(variance)
+    return u / (n1 * n2), math.erfc(abs(z) / math.sqrt(2))
+
+def compare_bucket(name, base, cand, opts):
+    base_h = Histogram.from_dict(base['histogram'])
+    cand_h = Histogram.from_dict(cand['histogram'])
+    row = {'endpoint': name, 'base_p50': base_h.percentile(50), 'cand_p50': cand_h.percentile(50),
+           'base_p99': base_h.percentile(99), 'cand_p99': cand_h.percentile(99),
+           'p_value': None, 'slower_prob': None, 'problems': []}
+    row['p99_delta'] = (row['cand_p99'] - row['base_p99']) / row['base_p99'] if row['base_p99'] else 0
+    if min(base_h.total, cand_h.total) < opts.min_samples:
+        row['problems'].append(f'too few samples to compare (< {opts.min_samples})')
+        return row
+    row['slower_prob'], row['p_value'] = mann_whitney(base_h, cand_h)
+    if row['p99_delta'] > opts.threshold and row['p_value'] < opts.alpha and row['slower_prob'] > 0.5:
+        row['problems'].append(f'p99 +{row["p99_delta"]:.0%}')
+    if cand['error_rate'] - base['error_rate'] > opts.max_error_increase:
+        row['problems'].append(f'error rate {base["error_rate"]:.2%} -> {cand["error_rate"]:.2%}')
+    return row
+
+def compare_runs(baseline, candidate, opts):
+    """Compare two saved runs; returns (rows, regressed)."""
+    rows = [compare_bucket('ALL', baseline['overall'], candidate['overall'], opts)]
+    for name, base in baseline['endpoints'].items():
+        if name in candidate['endpoints']:
+            rows.append(compare_bucket(name, base, candidate['endpoints'][name], opts))
+    base_rps = baseline['overall']['requests'] / baseline['settings']['duration']
+    cand_rps = candidate['overall']['requests'] / candidate['settings']['duration']
+    if base_rps and (base_rps - cand_rps) / base_rps > opts.threshold:
+        rows[0]['problems'].append(f'throughput {base_rps:.1f} -> {cand_rps:.1f} req/s')
+    rows[0]['base_rps'], rows[0]['cand_rps'] = base_rps, cand_rps
+    # "too few samples" is a warning, not a regression
+    regressed = any(p for row in rows for p in row['problems'] if not p.startswith('too few'))
+    return rows, regressed
+
+def compare_main(argv):
+    parser = argparse.ArgumentParser(prog='prueba_carga.py compare',
+                                     description='Compare two saved runs and exit 1 on a regression.')
+    parser.add_argument('baseline', help='run JSON (from --save or --output) to compare against')
+    parser.add_argument('candidate', nargs='?', help='run JSON to check (default: newest in --results-dir)')
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative p99 increase or throughput drop that counts as a regression')
+    parser.add_argument('--alpha', type=float, default=0.05, help='significance level for the latency test')
+    parser.add_argument('--max-error-increase', type=float, default=0.01,
+                        help='absolute error-rate increase that counts as a regression')
+    parser.add_argument('--min-samples', type=int, default=30)
+    opts = parser.parse_args(argv)
+    if not opts.candidate:
+        saved = sorted(f for f in os.listdir(opts.results_dir) if f.endswith('.json'))
+        if not saved:
+            parser.error(f'no saved runs in {opts.results_dir}')
+        opts.candidate = os.path.join(opts.results_dir, saved[-1])
+    baseline, candidate = load_run(opts.baseline), load_run(opts.candidate)
+    try:
+        rows, regressed = compare_runs(baseline, candidate, opts)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    print(f'Baseline:  {opts.baseline} (rev {str(baseline["run"]["revision"])[:8]})')
+    print(f'Candidate: {opts.candidate} (rev {str(candidate["run"]["revision"])[:8]})')
+    print(f'Throughput: {rows[0]["base_rps"]:.1f} -> {rows[0]["cand_rps"]:.1f} req/s')
+    print(f'\n{"endpoint":<32} {"p50":>17} {"p99":>17} {"dp99":>7} {"p-value":>8}  verdict')
+    for row in rows:
+        p_value = f'{row["p_value"]:.3g}' if row['p_value'] is not None else '-'
+        verdict = ', '.join(row['problems']) or 'ok'
+        print(f'{row["endpoint"]:<32} {row["base_p50"]:>7.1f} -> {row["cand_p50"]:<7.1f} '
+              f'{row["base_p99"]:>7.1f} -> {row["cand_p99"]:<7.1f} {row["p99_delta"]:>+7.1%} {p_value:>8}  {verdict}')
+    print('\nREGRESSION' if regressed else '\nNo regression')
+    return 1 if regressed else 0
+
+def user_password(value):
+    """argparse type for USER:PASSWORD."""
+    user, sep, password = value.partition(':')
+    if not sep or not user:
+        raise argparse.ArgumentTypeError(f'expected USER:PASSWORD, got {value!r}')
+    return user, password
 
 def main():
-    parser = argparse.ArgumentParser()
+    global BASE
+    if len(sys.argv) > 1 and sys.argv[1] == 'compare':
+        sys.exit(compare_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'agent':
+        agent_parser = argparse.ArgumentParser(prog='prueba_carga.py agent',
+                                               description='Generate load on behalf of a controller.')
+        agent_parser.add_argument('--controller', default=f'127.0.0.1:{CONTROL_PORT}', metavar='HOST:PORT')
+        asyncio.run(agent(agent_parser.parse_args(sys.argv[2:]).controller))
+        return
+    parser = argparse.ArgumentParser(epilog='Use "prueba_carga.py compare BASELINE [CANDIDATE]" to check for regressions '
+                                            'and "prueba_carga.py agent --controller HOST:PORT" to start an agent.')
+    parser.add_argument('--base', default=BASE, help='shop URL to load')
     parser.add_argument('--concurrency', '-c', type=int, default=20)
     parser.add_argument('--duration', '-d', type=int, default=15, help='seconds')
+    parser.add_argument('--rate', '-r', type=float, default=None,
+                        help='open-loop mode: requests per second, regardless of response times')
+    parser.add_argument('--arrival', choices=['constant', 'poisson'], default='constant',
+                        help='inter-arrival distribution for --rate')
+    parser.add_argument('--max-inflight', type=int, default=1000,
+                        help='requests in flight before new ones are dropped (--rate only)')
+    parser.add_argument('--late-ms', type=float, default=10,
+                        help='count a request as late when it leaves this far behind schedule')
+    parser.add_argument('--precision', type=int, default=3, choices=range(1, 6),
+                        help='significant figures kept by the latency histogram')
+    parser.add_argument('--processes', '-p', type=int, default=1,
+                        help='event loops to run in separate processes (0 = one per core)')
+    parser.add_argument('--scenario', '-s', action='store_true',
+                        help='run weighted user journeys (login, catalog, cart, checkout) instead of ENDPOINTS; '
+                             'with --rate, journeys start at that rate')
+    parser.add_argument('--user', '-u', dest='users', action='append', type=user_password,
+                        metavar='USER:PASSWORD',
+                        help='login used by --scenario journeys (repeatable)')
+    parser.add_argument('--think-time', type=float, default=1.0,
+                        help='mean pause between journey steps, seconds')
+    parser.add_argument('--think-dist', choices=['constant', 'uniform', 'exponential'], default='exponential',
+                        help='distribution of the pause between journey steps')
+    parser.add_argument('--no-keepalive', action='store_true',
+                        help='open a new connection for every request instead of reusing them')
+    parser.add_argument('--output', '-o', metavar='DIR',
+                        help='write results.json, endpoints.csv, status.csv and timeline.csv here')
+    parser.add_argument('--profile', metavar='ramp|step|soak|spike|STAGES',
+                        help='vary --rate over the run; STAGES is "seconds:rate,..." with linear ramps between '
+                             'targets, e.g. "30:50,120:50,10:500,60:50"')
+    parser.add_argument('--start-rate', type=float, default=0,
+                        help='rate the ramp profile and STAGES start from')
+    parser.add_argument('--steps', type=int, default=5, help='stages in the step profile')
+    parser.add_argument('--spike-rate', type=float, help='peak rate of the spike profile (default 5x --rate)')
+    parser.add_argument('--find-max', action='store_true',
+                        help='step the rate up from --rate, one --duration per step, until the SLO breaks')
+    parser.add_argument('--slo-p99', type=float, default=500, help='p99 latency SLO for --find-max, ms')
+    parser.add_argument('--slo-errors', type=float, default=0.01, help='error-rate SLO for --find-max, 0-1')
+    parser.add_argument('--growth', type=float, default=1.5, help='rate multiplier between --find-max steps')
+    parser.add_argument('--bisect', type=int, default=3, help='refinement steps after the SLO first breaks')
+    parser.add_argument('--max-rate', type=float, default=100000, help='give up --find-max above this rate')
+    parser.add_argument('--save', action='store_true',
+                        help='store the run, tagged with the git revision, for later comparison')
+    parser.add_argument('--results-dir', default=RESULTS_DIR, help='where --save stores runs')
+    parser.add_argument('--replay', metavar='ACCESS_LOG',
+                        help='replay the requests in an nginx/Django access log (.gz ok) instead of ENDPOINTS; '
+                             'runs until the log ends or --duration expires')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help='replay at this multiple of the logged pace (ignored with --rate)')
+    parser.add_argument('--replay-methods', default='GET,HEAD',
+                        help='comma-separated methods to replay; others are skipped')
+    parser.add_argument('--replay-exclude', default=r'^/(static|media)/',
+                        help='regex of paths to skip')
+    parser.add_argument('--live', action='store_true',
+                        help='refresh a per-endpoint dashboard (req/s, errors, rolling p50/p99) every second')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='serve Prometheus metrics on http://127.0.0.1:PORT/metrics during the run')
+    parser.add_argument('--agents', type=int, default=0,
+                        help='act as controller: wait for this many agents and split the load between them')
+    parser.add_argument('--listen', default=f'0.0.0.0:{CONTROL_PORT}', metavar='HOST:PORT',
+                        help='where the controller waits for agents')
     args = parser.parse_args()
-    print(f'Starting load test: concurrency={args.concurrency}, duration={args.duration}s, base={BASE}')
-    asyncio.run(run(args.concurrency, args.duration))
+    BASE = args.base.rstrip('/')
+    if (args.profile or args.find_max) and not args.rate:
+        parser.error('--profile and --find-max need --rate')
+    if args.agents and args.find_max:
+        parser.error('--find-max runs locally; it cannot be combined with --agents')
+    if (args.live or args.metrics_port) and (args.processes != 1 or args.agents):
+        parser.error('--live and --metrics-port need a single local process (no --processes or --agents)')
+    if args.replay and (args.scenario or args.profile or args.find_max):
+        parser.error('--replay cannot be combined with --scenario, --profile or --find-max')
+    args.replay_shard = (0, 1)
+    args.stages = profile_stages(args) if args.profile else None
+    if args.stages:
+        args.duration = sum(d for d, _, _ in args.stages)
+    args.users = args.users or DEFAULT_USERS
+    if args.processes <= 0:
+        args.processes = os.cpu_count() or 1
+    if args.replay and not args.rate:
+        print(f'Starting replay of {args.replay} at {args.replay_speed:g}x, duration<={args.duration}s, '
+              f'processes={args.processes}, base={BASE}')
+    elif args.rate:
+        print(f'Starting load test: rate={args.rate}/s ({args.arrival}), duration={args.duration}s, processes={args.processes}, base={BASE}')
+    else:
+        print(f'Starting load test: concurrency={args.concurrency}, duration={args.duration}s, processes={args.processes}, base={BASE}')
+    if args.find_max:
+        find_max(args)
+    else:
+        run(args)
 
-if _name_ == '_main_':
-    main()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+"""Bulk synthetic data for benchmarking the shop.
+
+Fills the shop database with proveedores, users, productos, carritos and
+pedidos so the catalog, search, cart and admin views are measured against
+a realistically sized database instead of the one or two rows the unit
+tests create:
+
+    python seed_data.py --project /path/to/django/project --settings tienda.settings \\
+        --productos 200000 --usuarios 20000 --pedidos 100000 --seed 42
+
+The same --seed produces the same data from the same starting database.
+Seeded usernames continue after the seed_ users already there, and
+foreign keys point at the rows that exist, including unseeded ones. To
+reproduce a data set exactly, seed an empty database, or use --clear on
+one whose unseeded rows have not changed. Rows are built in chunks
+and written with bulk_create, one transaction per chunk. Seeded users are
+named seed_<n> and share one pre-hashed password, and seeded productos
+and proveedores are named "[seed] ...", so --clear can remove them along
+with everything that depends on them. Use --clear before seeding again.
+
+Only nombre/descripcion/precio/stock on Producto, usuario and total on
+Carrito and Pedido, carrito/producto/cantidad on ItemCarrito, and
+cantidad/precio*/subtotal on the order lines are set by name. Any other
+required field, and the Proveedor model, is filled by field type, and
+order lines are found as the shop model with foreign keys to both Pedido
+and Producto. Line prices are the producto's price and Pedido.total is
+the sum of its lines. Dates fall in the two years before SEED_EPOCH, not
+before today, and auto_now/auto_now_add fields, which bulk_create stamps
+with the current time, are rewritten with seeded dates after the insert.
+"""
+import argparse
+import datetime
+import decimal
+import os
+import random
+import string
+import sys
+import time
+
+WINE_TYPES = ['Vino Tinto', 'Vino Blanco', 'Vino Rosado', 'Espumante', 'Vino Reserva', 'Gran Reserva']
+GRAPES = ['Cabernet Sauvignon', 'Merlot', 'Malbec', 'Carménère', 'Syrah', 'Chardonnay',
+          'Sauvignon Blanc', 'Tempranillo', 'Pinot Noir', 'Garnacha', 'Riesling']
+ORIGINS = ['chileno', 'argentino', 'español', 'francés', 'italiano', 'portugués', 'australiano']
+WINERIES = ['Los Andes', 'Santa Rita', 'El Olivar', 'Monte Alto', 'La Rioja', 'Valle Sur', 'Casa Blanca',
+            'Viña Norte', 'Don Pedro', 'Las Piedras', 'San Telmo', 'Finca Vieja']
+FIRST_NAMES = ['Ana', 'Luis', 'María', 'Carlos', 'Sofía', 'Jorge', 'Valentina', 'Andrés', 'Camila', 'Diego']
+LAST_NAMES = ['García', 'Rodríguez', 'Martínez', 'López', 'Gómez', 'Pérez', 'Sánchez', 'Ramírez', 'Torres']
+
+SEED_PREFIX = 'seed_'
+SEED_MARK = '[seed]'
+SEED_PASSWORD = 'Seed12345!'
+# seeded dates count back from here, so they do not depend on the day the seeder runs
+SEED_EPOCH = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def chunks(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+def last_pk(model):
+    return model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def bulk_insert(model, build, total, batch_size, label, rng):
+    """Insert the rows built by build(offset, count) for offsets up to `total`, one transaction per chunk.
+
+    Returns the highest pk before the insert, so the new rows are the ones above it.
+    """
+    from django.db import transaction
+    first = last_pk(model)
+    if not total:
+        return first
+    started = time.time()
+    inserted = 0
+    for offset, count in chunks(total, batch_size):
+        rows = build(offset, count)
+        with transaction.atomic():
+            model.objects.bulk_create(rows, batch_size=batch_size)
+        inserted += len(rows)
+    backfill_dates(model, rng, first, batch_size)
+    elapsed = time.time() - started
+    print(f'  {label}: {inserted} rows in {elapsed:.1f}s ({inserted / max(elapsed, 1e-9):.0f} rows/s)')
+    return first
+
+
+def backfill_dates(model, rng, after_pk, batch_size):
+    """Give the rows above after_pk seeded dates in the auto_now/auto_now_add fields bulk_create stamped."""
+    from django.db import models, transaction
+    fields = [f for f in model._meta.concrete_fields
+              if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)]
+    if not fields:
+        return
+    pks = list(model.objects.filter(pk__gt=after_pk).order_by('pk').values_list('pk', flat=True))
+    for offset, count in chunks(len(pks), batch_size):
+        rows = []
+        for pk in pks[offset:offset + count]:
+            moment = random_datetime(rng)
+            rows.append(model(pk=pk, **{f.attname: moment if isinstance(f, models.DateTimeField) else moment.date()
+                                        for f in fields}))
+        with transaction.atomic():
+            model.objects.bulk_update(rows, [f.name for f in fields])
+
+
+class FieldFiller:
+    """Values for required fields whose meaning we don't know, chosen by field type."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.related_pks = {}
+
+    def required_fields(self, model, known):
+        from django.db import models
+        for field in model._meta.concrete_fields:
+            if (field.name in known or field.attname in known or field.primary_key or field.null or field.has_default()
+                    or isinstance(field, models.AutoField) or getattr(field, 'auto_now', False)
+                    or getattr(field, 'auto_now_add', False)):
+                continue
+            if field.blank and isinstance(field, (models.CharField, models.TextField)):
+                continue
+            yield field
+
+    def value(self, field, n):
+        from django.db import models
+        rng = self.rng
+        if field.choices:
+            return rng.choice([key for key, _ in field.flatchoices])
+        if isinstance(field, models.ForeignKey):
+            return self.related_pk(field.related_model)
+        if isinstance(field, models.EmailField):
+            return f'{SEED_PREFIX}{n}@example.com'
+        if isinstance(field, (models.CharField, models.TextField)):
+            name = field.name.lower()
+            if 'telefono' in name or 'phone' in name:
+                text = f'3{rng.randrange(10 ** 9):09d}'
+            elif 'nombre' in name or 'name' in name:
+                text = f'{SEED_MARK} Bodega {rng.choice(WINERIES)} {n}'
+            elif 'direccion' in name or 'address' in name:
+                text = f'Calle {rng.randint(1, 200)} # {rng.randint(1, 99)}-{rng.randint(1, 99)}'
+            else:
+                text = f'{rng.choice(GRAPES)} {rng.choice(ORIGINS)} {n}'
+            return text[:field.max_length] if field.max_length else text
+        if isinstance(field, models.BooleanField):
+            return rng.random() < 0.5
+        if isinstance(field, models.DecimalField):
+            return decimal.Decimal(rng.randint(1000, 500000))
+        if isinstance(field, (models.IntegerField, models.FloatField)):
+            return rng.randint(1, 100)
+        if isinstance(field, models.DateTimeField):
+            return random_datetime(rng)
+        if isinstance(field, models.DateField):
+            return random_datetime(rng).date()
+        raise ValueError(f'cannot invent a value for {field.model.__name__}.{field.name} ({type(field).__name__})')
+
+    def related_pk(self, model):
+        if model not in self.related_pks:
+            self.related_pks[model] = list(model.objects.order_by('pk').values_list('pk', flat=True)[:100000])
+        if not self.related_pks[model]:
+            raise ValueError(f'{model.__name__} has no rows to point a required foreign key at')
+        return self.rng.choice(self.related_pks[model])
+
+    def fill(self, model, values, n):
+        for field in self.required_fields(model, values):
+            values[field.attname if field.is_relation else field.name] = self.value(field, n)
+        return model(**values)
+
+
+def random_datetime(rng, days=730):
+    from django.conf import settings
+    from django.utils import timezone
+    moment = SEED_EPOCH - datetime.timedelta(seconds=rng.randrange(days * 86400))
+    return moment if settings.USE_TZ else timezone.make_naive(moment)
+
+
+def zipf_picker(rng, pks, s=1.1):
+    """Pick pks with Zipf-like popularity: a few bestsellers, a long tail."""
+    weights = [1 / (rank + 1) ** s for rank in range(len(pks))]
+    order = list(pks)
+    rng.shuffle(order)
+    cumulative = []
+    total = 0
+    for w in weights:
+        total += w
+        cumulative.append(total)
+
+    def pick(k=1):
+        return rng.choices(order, cum_weights=cumulative, k=k)
+    return pick
+
+
+def field_names(model):
+    return {f.name for f in model._meta.concrete_fields}
+
+
+def order_line_model(app_models, pedido, producto):
+    for model in app_models:
+        targets = {f.related_model for f in model._meta.concrete_fields if f.is_relation}
+        if pedido in targets and producto in targets:
+            return model
+    return None
+
+
+def clear(models_by_name, user_model):
+    """Delete seeded users and every shop row that hangs off them, then seeded productos and proveedores."""
+    seeded_users = user_model.objects.filter(username__startswith=SEED_PREFIX)
+    for name in ('Pedido', 'Carrito'):
+        model = models_by_name.get(name)
+        if model:
+            model.objects.filter(usuario__in=seeded_users).delete()
+    seeded_users.delete()
+    for name in ('Producto', 'Proveedor'):
+        model = models_by_name.get(name)
+        if model and 'nombre' in field_names(model):
+            model.objects.filter(nombre__startswith=SEED_MARK).delete()
+
+
+def seed(opts):
+    from django.apps import apps
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.db import transaction
+
+    rng = random.Random(opts.seed)
+    filler = FieldFiller(rng)
+    app_models = list(apps.get_app_config(opts.app).get_models())
+    models_by_name = {m.__name__: m for m in app_models}
+    User = get_user_model()
+    Producto = models_by_name['Producto']
+    Proveedor = models_by_name.get('Proveedor')
+    Carrito = models_by_name.get('Carrito')
+    ItemCarrito = models_by_name.get('ItemCarrito')
+    Pedido = models_by_name.get('Pedido')
+    batch = opts.batch_size
+
+    if opts.clear:
+        clear(models_by_name, User)
+        print('Removed previously seeded rows')
+
+    print(f'Seeding (seed={opts.seed}, batch={batch})')
+    if Proveedor:
+        bulk_insert(Proveedor, lambda offset, count: [
+            filler.fill(Proveedor, {}, offset + i) for i in range(count)], opts.proveedores, batch, 'proveedores', rng)
+    proveedor_pks = list(Proveedor.objects.order_by('pk').values_list('pk', flat=True)) if Proveedor else []
+
+    producto_fields = field_names(Producto)
+
+    def build_productos(offset, count):
+        rows = []
+        for i in range(offset, offset + count):
+            tipo, uva, origen = rng.choice(WINE_TYPES), rng.choice(GRAPES), rng.choice(ORIGINS)
+            values = {
+                'nombre': f'{SEED_MARK} {tipo} {uva} {rng.choice(WINERIES)} {rng.randint(1990, 2024)} #{i}',
+                'descripcion': f'{tipo} de {uva} {origen}, botella de {rng.choice([375, 750, 750, 750, 1500])}ml',
+                # log-normal prices centred around 45.000 with a long premium tail
+                'precio': int(round(rng.lognormvariate(10.7, 0.6), -2)),
+                # about 5% out of stock, the rest mostly small
+                'stock': 0 if rng.random() < 0.05 else int(rng.expovariate(1 / 40)) + 1,
+            }
+            if 'proveedor' in producto_fields and proveedor_pks:
+                values['proveedor_id'] = rng.choice(proveedor_pks)
+            rows.append(filler.fill(Producto, values, i))
+        return rows
+    bulk_insert(Producto, build_productos, opts.productos, batch, 'productos', rng)
+
+    # a seeded salt, or the hash would be the one column that differs between runs; 22 characters
+    # like Django's own, so logging in does not rehash the password and write to the user row
+    password = make_password(SEED_PASSWORD, salt=''.join(rng.choices(string.ascii_letters + string.digits, k=22)))
+    start_user = User.objects.filter(username__startswith=SEED_PREFIX).count()
+
+    def build_users(offset, count):
+        rows = []
+        for i in range(start_user + offset, start_user + offset + count):
+            rows.append(User(username=f'{SEED_PREFIX}{i}', email=f'{SEED_PREFIX}{i}@example.com', password=password,
+                             first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                             date_joined=random_datetime(rng)))
+        return rows
+    bulk_insert(User, build_users, opts.usuarios, batch, 'usuarios', rng)
+
+    user_pks = list(User.objects.filter(username__startswith=SEED_PREFIX).order_by('pk').values_list('pk', flat=True))
+    precios = dict(Producto.objects.filter(stock__gt=0).order_by('pk').values_list('pk', 'precio'))
+    producto_pks = list(precios)
+    if not user_pks or not producto_pks:
+        print('No users or in-stock productos to build carts and orders from')
+        return
+    pick_producto = zipf_picker(rng, producto_pks)
+
+    if Carrito and ItemCarrito:
+        cart_users = rng.sample(user_pks, int(len(user_pks) * opts.carritos))
+        first_carrito = bulk_insert(Carrito, lambda offset, count: [
+            filler.fill(Carrito, {'usuario_id': pk}, offset + i)
+            for i, pk in enumerate(cart_users[offset:offset + count])], len(cart_users), batch, 'carritos', rng)
+        # by pk range, not usuario_id__in: hundreds of thousands of ids overflow SQLite's variable limit
+        carrito_pks = list(Carrito.objects.filter(pk__gt=first_carrito).order_by('pk').values_list('pk', flat=True))
+
+        def build_items(offset, count):
+            rows = []
+            for carrito_pk in carrito_pks[offset:offset + count]:
+                # a handful of distinct productos per cart
+                for producto_pk in set(pick_producto(rng.choice([1, 1, 2, 2, 3, 4, 6]))):
+                    rows.append(filler.fill(ItemCarrito, {'carrito_id': carrito_pk, 'producto_id': producto_pk,
+                                                          'cantidad': rng.choice([1, 1, 1, 2, 3])}, carrito_pk))
+            return rows
+        bulk_insert(ItemCarrito, build_items, len(carrito_pks), max(batch // 3, 1), 'items de carrito', rng)
+
+    if Pedido and opts.pedidos:
+        Linea = order_line_model(app_models, Pedido, Producto)
+        # with lines to add up, the total is filled in from them afterwards
+        pedido_base = {'total': 0} if Linea and 'total' in field_names(Pedido) else {}
+        # Pareto-distributed order counts: most customers order once or twice, a few very often
+        weights = [rng.paretovariate(1.5) for _ in user_pks]
+        first_pedido = bulk_insert(Pedido, lambda offset, count: [
+            filler.fill(Pedido, dict(pedido_base, usuario_id=pk), offset + i)
+            for i, pk in enumerate(rng.choices(user_pks, weights=weights, k=count))],
+            opts.pedidos, batch, 'pedidos', rng)
+        if Linea:
+            pedido_fk = next(f for f in Linea._meta.concrete_fields if f.is_relation and f.related_model is Pedido)
+            producto_fk = next(f for f in Linea._meta.concrete_fields
+                               if f.is_relation and f.related_model is Producto)
+            linea_fields = field_names(Linea)
+            precio_field = next((f.name for f in Linea._meta.concrete_fields
+                                 if f.name.startswith('precio') and not f.is_relation), None)
+            pedido_pks = list(Pedido.objects.filter(pk__gt=first_pedido).order_by('pk').values_list('pk', flat=True))
+            totales = {}
+
+            def build_lines(offset, count):
+                rows = []
+                for pedido_pk in pedido_pks[offset:offset + count]:
+                    total = 0
+                    for producto_pk in set(pick_producto(rng.choice([1, 1, 2, 3, 5]))):
+                        # mostly single bottles, now and then a case of six or twelve
+                        cantidad = rng.choice([1, 1, 1, 2, 2, 3, 6, 12])
+                        values = {pedido_fk.attname: pedido_pk, producto_fk.attname: producto_pk}
+                        if 'cantidad' in linea_fields:
+                            values['cantidad'] = cantidad
+                        if precio_field:
+                            values[precio_field] = precios[producto_pk]
+                        if 'subtotal' in linea_fields:
+                            values['subtotal'] = precios[producto_pk] * cantidad
+                        total += precios[producto_pk] * cantidad
+                        rows.append(filler.fill(Linea, values, pedido_pk))
+                    totales[pedido_pk] = total
+                return rows
+            bulk_insert(Linea, build_lines, len(pedido_pks), max(batch // 3, 1),
+                        Linea.__name__, rng)
+            if pedido_base:
+                for offset, count in chunks(len(pedido_pks), batch):
+                    with transaction.atomic():
+                        Pedido.objects.bulk_update([Pedido(pk=pk, total=totales[pk])
+                                                    for pk in pedido_pks[offset:offset + count]], ['total'])
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-generate benchmark data for the shop app.')
+    parser.add_argument('--project', default='.', help='directory that contains the Django project')
+    parser.add_argument('--settings', help='settings module (default: $DJANGO_SETTINGS_MODULE)')
+    parser.add_argument('--app', default='shop', help='app label of the shop models')
+    parser.add_argument('--productos', type=int, default=10000)
+    parser.add_argument('--proveedores', type=int, default=200)
+    parser.add_argument('--usuarios', type=int, default=2000)
+    parser.add_argument('--carritos', type=float, default=0.3, help='share of seeded users with an open cart')
+    parser.add_argument('--pedidos', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=42, help='same seed, same data')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--clear', action='store_true', help='delete previously seeded rows first')
+    opts = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(opts.project))
+    if opts.settings:
+        os.environ['DJANGO_SETTINGS_MODULE'] = opts.settings
+    if not os.environ.get('DJANGO_SETTINGS_MODULE'):
+        parser.error('pass --settings or set DJANGO_SETTINGS_MODULE')
+    import django
+    django.setup()
+    started = time.time()
+    seed(opts)
+    print(f'Done in {time.time() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+"""Unit tests for prueba_carga.py.
+
+Run from this directory with:
+
+    python -m unittest test_prueba_carga
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import math
+import socket
+import time
+import unittest
+
+import aiohttp.web
+
+import prueba_carga
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def load_options(**overrides):
+    """The options generate() and control() read, for a short closed-loop run."""
+    opts = argparse.Namespace(concurrency=4, duration=1, rate=None, stages=None, arrival='uniform',
+                              max_inflight=100, late_ms=10, precision=3, live=False, metrics_port=None,
+                              no_keepalive=False, replay=None, scenario=False, replay_shard=(0, 1),
+                              agents=2, listen=f'127.0.0.1:{free_port()}')
+    for key, value in overrides.items():
+        setattr(opts, key, value)
+    return opts
+
+
+def histogram(values, significant_figures=3):
+    h = prueba_carga.Histogram(significant_figures)
+    for value in values:
+        h.record(value)
+    return h
+
+
+class HistogramTest(unittest.TestCase):
+    def test_percentiles_keep_the_significant_figures(self):
+        h = histogram(range(1, 1001))
+        for p, expected in ((50, 500), (90, 900), (99, 990)):
+            self.assertAlmostEqual(h.percentile(p), expected, delta=expected / 1000)
+        self.assertEqual(h.percentile(100), 1000)
+        self.assertEqual((h.min(), h.max(), h.total), (1, 1000, 1000))
+        self.assertAlmostEqual(h.mean(), 500.5)
+
+    def test_empty_histogram_reports_zero(self):
+        h = prueba_carga.Histogram()
+        self.assertEqual((h.percentile(99), h.mean(), h.min(), h.max()), (0, 0, 0, 0))
+
+    def test_values_past_the_range_are_clamped(self):
+        h = histogram([120000])
+        self.assertEqual(h.max(), h.max_value_ms)
+        self.assertEqual(h.percentile(50), h.max_value_ms)
+
+    def test_merge_matches_recording_everything_in_one(self):
+        fast, slow = histogram([1.5, 2, 2.5] * 10), histogram([40, 80, 250])
+        merged = prueba_carga.Histogram().merge(fast).merge(slow)
+        together = histogram([1.5, 2, 2.5] * 10 + [40, 80, 250])
+        self.assertEqual(merged.counts, together.counts)
+        self.assertEqual((merged.total, merged.min(), merged.max()), (33, 1.5, 250))
+        for p in prueba_carga.PERCENTILES:
+            self.assertEqual(merged.percentile(p), together.percentile(p))
+
+    def test_merge_rejects_different_settings(self):
+        with self.assertRaises(ValueError):
+            prueba_carga.Histogram(3).merge(prueba_carga.Histogram(2))
+
+    def test_dict_round_trip(self):
+        h = histogram([0.2, 3, 3, 47.5, 1200])
+        restored = prueba_carga.Histogram.from_dict(h.to_dict())
+        self.assertEqual(restored.counts, h.counts)
+        self.assertEqual(restored.summary(), h.summary())
+
+
+class ArrivalScheduleTest(unittest.TestCase):
+    RAMP = [(60, 0, 100)]
+    STAGES = [(10, 0, 20), (10, 20, 20), (5, 20, 0)]
+
+    def test_rate_at_interpolates_each_stage(self):
+        self.assertEqual(prueba_carga.rate_at(self.RAMP, 30), 50)
+        self.assertEqual(prueba_carga.rate_at(self.STAGES, 5), 10)
+        self.assertEqual(prueba_carga.rate_at(self.STAGES, 15), 20)
+        self.assertEqual(prueba_carga.rate_at(self.STAGES, 22.5), 10)
+
+    def test_rate_at_holds_the_last_rate(self):
+        self.assertEqual(prueba_carga.rate_at(self.RAMP, 90), 100)
+
+    def test_expected_arrivals_is_the_integral_of_the_rate(self):
+        self.assertAlmostEqual(prueba_carga.expected_arrivals(self.RAMP, 12), 120)
+        self.assertAlmostEqual(prueba_carga.expected_arrivals(self.RAMP, 60), 3000)
+        self.assertAlmostEqual(prueba_carga.expected_arrivals(self.RAMP, 61), 3100)
+        self.assertAlmostEqual(prueba_carga.expected_arrivals(self.STAGES, 25), 100 + 200 + 50)
+        self.assertAlmostEqual(prueba_carga.expected_arrivals([(10, 5, 5)], 4), 20)
+
+    def test_arrival_time_inverts_expected_arrivals(self):
+        for stages in (self.RAMP, self.STAGES, [(10, 5, 5)], [(30, 0.01, 100), (30, 100, 10)]):
+            for count in (0.5, 1, 7, 99, 100, 101, 349):
+                elapsed = prueba_carga.arrival_time(stages, count)
+                if math.isfinite(elapsed):
+                    self.assertAlmostEqual(prueba_carga.expected_arrivals(stages, elapsed), count, places=6)
+
+    def test_ramp_from_a_tiny_rate_starts_sending_at_once(self):
+        # 1/rate at t=0 would wait 100 s for the first request of this ramp
+        self.assertLess(prueba_carga.arrival_time([(60, 0.01, 100)], 1), 1.2)
+
+    def test_no_more_arrivals_after_the_rate_drops_to_zero(self):
+        self.assertEqual(prueba_carga.arrival_time(self.STAGES, 351), math.inf)
+
+
+class ServerTimingTest(unittest.TestCase):
+    def test_parses_every_metric_with_a_duration(self):
+        header = ('db;dur=12.4;desc="7 queries", db_queries;dur=7, template;dur=3.1, '
+                  'view;dur=5.2, total;dur=20.7')
+        self.assertEqual(prueba_carga.parse_server_timing(header),
+                         {'db': 12.4, 'db_queries': 7.0, 'template': 3.1, 'view': 5.2, 'total': 20.7})
+
+    def test_description_before_duration(self):
+        self.assertEqual(prueba_carga.parse_server_timing('cache;desc="hit";dur=0.8'), {'cache': 0.8})
+
+    def test_skips_metrics_without_a_duration(self):
+        self.assertEqual(prueba_carga.parse_server_timing('miss, cdn;desc=edge, app;dur=2'), {'app': 2.0})
+
+    def test_missing_header(self):
+        self.assertEqual(prueba_carga.parse_server_timing(None), {})
+        self.assertEqual(prueba_carga.parse_server_timing(''), {})
+
+
+class MannWhitneyTest(unittest.TestCase):
+    def test_identical_runs_are_not_different(self):
+        base = histogram(range(1, 101))
+        self.assertEqual(prueba_carga.mann_whitney(base, histogram(range(1, 101))), (0.5, 1.0))
+
+    def test_slower_candidate(self):
+        slower_prob, p_value = prueba_carga.mann_whitney(histogram(range(1, 101)), histogram(range(201, 301)))
+        self.assertEqual(slower_prob, 1.0)
+        self.assertLess(p_value, 1e-6)
+
+    def test_faster_candidate(self):
+        slower_prob, p_value = prueba_carga.mann_whitney(histogram(range(201, 301)), histogram(range(1, 101)))
+        self.assertEqual(slower_prob, 0.0)
+        self.assertLess(p_value, 1e-6)
+
+    def test_u_matches_counting_pairs(self):
+        base, candidate = [1, 3, 5, 7, 9], [2, 4, 6, 8, 10, 12]
+        slower = sum(c > b for c in candidate for b in base) / (len(base) * len(candidate))
+        slower_prob, _ = prueba_carga.mann_whitney(histogram(base), histogram(candidate))
+        self.assertAlmostEqual(slower_prob, slower)
+
+    def test_ties_count_as_half(self):
+        slower_prob, _ = prueba_carga.mann_whitney(histogram([5, 5, 10]), histogram([5, 10, 10]))
+        self.assertAlmostEqual(slower_prob, (0.5 * 2 + 0 + 1 * 2 + 0.5 + 1 * 2 + 0.5) / 9)
+
+    def test_single_samples_and_empty_sides(self):
+        self.assertEqual(prueba_carga.mann_whitney(histogram([5]), histogram([5])), (0.5, 1.0))
+        self.assertEqual(prueba_carga.mann_whitney(prueba_carga.Histogram(), histogram([5])), (0.5, 1.0))
+        self.assertEqual(prueba_carga.mann_whitney(histogram([5]), prueba_carga.Histogram()), (0.5, 1.0))
+
+    def test_rejects_histograms_with_different_settings(self):
+        with self.assertRaises(ValueError):
+            prueba_carga.mann_whitney(histogram([1, 2], 3), histogram([1, 2], 2))
+
+
+class ShardOptionsTest(unittest.TestCase):
+    def test_every_shard_carries_the_target(self):
+        # spawned worker processes do not inherit the parent's BASE
+        previous, prueba_carga.BASE = prueba_carga.BASE, 'http://shop.test:8080'
+        try:
+            shards = prueba_carga.shard_options(load_options(concurrency=5, agents=0), 2)
+        finally:
+            prueba_carga.BASE = previous
+        self.assertEqual([shard.base for shard in shards], ['http://shop.test:8080'] * 2)
+        self.assertEqual([shard.concurrency for shard in shards], [3, 2])
+
+
+class OpenLoopTest(unittest.IsolatedAsyncioTestCase):
+    """--rate sends on a schedule that does not wait for responses."""
+
+    async def run_open_loop(self, launch, rate=50, duration=1, max_inflight=100):
+        stats = prueba_carga.new_stats(3)
+        await prueba_carga.open_loop(launch, [(duration, rate, rate)], 'uniform', time.time() + duration,
+                                     max_inflight, 10, stats)
+        return stats
+
+    async def test_sends_at_the_rate_however_slow_the_server(self):
+        scheduled = []
+
+        async def slow_launch(at):
+            scheduled.append(at)
+            await asyncio.sleep(0.3)
+
+        stats = await self.run_open_loop(slow_launch)
+        self.assertIn(stats['scheduled'], range(48, 51))
+        self.assertEqual(len(scheduled), stats['scheduled'])
+        self.assertEqual(stats['dropped'], 0)
+        gaps = [b - a for a, b in zip(scheduled, scheduled[1:])]
+        for gap in gaps:
+            self.assertAlmostEqual(gap, 0.02, places=6)
+
+    async def test_drops_sends_over_the_in_flight_cap(self):
+        released = asyncio.Event()
+        asyncio.get_running_loop().call_later(1.2, released.set)
+
+        async def stuck_launch(at):
+            await released.wait()
+
+        stats = await self.run_open_loop(stuck_launch, max_inflight=5)
+        self.assertGreater(stats['scheduled'], 5)
+        self.assertEqual(stats['dropped'], stats['scheduled'] - 5)
+
+
+class DistributedTest(unittest.IsolatedAsyncioTestCase):
+    """A controller and its agents on localhost, loading a stub shop."""
+
+    async def asyncSetUp(self):
+        async def shop(request):
+            return aiohttp.web.Response(text='ok')
+
+        app = aiohttp.web.Application()
+        app.router.add_route('*', '/{tail:.*}', shop)
+        self.runner = aiohttp.web.AppRunner(app)
+        await self.runner.setup()
+        port = free_port()
+        await aiohttp.web.TCPSite(self.runner, '127.0.0.1', port).start()
+        self.previous_base = prueba_carga.BASE
+        prueba_carga.BASE = f'http://127.0.0.1:{port}'
+
+    async def asyncTearDown(self):
+        prueba_carga.BASE = self.previous_base
+        await self.runner.cleanup()
+
+    async def connect(self, start_agent, address):
+        """Retry until the controller listens, then run the agent."""
+        for _ in range(100):
+            try:
+                return await start_agent(address)
+            except ConnectionRefusedError:
+                await asyncio.sleep(0.05)
+        self.fail(f'controller never listened on {address}')
+
+    async def run_controller(self, opts, *agents):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            controller = asyncio.create_task(prueba_carga.control(opts))
+            tasks = [asyncio.create_task(self.connect(start_agent, opts.listen)) for start_agent in agents]
+            stats = await asyncio.wait_for(controller, timeout=30)
+            await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=30)
+        return stats, output.getvalue()
+
+    async def test_merges_every_agent(self):
+        stats, _ = await self.run_controller(load_options(), prueba_carga.agent, prueba_carga.agent)
+        self.assertGreater(stats['total'], 0)
+        self.assertEqual(stats['errors'], 0)
+        self.assertEqual(stats['latency'].total, stats['total'])
+
+    async def test_an_agent_that_disconnects_loses_only_its_share(self):
+        async def dropping_agent(address):
+            host, port = prueba_carga.parse_address(address, '127.0.0.1')
+            reader, writer = await asyncio.open_connection(host, port)
+            await prueba_carga.send_message(writer, {'type': 'hello', 'host': 'dropping', 'cpus': 1})
+            await prueba_carga.read_message(reader)
+            await prueba_carga.send_message(writer, {'type': 'ready'})
+            await prueba_carga.read_message(reader)
+            writer.close()
+
+        stats, output = await self.run_controller(load_options(), prueba_carga.agent, dropping_agent)
+        self.assertGreater(stats['total'], 0)
+        self.assertIn('(dropping) failed', output)
+        self.assertIn('merging results from 1 of 2 agents', output)
+
+
+if __name__ == '__main__':
+    unittest.main()
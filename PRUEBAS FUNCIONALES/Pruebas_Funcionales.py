@@ -1,8 +1,30 @@
 
+import argparse
+import atexit
+import functools
+import hashlib
+import importlib
+import io
+import json
 import os
+import re
+import shutil
+import subprocess
 import sys
+import tempfile
+import threading
 import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from statistics import median
+from http.cookiejar import CookieJar
+from urllib.parse import urlencode, urlparse
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+try:
+    from PIL import Image, ImageChops
+except ImportError:  # sin Pillow: deduplicación exacta y sin diferencias por píxel
+    Image = None
 
 
 if sys.platform.startswith('win'):
@@ -16,19 +38,474 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException, ElementClickInterceptedException
+from selenium.common.exceptions import (NoSuchElementException, TimeoutException, ElementClickInterceptedException,
+                                        SessionNotCreatedException, WebDriverException)
 from webdriver_manager.chrome import ChromeDriverManager
 
 
 URL_BASE = "http://127.0.0.1:8000/"
 RUTA_CAPTURAS = os.path.join(os.getcwd(), "Capturas_Completas")
+# Capturas de referencia: las PNG versionadas junto a este archivo
+RUTA_BASE_CAPTURAS = os.environ.get("WINESHOP_BASE_CAPTURAS",
+                                    os.path.dirname(os.path.abspath(__file__)))
 
 USUARIO_CLIENTE = {"usuario": "cliente1", "clave": "Cliente123!"}
 USUARIO_ADMIN = {"usuario": "admin", "clave": "Admin12345!"}
 
+TIEMPO_ESPERA = 15          # segundos máximos para cualquier espera
+INTERVALO_SONDEO = 0.1      # cada cuánto se revisa la condición
+RED_QUIETA = 0.5            # segundos sin peticiones nuevas para considerar la red inactiva
+
+NAVEGADOR_HEADLESS = False  # se activa con --headless y siempre en ejecución paralela
+NAVEGADORES_PRECALENTADOS = 1  # navegadores que se arrancan antes de que los pida la primera prueba
+CACHE_CHROMEDRIVER = os.path.join(os.path.expanduser("~"), ".cache", "wineshop", "chromedriver.json")
+
+# Proyecto Django que sirve URL_BASE. Si está configurado, las pruebas crean la
+# sesión autenticada directamente en su base de datos; si no, con un POST al login
+# sin navegador. Solo test_06_login_por_formulario usa la interfaz.
+PROYECTO_DJANGO = os.environ.get("WINESHOP_PROYECTO", "")
+COOKIE_SESION = "sessionid"  # nombre por defecto cuando no se puede leer de settings
+CSRF_RE = re.compile(r'name=["\']csrfmiddlewaretoken["\']\s+value=["\']([^"\']+)')
+
+# Presupuestos de rendimiento por página (ver nombre_pagina). "*" se aplica a
+# todas; un archivo JSON pasado con --presupuestos sobrescribe estos valores.
+# Los tiempos están en milisegundos, el peso en bytes transferidos.
+PRESUPUESTOS = {
+    "*": {"ttfb_ms": 800, "dom_ms": 2000, "load_ms": 3000, "lcp_ms": 2500,
+          "bytes": 2_000_000, "peticiones": 60},
+}
+TAMANO_HASH = 16           # hash perceptual de 16x16 bits
+UMBRAL_PIXEL = 24          # diferencia por canal a partir de la cual un píxel cuenta como cambiado
+UMBRAL_CAMBIO = 0.01       # fracción de píxeles cambiados para marcar una captura como distinta de la base
+
+METRICAS = ("ttfb_ms", "fcp_ms", "dom_ms", "load_ms", "lcp_ms", "bytes", "peticiones")
+
+# Navigation Timing + Paint Timing del documento actual. LCP se lee de los
+# registros en búfer con takeRecords(), sin esperar al callback asíncrono.
+SCRIPT_RENDIMIENTO = """
+var nav = performance.getEntriesByType('navigation')[0];
+if (!nav) { return null; }
+var recursos = performance.getEntriesByType('resource');
+var fcp = performance.getEntriesByName('first-contentful-paint')[0];
+var lcp = null;
+try {
+    var observador = new PerformanceObserver(function () {});
+    observador.observe({type: 'largest-contentful-paint', buffered: true});
+    var registros = observador.takeRecords();
+    observador.disconnect();
+    if (registros.length) { lcp = registros[registros.length - 1].startTime; }
+} catch (e) {}
+var bytes = nav.transferSize || 0;
+recursos.forEach(function (r) { bytes += r.transferSize || 0; });
+return {
+    documento: performance.timeOrigin,
+    ttfb_ms: nav.responseStart,
+    fcp_ms: fcp ? fcp.startTime : null,
+    dom_ms: nav.domContentLoadedEventEnd,
+    load_ms: nav.loadEventEnd,
+    lcp_ms: lcp,
+    bytes: bytes,
+    peticiones: recursos.length + 1
+};
+"""
+
+# Recorridos independientes entre sí: cada uno puede ejecutarse en su propio
+# navegador sin depender de la sesión ni de los datos que deje otro.
+JORNADAS = {
+    "publico": ["test_01_paginas_publicas_completas", "test_05_verificacion_final"],
+    "registro": ["test_02_registro_usuario"],
+    "cliente": ["test_03_cliente_flujo_completo"],
+    "admin": ["test_04_admin_flujo_completo"],
+    "login": ["test_06_login_por_formulario"],
+}
+
+
+# =============================
+# RENDIMIENTO DE PÁGINAS
+# =============================
+def nombre_pagina(url):
+    """Nombre estable de la página: la ruta sin ids numéricos ("producto/{id}"), "home" para la raíz"""
+    segmentos = [segmento for segmento in urlparse(url).path.split("/") if segmento]
+    segmentos = ["{id}" if re.fullmatch(r"\d+", segmento) else segmento for segmento in segmentos]
+    return "/".join(segmentos) or "home"
+
+
+def resumir_rendimiento(visitas):
+    """Mediana de cada métrica por página, para no fallar por una sola visita lenta"""
+    resumen = {}
+    for pagina, medidas in sorted(visitas.items()):
+        fila = {"visitas": len(medidas)}
+        for metrica in METRICAS:
+            valores = [medida[metrica] for medida in medidas if medida.get(metrica) is not None]
+            fila[metrica] = round(median(valores), 1) if valores else None
+        resumen[pagina] = fila
+    return resumen
+
+
+def excesos_presupuesto(resumen, presupuestos):
+    """Lista de "pagina: metrica valor > limite" para cada presupuesto superado"""
+    excesos = []
+    for pagina, fila in resumen.items():
+        limites = dict(presupuestos.get("*", {}), **presupuestos.get(pagina, {}))
+        for metrica, limite in limites.items():
+            valor = fila.get(metrica)
+            if valor is not None and valor > limite:
+                excesos.append(f"{pagina}: {metrica} {valor:g} > {limite:g}")
+    return excesos
+
+
+def imprimir_rendimiento(resumen, excesos):
+    """Tabla de rendimiento por página"""
+    print("\n⏱  RENDIMIENTO POR PÁGINA (mediana)")
+    print(f"{'página':<28}{'n':>4}{'TTFB':>8}{'FCP':>8}{'DOM':>8}{'load':>8}{'LCP':>8}{'KB':>9}{'pet.':>6}")
+    for pagina, fila in resumen.items():
+        def celda(metrica, ancho, escala=1):
+            valor = fila[metrica]
+            return f"{'-' if valor is None else round(valor / escala):>{ancho}}"
+        print(f"{pagina[:27]:<28}{fila['visitas']:>4}{celda('ttfb_ms', 8)}{celda('fcp_ms', 8)}"
+              f"{celda('dom_ms', 8)}{celda('load_ms', 8)}{celda('lcp_ms', 8)}"
+              f"{celda('bytes', 9, 1024)}{celda('peticiones', 6)}")
+    for exceso in excesos:
+        print(f"  ❌ Presupuesto superado - {exceso}")
+
+
+# =============================
+# CAPTURAS EN SEGUNDO PLANO
+# =============================
+def hash_perceptual(imagen):
+    """dHash: compara cada píxel con su vecino en una miniatura en grises"""
+    gris = imagen.convert("L").resize((TAMANO_HASH + 1, TAMANO_HASH))
+    pixeles = list(gris.getdata())
+    bits = 0
+    for fila in range(TAMANO_HASH):
+        for columna in range(TAMANO_HASH):
+            izquierda = pixeles[fila * (TAMANO_HASH + 1) + columna]
+            bits = (bits << 1) | (izquierda > pixeles[fila * (TAMANO_HASH + 1) + columna + 1])
+    return f"{bits:0{TAMANO_HASH * TAMANO_HASH // 4}x}"
+
+
+def distancia_hash(a, b):
+    """Bits distintos entre dos hashes perceptuales"""
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def comparar_con_base(imagen, ruta_base, ruta_diff):
+    """Fracción de píxeles que cambian respecto a la captura base; guarda una imagen de diferencias"""
+    base = Image.open(ruta_base).convert("RGB")
+    if base.size != imagen.size:
+        return {"estado": "tamaño distinto", "base": list(base.size), "actual": list(imagen.size)}
+    # Máximo por canal, no luminancia: un cambio solo en azul casi no mueve la L
+    rojo, verde, azul = ImageChops.difference(base, imagen).split()
+    maximo = ImageChops.lighter(ImageChops.lighter(rojo, verde), azul)
+    mascara = maximo.point(lambda v: 255 if v > UMBRAL_PIXEL else 0)
+    cambiados = mascara.histogram()[255]
+    fraccion = cambiados / (imagen.size[0] * imagen.size[1])
+    resultado = {"estado": "cambiada" if fraccion > UMBRAL_CAMBIO else "igual",
+                 "diferencia": round(fraccion, 4),
+                 "distancia_hash": distancia_hash(hash_perceptual(base), hash_perceptual(imagen))}
+    if cambiados:
+        # La base atenuada con los píxeles cambiados en rojo
+        marcada = Image.blend(base, Image.new("RGB", base.size, "white"), 0.6)
+        marcada.paste(Image.new("RGB", base.size, (220, 0, 0)), mask=mascara)
+        marcada.save(ruta_diff, optimize=True)
+        resultado["diff"] = ruta_diff
+    return resultado
+
+
+class CanalCapturas:
+    """Escribe las capturas en un hilo aparte: decodifica, deduplica, comprime y compara con la base.
+
+    capturar() solo pide el PNG al driver (en memoria) y lo encola, así la
+    prueba no espera a disco ni a Pillow.
+    """
+
+    def __init__(self, carpeta, carpeta_base):
+        self.carpeta = carpeta
+        self.carpeta_base = carpeta_base
+        self.registro = []
+        self.hashes = {}   # hash -> archivo de la primera captura con ese contenido
+        self.registro_base = None   # capturas.json de la carpeta base, al primer uso
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="capturas")
+
+    def enviar(self, numero, nombre, png):
+        self.pool.submit(self._procesar, numero, nombre, png)
+
+    def _procesar(self, numero, nombre, png):
+        archivo = f"{numero}_{nombre}.png"
+        entrada = {"numero": numero, "nombre": nombre, "archivo": archivo}
+        self.registro.append(entrada)
+        try:
+            imagen = Image.open(io.BytesIO(png)).convert("RGB") if Image else None
+            huella = hash_perceptual(imagen) if imagen else hashlib.sha1(png).hexdigest()
+            entrada["hash"] = huella
+            # Solo se deduplica la escritura: una página que se rompe pareciéndose
+            # a otra también tiene que compararse con su propia base
+            if huella in self.hashes:
+                entrada["archivo"] = None
+                entrada["duplicada_de"] = self.hashes[huella]
+            else:
+                self.hashes[huella] = archivo
+                ruta = os.path.join(self.carpeta, archivo)
+                if imagen:
+                    imagen.save(ruta, optimize=True)
+                else:
+                    with open(ruta, "wb") as f:
+                        f.write(png)
+            entrada["base"] = self._comparar(nombre, imagen, png)
+        except Exception as e:
+            entrada["error"] = str(e)
+
+    def _ruta_base(self, nombre):
+        """Captura base de `nombre`, también si en la base fue una duplicada que no se escribió"""
+        # La base se busca por nombre, sin el número de orden, que cambia entre ejecuciones
+        candidatas = sorted(f for f in os.listdir(self.carpeta_base)
+                            if re.fullmatch(r"\d+_" + re.escape(nombre) + r"\.png", f))
+        if candidatas:
+            return os.path.join(self.carpeta_base, candidatas[0])
+        if self.registro_base is None:
+            try:
+                with open(os.path.join(self.carpeta_base, "capturas.json"), encoding="utf-8") as f:
+                    self.registro_base = json.load(f).get("capturas", [])
+            except (OSError, ValueError):
+                self.registro_base = []
+        for entrada in self.registro_base:
+            if entrada.get("nombre") == nombre and entrada.get("duplicada_de"):
+                return os.path.join(self.carpeta_base, entrada["duplicada_de"])
+        return None
+
+    def _comparar(self, nombre, imagen, png):
+        ruta_base = self._ruta_base(nombre)
+        if ruta_base is None or not os.path.exists(ruta_base):
+            return {"estado": "nueva"}
+        if not imagen:
+            with open(ruta_base, "rb") as f:
+                return {"estado": "igual" if f.read() == png else "cambiada"}
+        return comparar_con_base(imagen, ruta_base, os.path.join(self.carpeta, f"diff_{nombre}.png"))
+
+    def cerrar(self):
+        """Espera a que termine la cola y guarda capturas.json; devuelve el resumen"""
+        self.pool.shutdown(wait=True)
+        self.registro.sort(key=lambda entrada: entrada["numero"])
+        resumen = {
+            "escritas": sum(1 for entrada in self.registro if entrada["archivo"]),
+            "duplicadas": sum(1 for entrada in self.registro if "duplicada_de" in entrada),
+            "cambiadas": [entrada["nombre"] for entrada in self.registro
+                          if entrada.get("base", {}).get("estado") not in (None, "igual", "nueva")],
+            "errores": [f"{entrada['nombre']}: {entrada['error']}" for entrada in self.registro if "error" in entrada],
+        }
+        with open(os.path.join(self.carpeta, "capturas.json"), "w", encoding="utf-8") as f:
+            json.dump(dict(resumen, base=self.carpeta_base, capturas=self.registro), f,
+                      ensure_ascii=False, indent=2)
+        return resumen
+
+
+# =============================
+# NAVEGADORES: DRIVER SIN RED Y POOL PRECALENTADO
+# =============================
+@functools.lru_cache(maxsize=None)
+def resolver_chromedriver():
+    """Ruta de chromedriver que no necesita red si ya se resolvió alguna vez.
+
+    Orden: $CHROMEDRIVER, la ruta guardada en CACHE_CHROMEDRIVER, chromedriver en
+    el PATH y, solo si nada de eso existe, webdriver_manager (con red). Devuelve
+    None si todo falla, para que Selenium Manager lo busque en su propia caché.
+    """
+    if os.environ.get("CHROMEDRIVER"):
+        return os.environ["CHROMEDRIVER"]
+    try:
+        with open(CACHE_CHROMEDRIVER, encoding="utf-8") as f:
+            ruta = json.load(f)["ruta"]
+        if os.access(ruta, os.X_OK):
+            return ruta
+    except (OSError, ValueError, KeyError):
+        pass
+    ruta = shutil.which("chromedriver")
+    if ruta is None:
+        try:
+            ruta = ChromeDriverManager().install()
+        except Exception as e:
+            print(f"  ⚠ No se pudo descargar chromedriver ({e}); se usará Selenium Manager")
+            return None
+    os.makedirs(os.path.dirname(CACHE_CHROMEDRIVER), exist_ok=True)
+    with open(CACHE_CHROMEDRIVER, "w", encoding="utf-8") as f:
+        json.dump({"ruta": ruta}, f)
+    return ruta
+
+
+def olvidar_chromedriver():
+    """Descarta la ruta en caché (p. ej. cuando ya no coincide con la versión de Chrome)"""
+    resolver_chromedriver.cache_clear()
+    try:
+        os.remove(CACHE_CHROMEDRIVER)
+    except OSError:
+        pass
+
+
+class PoolNavegadores:
+    """Navegadores ya arrancados que las clases de prueba toman prestados y devuelven.
+
+    Al devolverlos se borran cookies, caché y almacenamiento del sitio, así la
+    siguiente clase parte de cero sin pagar el arranque de Chrome.
+    """
+
+    def __init__(self):
+        self.libres = []
+        self.arrancando = []
+        self.perfiles = {}   # driver -> carpeta de perfil propia
+        self.cerrojo = threading.Lock()
+        self.lanzador = ThreadPoolExecutor(max_workers=2, thread_name_prefix="navegadores")
+
+    def calentar(self, cantidad):
+        """Empieza a arrancar `cantidad` navegadores en segundo plano"""
+        with self.cerrojo:
+            for _ in range(cantidad):
+                self.arrancando.append(self.lanzador.submit(self._arrancar))
+
+    def prestar(self):
+        with self.cerrojo:
+            if self.libres:
+                return self.libres.pop()
+            futuro = self.arrancando.pop(0) if self.arrancando else None
+        return futuro.result() if futuro else self._arrancar()
+
+    def devolver(self, driver):
+        try:
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+            origen = "{0.scheme}://{0.netloc}".format(urlparse(URL_BASE))
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origen, "storageTypes": "all"})
+            driver.get("about:blank")
+        except WebDriverException:
+            self._cerrar(driver)
+            return
+        with self.cerrojo:
+            self.libres.append(driver)
+
+    def cerrar(self):
+        """Cierra todos los navegadores, también los que aún estén arrancando"""
+        with self.cerrojo:
+            arrancando, self.arrancando = self.arrancando, []
+        for futuro in arrancando:
+            try:
+                self.libres.append(futuro.result())
+            except Exception:
+                pass
+        self.lanzador.shutdown(wait=True)
+        while self.libres:
+            self._cerrar(self.libres.pop())
+
+    def _arrancar(self):
+        options = Options()
+        options.add_argument("--start-maximized")
+        if NAVEGADOR_HEADLESS:
+            options.add_argument("--headless=new")
+            options.add_argument("--window-size=1920,1080")
+        # Perfil propio por navegador: cookies y sesión no se comparten entre trabajadores
+        perfil = tempfile.mkdtemp(prefix="wineshop_chrome_")
+        options.add_argument(f"--user-data-dir={perfil}")
+        options.add_argument("--disable-blink-features=AutomationControlled")
+        options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        options.add_experimental_option('useAutomationExtension', False)
+
+        try:
+            try:
+                driver = webdriver.Chrome(service=Service(resolver_chromedriver()), options=options)
+            except SessionNotCreatedException:
+                # El chromedriver en caché no corresponde al Chrome instalado: se resuelve de nuevo
+                olvidar_chromedriver()
+                driver = webdriver.Chrome(service=Service(resolver_chromedriver()), options=options)
+        except Exception:
+            shutil.rmtree(perfil, ignore_errors=True)
+            raise
+        with self.cerrojo:
+            self.perfiles[driver] = perfil
+        return driver
+
+    def _cerrar(self, driver):
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+        with self.cerrojo:
+            perfil = self.perfiles.pop(driver, None)
+        if perfil:
+            shutil.rmtree(perfil, ignore_errors=True)
+
+
+POOL_NAVEGADORES = PoolNavegadores()
+atexit.register(POOL_NAVEGADORES.cerrar)
+
+
+def cargar_presupuestos(ruta):
+    """Mezcla el archivo JSON de presupuestos con los valores por defecto"""
+    with open(ruta, encoding="utf-8") as f:
+        for pagina, limites in json.load(f).items():
+            PRESUPUESTOS.setdefault(pagina, {}).update(limites)
+
+
+def preparar_django():
+    """Carga los settings del proyecto Django; devuelve False si no está disponible"""
+    if not os.environ.get("DJANGO_SETTINGS_MODULE"):
+        return False
+    try:
+        import django
+        from django.apps import apps
+        if not apps.ready:
+            if PROYECTO_DJANGO:
+                sys.path.insert(0, os.path.abspath(PROYECTO_DJANGO))
+            django.setup()
+        return True
+    except Exception as e:
+        print(f"  ⚠ No se pudo cargar Django ({e}); se iniciará sesión por HTTP")
+        return False
+
+
+def crear_sesion_django(credenciales):
+    """Crea una sesión autenticada en la base de datos y devuelve la cookie para el driver"""
+    from django.conf import settings
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+
+    usuario = get_user_model()._default_manager.get_by_natural_key(credenciales["usuario"])
+    sesion = importlib.import_module(settings.SESSION_ENGINE).SessionStore()
+    sesion[SESSION_KEY] = usuario._meta.pk.value_to_string(usuario)
+    sesion[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    sesion[HASH_SESSION_KEY] = usuario.get_session_auth_hash()
+    sesion.save()
+    return {"name": settings.SESSION_COOKIE_NAME, "value": sesion.session_key, "path": "/"}
+
+
+def crear_sesion_http(credenciales):
+    """Inicia sesión con un POST al formulario de login, sin navegador, y devuelve la cookie"""
+    galletas = CookieJar()
+    cliente = build_opener(HTTPCookieProcessor(galletas))
+    url_login = URL_BASE + "login/"
+    with cliente.open(url_login, timeout=TIEMPO_ESPERA) as respuesta:
+        token = CSRF_RE.search(respuesta.read().decode("utf-8", "replace"))
+    if token is None:
+        raise AssertionError(f"{url_login} no tiene el campo csrfmiddlewaretoken")
+    datos = urlencode({"csrfmiddlewaretoken": token.group(1), "username": credenciales["usuario"],
+                       "password": credenciales["clave"]}).encode()
+    cliente.open(Request(url_login, data=datos, headers={"Referer": url_login}), timeout=TIEMPO_ESPERA).close()
+    for galleta in galletas:
+        if galleta.name == COOKIE_SESION:
+            return {"name": galleta.name, "value": galleta.value, "path": "/"}
+    raise AssertionError(f"El login de {credenciales['usuario']} no devolvió la cookie '{COOKIE_SESION}'")
+
+
+def crear_sesion(credenciales):
+    """Sesión nueva para el usuario: en la base de Django si está disponible, si no por HTTP"""
+    if preparar_django():
+        return crear_sesion_django(credenciales)
+    return crear_sesion_http(credenciales)
+
 
 class WineShopTestCompleto(unittest.TestCase):
     """Suite completa de pruebas funcionales para Wine Shop"""
+
+    contador_capturas = 0
+    visitas = {}    # página -> métricas de cada visita (ver medir_pagina)
+    resumen_capturas = {}
+    sesiones = {}   # usuario -> cookie de sesión, compartida por todas las pruebas del proceso
     
     @classmethod
     def setUpClass(cls):
@@ -36,62 +513,201 @@ class WineShopTestCompleto(unittest.TestCase):
         print("INICIANDO PRUEBAS FUNCIONALES COMPLETAS DE WINE SHOP")
         print("="*80 + "\n")
 
-       
-        options = Options()
-        options.add_argument("--start-maximized")
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option('useAutomationExtension', False)
-        
-        service = Service(ChromeDriverManager().install())
-        cls.driver = webdriver.Chrome(service=service, options=options)
-        cls.wait = WebDriverWait(cls.driver, 15)
         cls.contador_capturas = 0
+        cls.visitas = {}
+        cls.documentos_medidos = set()
+        cls.resumen_capturas = {}
+        cls.driver = POOL_NAVEGADORES.prestar()
+        cls.wait = WebDriverWait(cls.driver, TIEMPO_ESPERA, poll_frequency=INTERVALO_SONDEO)
 
     
         if not os.path.exists(RUTA_CAPTURAS):
             os.makedirs(RUTA_CAPTURAS)
             print(f" Carpeta de capturas creada: {RUTA_CAPTURAS}\n")
+        cls.canal_capturas = CanalCapturas(RUTA_CAPTURAS, RUTA_BASE_CAPTURAS)
 
     @classmethod
     def tearDownClass(cls):
-        time.sleep(2)
-        cls.driver.quit()
+        POOL_NAVEGADORES.devolver(cls.driver)
+        cls.resumen_capturas = cls.canal_capturas.cerrar()
         print("\n" + "="*80)
-        print(f"✅ PRUEBAS FINALIZADAS - {cls.contador_capturas} capturas guardadas")
+        print(f"✅ PRUEBAS FINALIZADAS - {cls.resumen_capturas['escritas']} capturas guardadas, "
+              f"{cls.resumen_capturas['duplicadas']} duplicadas omitidas")
         print(f"📂 Ubicación: {RUTA_CAPTURAS}")
+        for nombre in cls.resumen_capturas["cambiadas"]:
+            print(f"  ⚠ Distinta de la base: {nombre} (ver diff_{nombre}.png)")
+        for error in cls.resumen_capturas["errores"]:
+            print(f"  ⚠ Error al guardar captura {error}")
         print("="*80 + "\n")
 
+        resumen = resumir_rendimiento(cls.visitas)
+        excesos = excesos_presupuesto(resumen, PRESUPUESTOS)
+        with open(os.path.join(RUTA_CAPTURAS, "rendimiento.json"), "w", encoding="utf-8") as f:
+            json.dump({"presupuestos": PRESUPUESTOS, "paginas": resumen, "excesos": excesos,
+                       "visitas": cls.visitas}, f, ensure_ascii=False, indent=2)
+        imprimir_rendimiento(resumen, excesos)
+        if excesos:
+            raise AssertionError("Presupuestos de rendimiento superados:\n" + "\n".join(excesos))
+
     def capturar(self, nombre, descripcion=""):
-        """Guarda una captura con nombre estructurado y contador"""
+        """Encola una captura con nombre estructurado y contador (se guarda en segundo plano)"""
         WineShopTestCompleto.contador_capturas += 1
         numero = str(WineShopTestCompleto.contador_capturas).zfill(3)
-        nombre_archivo = f"{numero}_{nombre}.png"
-        ruta = os.path.join(RUTA_CAPTURAS, nombre_archivo)
-        self.driver.save_screenshot(ruta)
+        self.canal_capturas.enviar(numero, nombre, self.driver.get_screenshot_as_png())
         if descripcion:
             print(f"📸 [{numero}] {descripcion}")
         else:
             print(f"📸 [{numero}] Captura: {nombre}")
 
+    # =============================
+    # ESPERAS POR CONDICIÓN (sin pausas fijas)
+    # =============================
+    def esperar_carga_pagina(self):
+        """Espera a que el documento actual termine de cargar"""
+        self.wait.until(lambda d: d.execute_script("return document.readyState") == "complete")
+        self.medir_pagina()
+
+    def medir_pagina(self):
+        """Guarda las métricas de Navigation/Paint Timing del documento actual, una vez por carga"""
+        if not self.driver.current_url.startswith(URL_BASE):
+            return
+        try:
+            # readyState pasa a "complete" justo antes del evento load; loadEventEnd llega después
+            self.wait.until(lambda d: d.execute_script(
+                "var n = performance.getEntriesByType('navigation')[0]; return !n || n.loadEventEnd > 0"))
+        except TimeoutException:
+            pass
+        medida = self.driver.execute_script(SCRIPT_RENDIMIENTO)
+        if not medida or medida["documento"] in self.documentos_medidos:
+            return
+        self.documentos_medidos.add(medida.pop("documento"))
+        self.visitas.setdefault(nombre_pagina(self.driver.current_url), []).append(medida)
+
+    def esperar_elemento(self, localizador):
+        """Espera a que el elemento exista en la página y lo devuelve"""
+        return self.wait.until(EC.presence_of_element_located(localizador))
+
+    def esperar_clickable(self, localizador):
+        """Espera a que el elemento sea visible y esté habilitado, y lo devuelve"""
+        return self.wait.until(EC.element_to_be_clickable(localizador))
+
+    def esperar_red_inactiva(self, quietud=RED_QUIETA):
+        """Espera a que no terminen peticiones nuevas (XHR, fetch, imágenes...) durante `quietud` segundos"""
+        estado = {"total": -1, "desde": time.monotonic()}
+
+        def red_quieta(driver):
+            total = driver.execute_script("return performance.getEntriesByType('resource').length")
+            ahora = time.monotonic()
+            if total != estado["total"]:
+                estado.update(total=total, desde=ahora)
+                return False
+            return ahora - estado["desde"] >= quietud
+
+        try:
+            self.wait.until(red_quieta)
+        except TimeoutException:
+            print("  ⚠ La red siguió activa durante toda la espera")
+
+    def esperar_navegacion(self, accion, navega=True):
+        """Ejecuta la acción y espera a que cargue la página siguiente.
+
+        Con navega=False (descargas, botones que solo usan JavaScript) no se
+        espera un cambio de página, solo a que la red quede inactiva.
+        """
+        if not navega:
+            accion()
+            self.esperar_red_inactiva()
+            return
+        pagina_anterior = self.driver.find_element(By.TAG_NAME, "html")
+        accion()
+        try:
+            self.wait.until(EC.staleness_of(pagina_anterior))
+        except TimeoutException:
+            print("  ⚠ La acción no cambió de página")
+        self.esperar_carga_pagina()
+
+    def navegar(self, url):
+        """Abre la URL y espera a que la página cargue"""
+        self.driver.get(url)
+        self.esperar_carga_pagina()
+
+    def click_y_esperar(self, elemento, navega=True):
+        """Hace clic en el elemento y espera el resultado (ver esperar_navegacion)"""
+        self.esperar_navegacion(elemento.click, navega)
+
+    def volver(self):
+        """Vuelve a la página anterior y espera a que cargue"""
+        self.esperar_navegacion(self.driver.back)
+
+    # =============================
+    # SESIÓN DE USUARIO
+    # =============================
+    def login_por_formulario(self, credenciales):
+        """Inicia sesión escribiendo en el formulario de login y espera la redirección"""
+        username_field = self.esperar_elemento((By.NAME, "username"))
+        password_field = self.driver.find_element(By.NAME, "password")
+
+        username_field.clear()
+        username_field.send_keys(credenciales["usuario"])
+        password_field.clear()
+        password_field.send_keys(credenciales["clave"])
+
+        submit_btn = self.driver.find_element(By.XPATH, "//button[@type='submit']")
+        self.click_y_esperar(submit_btn)
+
+    def obtener_sesion(self, credenciales):
+        """Devuelve la cookie de sesión del usuario, creándola solo la primera vez"""
+        usuario = credenciales["usuario"]
+        if usuario not in WineShopTestCompleto.sesiones:
+            # En --paralelo el proceso principal ya creó las sesiones y las pasa por entorno
+            compartidas = json.loads(os.environ.get("WINESHOP_SESIONES", "{}"))
+            WineShopTestCompleto.sesiones[usuario] = compartidas.get(usuario) or crear_sesion(credenciales)
+        return WineShopTestCompleto.sesiones[usuario]
+
+    def usar_sesion_desechable(self, credenciales):
+        """Cambia a una sesión nueva que no se comparte, para que un logout no cierre la de las demás pruebas"""
+        self.driver.delete_all_cookies()
+        self.driver.add_cookie(crear_sesion(credenciales))
+        self.navegar(self.driver.current_url)
+
+    def sesion_activa(self):
+        """Indica si la página actual muestra a un usuario autenticado"""
+        return bool(self.driver.find_elements(By.LINK_TEXT, "Salir"))
+
+    def iniciar_sesion(self, credenciales, destino=URL_BASE):
+        """Abre `destino` ya autenticado inyectando la cookie de sesión en el driver"""
+        for intento in range(2):
+            cookie = self.obtener_sesion(credenciales)
+            # La cookie solo se puede fijar estando en el dominio de la tienda
+            if not self.driver.current_url.startswith(URL_BASE):
+                self.navegar(URL_BASE)
+            self.driver.delete_all_cookies()
+            self.driver.add_cookie(cookie)
+            self.navegar(destino)
+            if self.sesion_activa():
+                return
+            # Otra prueba cerró esa sesión (logout): se descarta y se crea una nueva
+            WineShopTestCompleto.sesiones.pop(credenciales["usuario"], None)
+        raise AssertionError(f"No se pudo iniciar sesión como {credenciales['usuario']}")
+
     def esperar_y_hacer_scroll(self, element):
-        """Hace scroll hasta el elemento antes de interactuar"""
+        """Hace scroll hasta el elemento y espera a que se pueda interactuar con él"""
         self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
-        time.sleep(0.5)
+        self.wait.until(EC.element_to_be_clickable(element))
     
     def esperar_desvanecimiento_mensajes(self):
-        """Espera a que los mensajes de alerta se desvanezcan"""
+        """Oculta los mensajes de alerta y espera a que dejen de estar visibles"""
         try:
-            # Esperar a que los mensajes desaparezcan (tienen animación de 5 segundos)
-            time.sleep(3)
-            # Intentar cerrar mensajes si aún están visibles
+            # Los mensajes tardan 5 segundos en desvanecerse solos; se ocultan
+            # de inmediato para que no tapen enlaces ni capturas
             self.driver.execute_script("""
                 var messages = document.querySelectorAll('.message');
                 messages.forEach(function(msg) {
                     msg.style.display = 'none';
                 });
             """)
-        except:
+            self.wait.until(EC.invisibility_of_element_located((By.CSS_SELECTOR, ".message")))
+        except TimeoutException:
             pass
 
     # =============================
@@ -105,34 +721,31 @@ class WineShopTestCompleto(unittest.TestCase):
         
        
         print("➤ Accediendo a la página principal...")
-        driver.get(URL_BASE)
-        time.sleep(2)
+        self.navegar(URL_BASE)
         self.capturar("home_inicial", "Página principal sin autenticación")
         
         
         try:
             productos_destacados = driver.find_elements(By.CLASS_NAME, "producto-card")
             print(f"  ✓ Encontrados {len(productos_destacados)} productos destacados")
-        except:
+        except NoSuchElementException:
             print("  ⚠ No se encontraron productos destacados")
         
        
         print("➤ Navegando al catálogo...")
         try:
             catalogo_link = driver.find_element(By.LINK_TEXT, "Catálogo")
-            catalogo_link.click()
-            time.sleep(2)
+            self.click_y_esperar(catalogo_link)
             self.capturar("catalogo_publico", "Catálogo de productos completo")
             
             
             try:
                 busqueda = driver.find_element(By.NAME, "busqueda")
                 busqueda.send_keys("vino")
-                busqueda.send_keys(Keys.RETURN)
-                time.sleep(1)
+                self.esperar_navegacion(lambda: busqueda.send_keys(Keys.RETURN))
                 self.capturar("catalogo_busqueda", "Búsqueda de productos")
                 print("  ✓ Función de búsqueda operativa")
-            except:
+            except (NoSuchElementException, TimeoutException):
                 print("  ⚠ No se encontró campo de búsqueda")
                 
         except NoSuchElementException:
@@ -141,12 +754,10 @@ class WineShopTestCompleto(unittest.TestCase):
         
         print("➤ Visualizando detalle de producto...")
         try:
-            driver.get(URL_BASE + "catalogo/")
-            time.sleep(1)
+            self.navegar(URL_BASE + "catalogo/")
             productos = driver.find_elements(By.CSS_SELECTOR, "a[href*='producto']")
             if productos:
-                productos[0].click()
-                time.sleep(2)
+                self.click_y_esperar(productos[0])
                 self.capturar("detalle_producto_publico", "Detalle de producto sin login")
                 print("  ✓ Página de detalle de producto cargada")
         except Exception as e:
@@ -155,10 +766,9 @@ class WineShopTestCompleto(unittest.TestCase):
        
         print("➤ Revisando sección de ofertas...")
         try:
-            driver.get(URL_BASE)
+            self.navegar(URL_BASE)
             ofertas_link = driver.find_element(By.LINK_TEXT, "Ofertas")
-            ofertas_link.click()
-            time.sleep(2)
+            self.click_y_esperar(ofertas_link)
             self.capturar("ofertas_publico", "Sección de ofertas")
             print("  ✓ Página de ofertas cargada")
         except NoSuchElementException:
@@ -176,13 +786,11 @@ class WineShopTestCompleto(unittest.TestCase):
         driver = self.driver
         
         print("➤ Accediendo a formulario de registro...")
-        driver.get(URL_BASE)
-        time.sleep(1)
+        self.navegar(URL_BASE)
         
         try:
             registro_link = driver.find_element(By.LINK_TEXT, "Registro")
-            registro_link.click()
-            time.sleep(1)
+            self.click_y_esperar(registro_link)
             self.capturar("formulario_registro", "Formulario de registro de usuario")
             
             # Llenar formulario (solo visualizar, no registrar para no crear usuarios duplicados)
@@ -204,28 +812,10 @@ class WineShopTestCompleto(unittest.TestCase):
         
     
         print("➤ Iniciando sesión como cliente...")
-        driver.get(URL_BASE + "login/")
-        time.sleep(1)
-        self.capturar("login_form_cliente", "Formulario de login")
-        
         try:
-            username_field = self.wait.until(EC.presence_of_element_located((By.NAME, "username")))
-            password_field = driver.find_element(By.NAME, "password")
-            
-            username_field.clear()
-            username_field.send_keys(USUARIO_CLIENTE["usuario"])
-            password_field.clear()
-            password_field.send_keys(USUARIO_CLIENTE["clave"])
-            
-            submit_btn = driver.find_element(By.XPATH, "//button[@type='submit']")
-            submit_btn.click()
-            time.sleep(2)
-            
+            self.iniciar_sesion(USUARIO_CLIENTE)
             self.capturar("cliente_logueado", "Cliente autenticado exitosamente")
-            print(f"  ✓ Login exitoso como: {USUARIO_CLIENTE['usuario']}")
-            
-          
-            self.esperar_desvanecimiento_mensajes()
+            print(f"  ✓ Sesión iniciada como: {USUARIO_CLIENTE['usuario']}")
             
         except Exception as e:
             print(f"  ❌ Error en login: {e}")
@@ -235,8 +825,7 @@ class WineShopTestCompleto(unittest.TestCase):
         print("➤ Accediendo al perfil de usuario...")
         try:
             perfil_link = driver.find_element(By.LINK_TEXT, "Mi Cuenta")
-            perfil_link.click()
-            time.sleep(2)
+            self.click_y_esperar(perfil_link)
             self.capturar("perfil_cliente", "Perfil completo del cliente")
             print("  ✓ Página de perfil cargada")
         except NoSuchElementException:
@@ -245,12 +834,10 @@ class WineShopTestCompleto(unittest.TestCase):
        
         print("➤ Navegando al catálogo desde sesión activa...")
         try:
-            driver.find_element(By.LINK_TEXT, "Catálogo").click()
-            time.sleep(2)
+            self.click_y_esperar(driver.find_element(By.LINK_TEXT, "Catálogo"))
             self.capturar("catalogo_cliente_logueado", "Catálogo con sesión activa")
-        except:
-            driver.get(URL_BASE + "catalogo/")
-            time.sleep(2)
+        except (NoSuchElementException, TimeoutException):
+            self.navegar(URL_BASE + "catalogo/")
         
        
         print("➤ Agregando productos al carrito...")
@@ -260,8 +847,7 @@ class WineShopTestCompleto(unittest.TestCase):
             if productos_links:
                 
                 producto_url = productos_links[0].get_attribute('href')
-                productos_links[0].click()
-                time.sleep(2)
+                self.click_y_esperar(productos_links[0])
                 self.capturar("detalle_producto_cliente", "Detalle de producto para cliente")
                 
                 
@@ -272,8 +858,8 @@ class WineShopTestCompleto(unittest.TestCase):
                     
                     if agregar_btns:
                         self.esperar_y_hacer_scroll(agregar_btns[0])
-                        agregar_btns[0].click()
-                        time.sleep(2)
+                        # agregar_carrito responde con una redirección: se espera la página nueva
+                        self.click_y_esperar(agregar_btns[0])
                         self.capturar("producto_agregado_carrito", "Producto agregado al carrito")
                         print("  ✓ Producto agregado al carrito")
                     else:
@@ -288,8 +874,7 @@ class WineShopTestCompleto(unittest.TestCase):
        
         print("➤ Visualizando carrito de compras...")
         try:
-            driver.find_element(By.LINK_TEXT, "Mi Carrito").click()
-            time.sleep(2)
+            self.click_y_esperar(driver.find_element(By.LINK_TEXT, "Mi Carrito"))
             self.capturar("carrito_productos", "Carrito con productos")
             print("  ✓ Carrito accesible")
             
@@ -298,7 +883,7 @@ class WineShopTestCompleto(unittest.TestCase):
                 cantidad_inputs = driver.find_elements(By.CSS_SELECTOR, "input[type='number']")
                 if cantidad_inputs:
                     print("  ✓ Controles de cantidad disponibles")
-            except:
+            except NoSuchElementException:
                 pass
                 
         except NoSuchElementException:
@@ -311,8 +896,7 @@ class WineShopTestCompleto(unittest.TestCase):
             checkout_btns = driver.find_elements(By.XPATH, 
                 "//a[contains(text(),'Checkout') or contains(text(),'Finalizar')]")
             if checkout_btns:
-                checkout_btns[0].click()
-                time.sleep(2)
+                self.click_y_esperar(checkout_btns[0])
                 self.capturar("checkout_formulario", "Formulario de checkout")
                 print("  ✓ Página de checkout cargada")
                 
@@ -321,7 +905,7 @@ class WineShopTestCompleto(unittest.TestCase):
                     formularios = driver.find_elements(By.TAG_NAME, "form")
                     if formularios:
                         self.capturar("checkout_detalle", "Detalle completo del checkout")
-                except:
+                except NoSuchElementException:
                     pass
             else:
                 print("  ⚠ Botón de checkout no encontrado")
@@ -331,18 +915,17 @@ class WineShopTestCompleto(unittest.TestCase):
      
         print("➤ Consultando historial de pedidos...")
         try:
-            driver.get(URL_BASE + "mis_pedidos/")
-            time.sleep(2)
+            self.navegar(URL_BASE + "mis_pedidos/")
             self.capturar("mis_pedidos", "Historial de pedidos del cliente")
             print("  ✓ Página 'Mis Pedidos' accesible")
-        except:
+        except TimeoutException:
             print("  ⚠ No se pudo acceder a 'Mis Pedidos'")
         
     
         print("➤ Cerrando sesión...")
         try:
-            driver.find_element(By.LINK_TEXT, "Salir").click()
-            time.sleep(2)
+            self.usar_sesion_desechable(USUARIO_CLIENTE)
+            self.click_y_esperar(driver.find_element(By.LINK_TEXT, "Salir"))
             self.capturar("cliente_logout", "Sesión de cliente cerrada")
             print("  ✓ Logout exitoso")
         except NoSuchElementException:
@@ -361,27 +944,10 @@ class WineShopTestCompleto(unittest.TestCase):
         
     
         print("➤ Iniciando sesión como administrador...")
-        driver.get(URL_BASE + "login/")
-        time.sleep(1)
-        
         try:
-            username_field = self.wait.until(EC.presence_of_element_located((By.NAME, "username")))
-            password_field = driver.find_element(By.NAME, "password")
-            
-            username_field.clear()
-            username_field.send_keys(USUARIO_ADMIN["usuario"])
-            password_field.clear()
-            password_field.send_keys(USUARIO_ADMIN["clave"])
-            
-            submit_btn = driver.find_element(By.XPATH, "//button[@type='submit']")
-            submit_btn.click()
-            time.sleep(2)
-            
+            self.iniciar_sesion(USUARIO_ADMIN)
             self.capturar("admin_logueado", "Administrador autenticado")
-            print(f"  ✓ Login exitoso como: {USUARIO_ADMIN['usuario']}")
-            
-           
-            self.esperar_desvanecimiento_mensajes()
+            print(f"  ✓ Sesión iniciada como: {USUARIO_ADMIN['usuario']}")
             
         except Exception as e:
             print(f"  ❌ Error en login de admin: {e}")
@@ -391,14 +957,13 @@ class WineShopTestCompleto(unittest.TestCase):
         print("➤ Accediendo al panel de administración...")
         try:
             admin_link = driver.find_element(By.PARTIAL_LINK_TEXT, "Admin")
-            admin_link.click()
-            time.sleep(2)
+            self.click_y_esperar(admin_link)
             self.capturar("panel_admin_principal", "Panel principal de administración")
             print("  ✓ Panel de administración cargado")
             
             
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight/2);")
-            time.sleep(1)
+            self.esperar_red_inactiva()
             self.capturar("panel_admin_estadisticas", "Estadísticas del panel admin")
             
         except NoSuchElementException:
@@ -409,8 +974,7 @@ class WineShopTestCompleto(unittest.TestCase):
         print("➤ Gestionando productos...")
         try:
             productos_link = driver.find_element(By.LINK_TEXT, "Productos")
-            productos_link.click()
-            time.sleep(2)
+            self.click_y_esperar(productos_link)
             self.capturar("admin_productos_lista", "Lista de productos (Admin)")
             print("  ✓ Lista de productos accesible")
             
@@ -419,30 +983,25 @@ class WineShopTestCompleto(unittest.TestCase):
                 crear_btns = driver.find_elements(By.XPATH, 
                     "//a[contains(text(),'Crear') or contains(text(),'Nuevo') or contains(text(),'Agregar')]")
                 if crear_btns:
-                    crear_btns[0].click()
-                    time.sleep(2)
+                    self.click_y_esperar(crear_btns[0])
                     self.capturar("admin_producto_crear_form", "Formulario de creación de producto")
                     print("  ✓ Formulario de creación de producto accesible")
-                    driver.back()
-                    time.sleep(1)
-            except:
+                    self.volver()
+            except (TimeoutException, ElementClickInterceptedException):
                 print("  ⚠ Botón de crear producto no encontrado")
                 
        
             try:
                 editar_btns = driver.find_elements(By.XPATH, "//a[contains(text(),'Editar')]")
                 if editar_btns:
-                    editar_btns[0].click()
-                    time.sleep(2)
+                    self.click_y_esperar(editar_btns[0])
                     self.capturar("admin_producto_editar_form", "Formulario de edición de producto")
                     print("  ✓ Formulario de edición de producto accesible")
-                    driver.back()
-                    time.sleep(1)
-            except:
+                    self.volver()
+            except (TimeoutException, ElementClickInterceptedException):
                 print("  ⚠ Botón de editar producto no encontrado")
             
-            driver.back()
-            time.sleep(1)
+            self.volver()
             
         except NoSuchElementException:
             print("  ⚠ Enlace a 'Productos' no encontrado")
@@ -451,8 +1010,7 @@ class WineShopTestCompleto(unittest.TestCase):
         print("➤ Gestionando proveedores...")
         try:
             proveedores_link = driver.find_element(By.LINK_TEXT, "Proveedores")
-            proveedores_link.click()
-            time.sleep(2)
+            self.click_y_esperar(proveedores_link)
             self.capturar("admin_proveedores_lista", "Lista de proveedores (Admin)")
             print("  ✓ Lista de proveedores accesible")
             
@@ -461,17 +1019,14 @@ class WineShopTestCompleto(unittest.TestCase):
                 crear_btns = driver.find_elements(By.XPATH, 
                     "//a[contains(text(),'Crear') or contains(text(),'Nuevo')]")
                 if crear_btns:
-                    crear_btns[0].click()
-                    time.sleep(2)
+                    self.click_y_esperar(crear_btns[0])
                     self.capturar("admin_proveedor_crear_form", "Formulario de creación de proveedor")
                     print("  ✓ Formulario de creación de proveedor accesible")
-                    driver.back()
-                    time.sleep(1)
-            except:
+                    self.volver()
+            except (TimeoutException, ElementClickInterceptedException):
                 print("  ⚠ Botón de crear proveedor no encontrado")
             
-            driver.back()
-            time.sleep(1)
+            self.volver()
             
         except NoSuchElementException:
             print("  ⚠ Enlace a 'Proveedores' no encontrado")
@@ -480,8 +1035,7 @@ class WineShopTestCompleto(unittest.TestCase):
         print("➤ Gestionando pedidos...")
         try:
             pedidos_link = driver.find_element(By.LINK_TEXT, "Pedidos")
-            pedidos_link.click()
-            time.sleep(2)
+            self.click_y_esperar(pedidos_link)
             self.capturar("admin_pedidos_lista", "Lista de pedidos (Admin)")
             print("  ✓ Lista de pedidos accesible")
             
@@ -489,17 +1043,14 @@ class WineShopTestCompleto(unittest.TestCase):
             try:
                 editar_btns = driver.find_elements(By.XPATH, "//a[contains(text(),'Editar') or contains(text(),'Ver')]")
                 if editar_btns:
-                    editar_btns[0].click()
-                    time.sleep(2)
+                    self.click_y_esperar(editar_btns[0])
                     self.capturar("admin_pedido_detalle", "Detalle/Edición de pedido")
                     print("  ✓ Edición de pedido accesible")
-                    driver.back()
-                    time.sleep(1)
-            except:
+                    self.volver()
+            except (TimeoutException, ElementClickInterceptedException):
                 print("  ⚠ No hay pedidos para editar")
             
-            driver.back()
-            time.sleep(1)
+            self.volver()
             
         except NoSuchElementException:
             print("  ⚠ Enlace a 'Pedidos' no encontrado")
@@ -508,8 +1059,7 @@ class WineShopTestCompleto(unittest.TestCase):
         print("➤ Gestionando clientes...")
         try:
             clientes_link = driver.find_element(By.LINK_TEXT, "Clientes")
-            clientes_link.click()
-            time.sleep(2)
+            self.click_y_esperar(clientes_link)
             self.capturar("admin_clientes_lista", "Lista de clientes (Admin)")
             print("  ✓ Lista de clientes accesible")
             
@@ -518,17 +1068,14 @@ class WineShopTestCompleto(unittest.TestCase):
                 crear_btns = driver.find_elements(By.XPATH, 
                     "//a[contains(text(),'Crear') or contains(text(),'Nuevo')]")
                 if crear_btns:
-                    crear_btns[0].click()
-                    time.sleep(2)
+                    self.click_y_esperar(crear_btns[0])
                     self.capturar("admin_cliente_crear_form", "Formulario de creación de cliente")
                     print("  ✓ Formulario de creación de cliente accesible")
-                    driver.back()
-                    time.sleep(1)
-            except:
+                    self.volver()
+            except (TimeoutException, ElementClickInterceptedException):
                 print("  ⚠ Botón de crear cliente no encontrado")
             
-            driver.back()
-            time.sleep(1)
+            self.volver()
             
         except NoSuchElementException:
             print("  ⚠ Enlace a 'Clientes' no encontrado")
@@ -537,13 +1084,11 @@ class WineShopTestCompleto(unittest.TestCase):
         print("➤ Gestionando usuarios...")
         try:
             usuarios_link = driver.find_element(By.LINK_TEXT, "Usuarios")
-            usuarios_link.click()
-            time.sleep(2)
+            self.click_y_esperar(usuarios_link)
             self.capturar("admin_usuarios_lista", "Lista de usuarios administradores")
             print("  ✓ Lista de usuarios accesible")
             
-            driver.back()
-            time.sleep(1)
+            self.volver()
             
         except NoSuchElementException:
             print("  ⚠ Enlace a 'Usuarios' no encontrado")
@@ -552,8 +1097,7 @@ class WineShopTestCompleto(unittest.TestCase):
         print("➤ Generando reporte Excel...")
         try:
            
-            driver.get(URL_BASE + "admin_panel/")
-            time.sleep(2)
+            self.navegar(URL_BASE + "admin_panel/")
             
          
             excel_btns = driver.find_elements(By.XPATH, 
@@ -561,8 +1105,7 @@ class WineShopTestCompleto(unittest.TestCase):
             
             if excel_btns:
                 self.capturar("admin_antes_reporte_excel", "Antes de generar reporte Excel")
-                excel_btns[0].click()
-                time.sleep(3)
+                self.click_y_esperar(excel_btns[0], navega=False)
                 print("  ✓ Reporte Excel generado (descarga iniciada)")
                 self.capturar("admin_despues_reporte_excel", "Después de generar reporte Excel")
               
@@ -576,42 +1119,42 @@ class WineShopTestCompleto(unittest.TestCase):
   
         print("➤ Consultando roles...")
         try:
-            driver.get(URL_BASE + "roles/")
-            time.sleep(2)
+            self.navegar(URL_BASE + "roles/")
             self.capturar("admin_roles_lista", "Lista de roles del sistema")
             print("  ✓ Página de roles accesible")
          
             self.esperar_desvanecimiento_mensajes()
-        except:
+        except TimeoutException:
             print("  ⚠ Página de roles no accesible")
         
 
         print("➤ Accediendo al perfil de administrador...")
         try:
-            driver.find_element(By.LINK_TEXT, "Mi Cuenta").click()
-            time.sleep(2)
+            self.click_y_esperar(driver.find_element(By.LINK_TEXT, "Mi Cuenta"))
             self.capturar("perfil_admin", "Perfil del administrador")
             print("  ✓ Perfil de admin accesible")
-        except:
+        except (NoSuchElementException, TimeoutException):
             print("  ⚠ Perfil de admin no accesible")
         
   
         print("➤ Cerrando sesión de administrador...")
         try:
            
+            self.usar_sesion_desechable(USUARIO_ADMIN)
             self.esperar_desvanecimiento_mensajes()
             
           
             salir_btn = driver.find_element(By.LINK_TEXT, "Salir")
             
           
-            try:
-                salir_btn.click()
-            except:
-         
-                driver.execute_script("arguments[0].click();", salir_btn)
+            def salir():
+                try:
+                    salir_btn.click()
+                except ElementClickInterceptedException:
+             
+                    driver.execute_script("arguments[0].click();", salir_btn)
             
-            time.sleep(2)
+            self.esperar_navegacion(salir)
             self.capturar("admin_logout", "Sesión de administrador cerrada")
             print("  ✓ Logout de admin exitoso")
         except NoSuchElementException:
@@ -632,8 +1175,7 @@ class WineShopTestCompleto(unittest.TestCase):
         
      
         print("➤ Verificación final de accesibilidad...")
-        driver.get(URL_BASE)
-        time.sleep(2)
+        self.navegar(URL_BASE)
         self.capturar("verificacion_final", "Verificación final del sistema")
         
      
@@ -659,9 +1201,211 @@ class WineShopTestCompleto(unittest.TestCase):
         
         print("✅ Test 5 completado: Verificación final\n")
 
+    # =============================
+    # PRUEBA 6 - LOGIN POR FORMULARIO
+    # =============================
+    def test_06_login_por_formulario(self):
+        """Única prueba que inicia sesión por la interfaz; las demás inyectan la cookie"""
+        print("\n🧪 TEST 6: Login por Formulario")
+        print("-" * 60)
+        driver = self.driver
+
+        print("➤ Iniciando sesión como cliente desde el formulario...")
+        # Partir sin ninguna cookie de sesión heredada de otra prueba
+        self.navegar(URL_BASE + "login/")
+        driver.delete_all_cookies()
+        driver.refresh()
+        self.esperar_carga_pagina()
+        self.capturar("login_form_cliente", "Formulario de login")
+
+        self.login_por_formulario(USUARIO_CLIENTE)
+        self.capturar("login_formulario_exitoso", "Cliente autenticado desde el formulario")
+        self.assertTrue(self.sesion_activa(), "El formulario de login no dejó la sesión iniciada")
+        print(f"  ✓ Login exitoso como: {USUARIO_CLIENTE['usuario']}")
+
+        self.esperar_desvanecimiento_mensajes()
+        self.click_y_esperar(driver.find_element(By.LINK_TEXT, "Salir"))
+        self.assertFalse(self.sesion_activa(), "El logout no cerró la sesión")
+        print("  ✓ Logout exitoso")
+
+        print("✅ Test 6 completado: Login por formulario\n")
+
+
+# =============================
+# EJECUCIÓN PARALELA POR JORNADAS
+# =============================
+def ejecutar_jornada(nombre, carpeta):
+    """Ejecuta una jornada en este proceso y guarda su resultado en carpeta/resultado.json"""
+    global RUTA_CAPTURAS
+    RUTA_CAPTURAS = carpeta
+    suite = unittest.TestSuite(WineShopTestCompleto(prueba) for prueba in JORNADAS[nombre])
+    inicio = time.monotonic()
+    resultado = unittest.TextTestRunner(verbosity=2).run(suite)
+    datos = {
+        "jornada": nombre,
+        "pruebas": resultado.testsRun,
+        "fallos": [[str(prueba), traza] for prueba, traza in resultado.failures],
+        "errores": [[str(prueba), traza] for prueba, traza in resultado.errors],
+        "omitidas": len(resultado.skipped),
+        "duracion_s": round(time.monotonic() - inicio, 1),
+        "capturas": WineShopTestCompleto.contador_capturas,
+        "ruta_capturas": RUTA_CAPTURAS,
+        "rendimiento": WineShopTestCompleto.visitas,
+        "capturas_cambiadas": WineShopTestCompleto.resumen_capturas.get("cambiadas", []),
+    }
+    os.makedirs(carpeta, exist_ok=True)
+    with open(os.path.join(carpeta, "resultado.json"), "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False, indent=2)
+    return resultado.wasSuccessful()
+
+
+def lanzar_trabajador(numero, nombres, raiz):
+    """Lanza un proceso hijo que ejecuta sus jornadas una tras otra reutilizando el mismo navegador"""
+    for nombre in nombres:
+        try:
+            os.remove(os.path.join(raiz, nombre, "resultado.json"))
+        except OSError:
+            pass
+    os.makedirs(raiz, exist_ok=True)
+    log = os.path.join(raiz, f"trabajador_{numero}.txt")
+    comando = [sys.executable, os.path.abspath(__file__), "--jornada", ",".join(nombres),
+               "--capturas", raiz, "--headless"]
+    entorno = dict(os.environ, PYTHONIOENCODING="utf-8")
+    with open(log, "w", encoding="utf-8") as salida:
+        proceso = subprocess.run(comando, stdout=salida, stderr=subprocess.STDOUT, env=entorno)
+    resultados = []
+    for nombre in nombres:
+        try:
+            with open(os.path.join(raiz, nombre, "resultado.json"), encoding="utf-8") as f:
+                resultados.append(json.load(f))
+        except (OSError, ValueError):
+            # El trabajador murió antes de escribir este resultado (p. ej. Chrome no arrancó)
+            resultados.append({"jornada": nombre, "pruebas": 0, "fallos": [],
+                               "errores": [[nombre, f"el trabajador terminó con código {proceso.returncode}, "
+                                                    f"ver {log}"]],
+                               "omitidas": 0, "duracion_s": 0, "capturas": 0,
+                               "ruta_capturas": os.path.join(raiz, nombre),
+                               "rendimiento": {}, "capturas_cambiadas": []})
+    return resultados
+
+
+def ejecutar_en_paralelo(jornadas, trabajadores):
+    """Reparte las jornadas entre varios navegadores y une los resultados en un informe"""
+    print("\n" + "="*80)
+    print(f"EJECUCIÓN PARALELA: {len(jornadas)} jornadas en {min(trabajadores, len(jornadas))} trabajadores")
+    print("="*80 + "\n")
+    inicio = time.monotonic()
+    resultados = []
+    # Reparto fijo: cada trabajador arranca un solo navegador y lo reutiliza en sus jornadas
+    repartos = [jornadas[numero::trabajadores] for numero in range(trabajadores)]
+    repartos = [reparto for reparto in repartos if reparto]
+    # Una sola sesión por usuario para todos los trabajadores, sin pasar por el formulario
+    try:
+        os.environ["WINESHOP_SESIONES"] = json.dumps(
+            {credenciales["usuario"]: crear_sesion(credenciales) for credenciales in (USUARIO_CLIENTE, USUARIO_ADMIN)})
+    except Exception as e:
+        print(f"  ⚠ No se pudieron crear las sesiones ({e}); cada trabajador creará las suyas")
+    with ThreadPoolExecutor(max_workers=len(repartos)) as pool:
+        futuros = [pool.submit(lanzar_trabajador, numero, reparto, RUTA_CAPTURAS)
+                   for numero, reparto in enumerate(repartos, 1)]
+        for futuro in as_completed(futuros):
+            for datos in futuro.result():
+                resultados.append(datos)
+                estado = "✅" if not datos["fallos"] and not datos["errores"] else "❌"
+                print(f"{estado} {datos['jornada']:<10} {datos['pruebas']} pruebas, "
+                      f"{len(datos['fallos'])} fallos, {len(datos['errores'])} errores, "
+                      f"{datos['capturas']} capturas en {datos['duracion_s']}s")
+
+    resultados.sort(key=lambda datos: list(jornadas).index(datos["jornada"]))
+    informe = {
+        "duracion_total_s": round(time.monotonic() - inicio, 1),
+        "trabajadores": len(repartos),
+        "pruebas": sum(datos["pruebas"] for datos in resultados),
+        "fallos": sum(len(datos["fallos"]) for datos in resultados),
+        "errores": sum(len(datos["errores"]) for datos in resultados),
+        "capturas": sum(datos["capturas"] for datos in resultados),
+        "jornadas": resultados,
+    }
+    visitas = {}
+    for datos in resultados:
+        for pagina, medidas in datos["rendimiento"].items():
+            visitas.setdefault(pagina, []).extend(medidas)
+    resumen = resumir_rendimiento(visitas)
+    informe["rendimiento"] = resumen
+    informe["excesos_presupuesto"] = excesos_presupuesto(resumen, PRESUPUESTOS)
+    ruta_informe = os.path.join(RUTA_CAPTURAS, "informe_paralelo.json")
+    with open(ruta_informe, "w", encoding="utf-8") as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+
+    for datos in resultados:
+        for prueba, traza in datos["fallos"] + datos["errores"]:
+            print(f"\n❌ [{datos['jornada']}] {prueba}\n{traza}")
+    imprimir_rendimiento(resumen, informe["excesos_presupuesto"])
+    for datos in resultados:
+        for nombre in datos["capturas_cambiadas"]:
+            print(f"  ⚠ [{datos['jornada']}] captura distinta de la base: {nombre}")
+    print("\n" + "="*80)
+    print(f"{informe['pruebas']} pruebas, {informe['fallos']} fallos, {informe['errores']} errores, "
+          f"{informe['capturas']} capturas en {informe['duracion_total_s']}s")
+    if informe["excesos_presupuesto"]:
+        print(f"❌ {len(informe['excesos_presupuesto'])} presupuestos de rendimiento superados "
+              f"con las visitas de todas las jornadas")
+    print(f"📂 Informe: {ruta_informe}")
+    print("="*80 + "\n")
+    # Los percentiles unidos pueden pasar el presupuesto aunque ninguna jornada lo pase sola
+    return informe["fallos"] == 0 and informe["errores"] == 0 and not informe["excesos_presupuesto"]
+
 
 if __name__ == "__main__":
-   
+    parser = argparse.ArgumentParser(description="Pruebas funcionales de Wine Shop")
+    parser.add_argument("--paralelo", type=int, nargs="?", const=len(JORNADAS), default=0,
+                        metavar="N", help="ejecutar las jornadas en N navegadores headless a la vez")
+    parser.add_argument("--jornadas", default=",".join(JORNADAS),
+                        help="jornadas a ejecutar, separadas por comas (%(default)s)")
+    parser.add_argument("--headless", action="store_true", help="navegador sin ventana")
+    parser.add_argument("--navegadores", type=int, default=NAVEGADORES_PRECALENTADOS, metavar="N",
+                        help="navegadores a arrancar por adelantado (%(default)s)")
+    parser.add_argument("--proyecto", help="carpeta del proyecto Django, para crear sesiones sin el formulario")
+    parser.add_argument("--settings", help="módulo de settings (por defecto $DJANGO_SETTINGS_MODULE)")
+    parser.add_argument("--base-capturas", help="carpeta con las capturas de referencia (por defecto, junto a este archivo)")
+    parser.add_argument("--presupuestos", default=os.environ.get("WINESHOP_PRESUPUESTOS"),
+                        help="JSON con presupuestos por página, p. ej. {\"*\": {\"lcp_ms\": 2000}}")
+    # Uso interno: cada trabajador de --paralelo se lanza con estas opciones
+    parser.add_argument("--jornada", help=argparse.SUPPRESS)
+    parser.add_argument("--capturas", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    NAVEGADOR_HEADLESS = args.headless
+    # Se pasan por entorno para que también los reciban los trabajadores de --paralelo
+    if args.proyecto:
+        PROYECTO_DJANGO = os.environ["WINESHOP_PROYECTO"] = args.proyecto
+    if args.settings:
+        os.environ["DJANGO_SETTINGS_MODULE"] = args.settings
+    if args.base_capturas:
+        RUTA_BASE_CAPTURAS = os.environ["WINESHOP_BASE_CAPTURAS"] = os.path.abspath(args.base_capturas)
+    if args.presupuestos:
+        os.environ["WINESHOP_PRESUPUESTOS"] = os.path.abspath(args.presupuestos)
+        cargar_presupuestos(args.presupuestos)
+    if args.capturas:
+        RUTA_CAPTURAS = args.capturas
+
+    if args.jornada or args.paralelo:
+        seleccion = [nombre.strip() for nombre in (args.jornada or args.jornadas).split(",") if nombre.strip()]
+        desconocidas = [nombre for nombre in seleccion if nombre not in JORNADAS]
+        if desconocidas:
+            parser.error(f"jornadas desconocidas: {', '.join(desconocidas)}")
+
+    if args.paralelo and not args.jornada:
+        sys.exit(0 if ejecutar_en_paralelo(seleccion, args.paralelo) else 1)
+
+    # El navegador arranca mientras se cargan las pruebas
+    POOL_NAVEGADORES.calentar(args.navegadores)
+
+    if args.jornada:
+        raiz = RUTA_CAPTURAS
+        exitos = [ejecutar_jornada(nombre, os.path.join(raiz, nombre)) for nombre in seleccion]
+        sys.exit(0 if all(exitos) else 1)
+
     loader = unittest.TestLoader()
     loader.sortTestMethodsUsing = None  
     suite = loader.loadTestsFromTestCase(WineShopTestCompleto)
@@ -0,0 +1,23 @@
+"""Settings para ejecutar las pruebas unitarias con el perfil rápido.
+
+Parte de los settings del proyecto (WINESHOP_SETTINGS_BASE, p. ej.
+tienda.settings) y cambia solo lo que hace lentas las pruebas: base de datos
+SQLite en memoria, hasher de contraseñas barato y el runner con informe de
+tiempos. Ver perfil_rapido.py para el comando completo.
+"""
+import importlib
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    _base = importlib.import_module(os.environ['WINESHOP_SETTINGS_BASE'])
+except KeyError:
+    raise ImproperlyConfigured('Define WINESHOP_SETTINGS_BASE con el módulo de settings del proyecto')
+
+globals().update({nombre: valor for nombre, valor in vars(_base).items() if nombre.isupper()})
+
+DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}}
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+TEST_RUNNER = 'perfil_rapido.RunnerRapido'
+DEBUG = False
@@ -1,7 +1,7 @@
-from django.test import TestCase
 from django.apps import apps
+from perfil_rapido import PruebaRapida
 
-class ProductoModelTest(TestCase):
+class ProductoModelTest(PruebaRapida):
     def setUp(self):
         self.Producto = apps.get_model('shop', 'Producto')
 
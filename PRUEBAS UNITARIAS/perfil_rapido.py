@@ -0,0 +1,90 @@
+"""Perfil rápido para las pruebas unitarias de la tienda.
+
+- PruebaRapida: TestCase con un hasher de contraseñas barato (MD5) para que
+  create_user y client.login no paguen PBKDF2. Los datos compartidos van en
+  setUpTestData, que se ejecuta una vez por clase.
+- Cronometrado: mixin que anota la duración de cada prueba.
+- RunnerRapido: ejecuta en paralelo por defecto y al final lista las pruebas
+  más lentas.
+
+Uso (desde la carpeta del proyecto Django, ver ajustes_pruebas.py):
+
+    PYTHONPATH="PRUEBAS UNITARIAS" WINESHOP_SETTINGS_BASE=tienda.settings \\
+        python manage.py test "PRUEBAS UNITARIAS" -p "*.py" --settings=ajustes_pruebas
+
+--parallel 1 lo ejecuta en un solo proceso; --lentas N cambia el largo del informe.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import TestCase, override_settings
+from django.test.runner import DiscoverRunner, get_max_test_processes
+
+HASHERS_RAPIDOS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Carpeta donde cada proceso de pruebas deja sus tiempos (la crea RunnerRapido)
+VARIABLE_TIEMPOS = 'WINESHOP_TIEMPOS_PRUEBAS'
+
+
+def registrar_tiempo(prueba, segundos):
+    carpeta = os.environ.get(VARIABLE_TIEMPOS)
+    if not carpeta:
+        return
+    # Un archivo por proceso: con --parallel cada trabajador escribe el suyo
+    with open(os.path.join(carpeta, f'{os.getpid()}.jsonl'), 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'prueba': prueba, 'segundos': segundos}) + '\n')
+
+
+class Cronometrado:
+    """Anota cuánto tarda cada prueba, setUp y tearDown incluidos."""
+
+    def run(self, result=None):
+        inicio = time.perf_counter()
+        try:
+            return super().run(result)
+        finally:
+            registrar_tiempo(self.id(), time.perf_counter() - inicio)
+
+
+@override_settings(PASSWORD_HASHERS=HASHERS_RAPIDOS)
+class PruebaRapida(Cronometrado, TestCase):
+    """TestCase base del perfil rápido."""
+
+
+class RunnerRapido(DiscoverRunner):
+    def __init__(self, lentas=10, parallel=0, **kwargs):
+        # Sin --parallel se usan todos los núcleos; --parallel 1 para un solo proceso
+        super().__init__(parallel=parallel or get_max_test_processes(), **kwargs)
+        self.lentas = lentas
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--lentas', type=int, default=10, metavar='N',
+            help='Cantidad de pruebas lentas a listar al final (0 para omitir el informe).',
+        )
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.carpeta_tiempos = tempfile.mkdtemp(prefix='tiempos_pruebas_')
+        os.environ[VARIABLE_TIEMPOS] = self.carpeta_tiempos
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        os.environ.pop(VARIABLE_TIEMPOS, None)
+        tiempos = []
+        for archivo in os.listdir(self.carpeta_tiempos):
+            with open(os.path.join(self.carpeta_tiempos, archivo), encoding='utf-8') as f:
+                tiempos.extend(json.loads(linea) for linea in f)
+        shutil.rmtree(self.carpeta_tiempos, ignore_errors=True)
+        if not tiempos or not self.lentas:
+            return
+        tiempos.sort(key=lambda t: t['segundos'], reverse=True)
+        total = sum(t['segundos'] for t in tiempos)
+        print(f'\nPruebas más lentas ({len(tiempos)} cronometradas, {total:.2f}s en total):')
+        for t in tiempos[:self.lentas]:
+            print(f'  {t["segundos"] * 1000:8.1f} ms  {t["prueba"]}')
@@ -0,0 +1,142 @@
+"""Presupuestos de consultas SQL por vista, para detectar N+1.
+
+ConsultasMixin agrega dos aserciones a cualquier TestCase:
+
+- assertPresupuesto(url, max_consultas, max_ms): una sola petición no puede
+  pasar de esa cantidad de consultas ni de ese tiempo de base de datos. El
+  tiempo es opcional y conviene dejarlo fuera en CI, donde varía mucho.
+- assertSinNMasUno(url, sembrar, tamanos): siembra filas en tamaños crecientes
+  (sembrar(n) agrega hasta tener n) y falla si la cantidad de consultas crece
+  con las filas. El mensaje lista el SQL repetido de la petición más grande.
+"""
+import re
+import time
+from collections import Counter
+from datetime import date, time as hora
+from decimal import Decimal
+
+from django.db import connections, models
+from django.utils import timezone
+
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+LISTA_IN_RE = re.compile(r"\bIN \((?:\s*(?:%s|\?)\s*,?)+\)")
+
+
+def normalizar_sql(sql):
+    """El SQL sin literales, para agrupar la misma consulta con parámetros distintos"""
+    sql = LITERAL_RE.sub("?", sql)
+    return LISTA_IN_RE.sub("IN (...)", " ".join(sql.split()))
+
+
+class CapturaConsultas:
+    """execute_wrapper que guarda cada consulta con su duración en todas las conexiones."""
+
+    def __init__(self):
+        self.consultas = []   # (sql, ms)
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append((sql, (time.perf_counter() - inicio) * 1000))
+
+    def __enter__(self):
+        self.envolturas = [connections[alias].execute_wrapper(self) for alias in connections]
+        for envoltura in self.envolturas:
+            envoltura.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        for envoltura in reversed(self.envolturas):
+            envoltura.__exit__(*exc)
+
+    @property
+    def total(self):
+        return len(self.consultas)
+
+    @property
+    def ms(self):
+        return sum(ms for _, ms in self.consultas)
+
+    def repetidas(self, minimo=2):
+        """[(veces, sql normalizado)] de las consultas que se ejecutaron al menos `minimo` veces"""
+        conteo = Counter(normalizar_sql(sql) for sql, _ in self.consultas)
+        return [(veces, sql) for sql, veces in conteo.most_common() if veces >= minimo]
+
+    def informe(self):
+        lineas = [f"{self.total} consultas, {self.ms:.1f} ms de base de datos"]
+        repetidas = self.repetidas()
+        if repetidas:
+            lineas.append("SQL repetido:")
+            lineas.extend(f"  {veces:>4}x {sql[:300]}" for veces, sql in repetidas)
+        return "\n".join(lineas)
+
+
+def crear(modelo, **campos):
+    """Crea una fila completando con valores neutros los campos obligatorios que no se pasan.
+
+    Permite sembrar pedidos, clientes, etc. sin depender de cada columna del
+    modelo; las claves foráneas obligatorias sí hay que pasarlas.
+    """
+    for campo in modelo._meta.concrete_fields:
+        if (campo.name in campos or campo.attname in campos or campo.null or campo.has_default()
+                or campo.primary_key or getattr(campo, "auto_now", False) or getattr(campo, "auto_now_add", False)):
+            continue
+        if campo.choices:
+            campos[campo.name] = campo.choices[0][0]
+        elif isinstance(campo, models.BooleanField):
+            campos[campo.name] = False
+        elif isinstance(campo, models.DecimalField):
+            campos[campo.name] = Decimal(1)
+        elif isinstance(campo, (models.IntegerField, models.FloatField)):
+            campos[campo.name] = 1
+        elif isinstance(campo, models.DateTimeField):
+            campos[campo.name] = timezone.now()
+        elif isinstance(campo, models.DateField):
+            campos[campo.name] = date.today()
+        elif isinstance(campo, models.TimeField):
+            campos[campo.name] = hora()
+        elif isinstance(campo, models.EmailField):
+            campos[campo.name] = f"semilla{modelo._default_manager.count()}@example.com"
+        elif isinstance(campo, (models.CharField, models.TextField)):
+            valor = f"semilla {modelo._default_manager.count()}"
+            campos[campo.name] = valor[:campo.max_length] if campo.max_length else valor
+    return modelo._default_manager.create(**campos)
+
+
+class ConsultasMixin:
+    """Aserciones de presupuesto de consultas para TestCase."""
+
+    def capturar_consultas(self, url, **kwargs):
+        with CapturaConsultas() as captura:
+            respuesta = self.client.get(url, **kwargs)
+        self.assertLess(respuesta.status_code, 400, f"GET {url} devolvió {respuesta.status_code}")
+        return captura
+
+    def assertPresupuesto(self, url, max_consultas=None, max_ms=None):
+        captura = self.capturar_consultas(url)
+        if max_consultas is not None and captura.total > max_consultas:
+            self.fail(f"GET {url}: {captura.total} consultas, presupuesto {max_consultas}\n{captura.informe()}")
+        if max_ms is not None and captura.ms > max_ms:
+            self.fail(f"GET {url}: {captura.ms:.1f} ms de base de datos, presupuesto {max_ms}\n{captura.informe()}")
+        return captura
+
+    def assertSinNMasUno(self, url, sembrar, tamanos=(1, 5, 20), max_consultas=None, max_ms=None):
+        """Falla si la cantidad de consultas de GET url cambia al crecer las filas sembradas"""
+        conteos = {}
+        # Una petición sin medir: la primera llena la sesión y las cachés y haría parecer que las consultas bajan
+        self.client.get(url)
+        for tamano in tamanos:
+            sembrar(tamano)
+            captura = self.capturar_consultas(url)
+            conteos[tamano] = captura.total
+        if len(set(conteos.values())) > 1:
+            detalle = ", ".join(f"{tamano} filas: {total}" for tamano, total in conteos.items())
+            self.fail(f"GET {url}: las consultas crecen con las filas ({detalle})\n{captura.informe()}")
+        if max_consultas is not None and captura.total > max_consultas:
+            self.fail(f"GET {url}: {captura.total} consultas, presupuesto {max_consultas}\n{captura.informe()}")
+        if max_ms is not None and captura.ms > max_ms:
+            self.fail(f"GET {url} con {tamanos[-1]} filas: {captura.ms:.1f} ms de base de datos, "
+                      f"presupuesto {max_ms}\n{captura.informe()}")
+        return captura
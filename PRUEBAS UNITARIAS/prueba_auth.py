@@ -1,11 +1,11 @@
-from django.test import TestCase, Client
 from django.contrib.auth.models import User
 from django.urls import reverse
+from perfil_rapido import PruebaRapida
 
-class AuthTest(TestCase):
-    def setUp(self):
-        self.client = Client()
-        self.user = User.objects.create_user(username='testuser', email='test@demo.com', password='12345')
+class AuthTest(PruebaRapida):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', email='test@demo.com', password='12345')
 
     def test_login_correcto(self):
         response = self.client.post(reverse('login'), {'username': 'testuser', 'password': '12345'})
@@ -16,7 +16,7 @@ class AuthTest(TestCase):
         self.assertNotEqual(response.status_code, 302)
 
     def test_logout(self):
-        self.client.login(username='testuser', password='12345')
+        self.client.force_login(self.user)
         response = self.client.get(reverse('logout'))
         self.assertIn(response.status_code, (200, 302))
 
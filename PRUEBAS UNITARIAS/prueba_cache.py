@@ -0,0 +1,66 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from shop.models import Producto
+from perfil_rapido import PruebaRapida
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CachePaginasTest(PruebaRapida):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cliente', password='12345')
+        cls.producto = Producto.objects.create(nombre='Vino Reserva', descripcion='Vino argentino', precio=60000, stock=8)
+        cls.otro = Producto.objects.create(nombre='Vino Rosado', descripcion='Vino chileno', precio=25000, stock=8)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_home_anonima_se_sirve_desde_cache(self):
+        self.assertEqual(self.client.get(reverse('home'))['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(reverse('home'))['X-Cache'], 'HIT')
+
+    def test_hit_conserva_las_cabeceras_de_la_vista(self):
+        primera = self.client.get(reverse('home'))
+        segunda = self.client.get(reverse('home'))
+        self.assertEqual(segunda['X-Cache'], 'HIT')
+        self.assertEqual({k: v for k, v in segunda.items() if k != 'X-Cache'},
+                         {k: v for k, v in primera.items() if k != 'X-Cache'})
+        self.assertFalse(segunda.cookies)
+
+    def test_cambio_de_precio_invalida_home_y_detalle(self):
+        detalle = reverse('detalle_producto', args=[self.producto.id])
+        self.client.get(reverse('home'))
+        self.client.get(detalle)
+
+        producto = Producto.objects.get(pk=self.producto.pk)
+        producto.precio = 55000
+        producto.save()
+
+        respuesta = self.client.get(detalle)
+        self.assertEqual(respuesta['X-Cache'], 'MISS')
+        self.assertContains(respuesta, '55')
+        self.assertEqual(self.client.get(reverse('home'))['X-Cache'], 'MISS')
+
+    def test_cambio_de_stock_no_invalida_otros_detalles(self):
+        detalle_otro = reverse('detalle_producto', args=[self.otro.id])
+        self.client.get(detalle_otro)
+
+        producto = Producto.objects.get(pk=self.producto.pk)
+        producto.stock = 3
+        producto.save()
+
+        self.assertEqual(self.client.get(detalle_otro)['X-Cache'], 'HIT')
+
+    def test_guardar_sin_cambios_visibles_no_invalida(self):
+        self.client.get(reverse('home'))
+        Producto.objects.get(pk=self.producto.pk).save()
+        self.assertEqual(self.client.get(reverse('home'))['X-Cache'], 'HIT')
+
+    def test_usuario_autenticado_no_recibe_pagina_anonima(self):
+        self.client.get(reverse('home'))
+        self.client.force_login(self.user)
+        respuesta = self.client.get(reverse('home'))
+        self.assertNotEqual(respuesta.get('X-Cache'), 'HIT')
+        self.assertContains(respuesta, 'Salir')
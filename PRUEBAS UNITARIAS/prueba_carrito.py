@@ -1,13 +1,13 @@
-from django.test import TestCase, Client
 from django.contrib.auth.models import User
 from django.urls import reverse
-from shop.models import Producto, Pedido
+from shop.models import Producto, Pedido, Carrito, ItemCarrito
+from perfil_rapido import PruebaRapida
 
-class FlujoCompraTest(TestCase):
-    def setUp(self):
-        self.client = Client()
-        self.user = User.objects.create_user(username='cliente', password='12345')
-        self.producto = Producto.objects.create(
+class FlujoCompraTest(PruebaRapida):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cliente', password='12345')
+        cls.producto = Producto.objects.create(
             nombre='Vino Reserva',
             descripcion='Vino argentino',
             precio=60000,
@@ -35,6 +35,29 @@ class FlujoCompraTest(TestCase):
         self.assertTrue(Pedido.objects.filter(usuario=self.user).exists())
 
     def test_agregar_cantidad_superior_stock(self):
-        self.client.login(username='cliente', password='12345')
+        self.client.force_login(self.user)
         response = self.client.post(reverse('agregar_carrito', args=[self.producto.id]), {'cantidad': 99})
         self.assertContains(response, 'cantidad no disponible', status_code=200)
+
+    def llenar_carrito(self, cantidad):
+        carrito, _ = Carrito.objects.get_or_create(usuario=self.user)
+        ItemCarrito.objects.create(carrito=carrito, producto=self.producto, cantidad=cantidad)
+
+    def test_checkout_descuenta_stock_y_vacia_carrito(self):
+        self.client.force_login(self.user)
+        self.llenar_carrito(3)
+        self.client.post(reverse('checkout'))
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).stock, 5)
+        self.assertEqual(Pedido.objects.filter(usuario=self.user).count(), 1)
+        self.assertFalse(ItemCarrito.objects.filter(carrito__usuario=self.user).exists())
+
+    def test_checkout_sin_stock_no_deja_nada_a_medias(self):
+        """El stock se agotó después de agregar al carrito: ni pedido, ni stock negativo, ni carrito vacío."""
+        self.client.force_login(self.user)
+        self.llenar_carrito(5)
+        Producto.objects.filter(pk=self.producto.pk).update(stock=2)
+        response = self.client.post(reverse('checkout'))
+        self.assertIn(response.status_code, (200, 302))
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).stock, 2)
+        self.assertFalse(Pedido.objects.filter(usuario=self.user).exists())
+        self.assertTrue(ItemCarrito.objects.filter(carrito__usuario=self.user).exists())
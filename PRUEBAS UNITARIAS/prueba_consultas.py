@@ -0,0 +1,119 @@
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.urls import NoReverseMatch, get_resolver, reverse
+from shop.models import Producto, Carrito, ItemCarrito, Pedido
+from perfil_rapido import PruebaRapida
+from presupuesto_consultas import ConsultasMixin, crear
+
+# (máximo de consultas, máximo de ms de base de datos) por vista con la mayor cantidad de filas sembradas.
+# El tiempo varía mucho entre máquinas y en CI: los ms son holgados, solo atrapan lo patológico,
+# y None lo deja sin límite.
+PRESUPUESTOS = {
+    'carrito': (12, 250),
+    'mis_pedidos': (12, 250),
+    'admin_pedidos': (15, 500),
+    'admin_clientes': (15, 500),
+}
+TAMANOS = (1, 5, 20)
+LINEAS_POR_PEDIDO = 3
+
+
+def nombres_de_url(resolver=None, prefijo=''):
+    """Todos los nombres de URL que se pueden pasar a reverse(), con su namespace"""
+    resolver = resolver or get_resolver()
+    nombres = {prefijo + nombre for nombre in resolver.reverse_dict if isinstance(nombre, str)}
+    for namespace, (_, subresolver) in resolver.namespace_dict.items():
+        if namespace != 'admin':
+            nombres |= nombres_de_url(subresolver, f'{prefijo}{namespace}:')
+    return nombres
+
+
+def relacion(modelo, destino):
+    """Nombre de la clave foránea de modelo hacia destino, o None"""
+    return next((campo.name for campo in modelo._meta.concrete_fields
+                 if campo.is_relation and campo.related_model is destino), None)
+
+
+def modelo_linea():
+    """El modelo de la tienda con claves foráneas a Pedido y a Producto, o None"""
+    for modelo in apps.get_app_config('shop').get_models():
+        if relacion(modelo, Pedido) and relacion(modelo, Producto):
+            return modelo
+    return None
+
+
+class ConsultasVistasTest(ConsultasMixin, PruebaRapida):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = User.objects.create_user(username='cliente', password='12345')
+        cls.admin = User.objects.create_superuser(username='admin', email='admin@demo.com', password='12345')
+        cls.productos = [Producto.objects.create(nombre=f'Vino Línea {n}', descripcion='Semilla',
+                                                 precio=10000, stock=50) for n in range(LINEAS_POR_PEDIDO)]
+
+    def url(self, nombre):
+        """Falla en vez de saltarse: un nombre equivocado no puede apagar el presupuesto"""
+        try:
+            return reverse(nombre)
+        except NoReverseMatch:
+            self.fail(f"la tienda no define la URL '{nombre}'; corrige PRESUPUESTOS con uno de estos nombres: "
+                      f"{', '.join(sorted(nombres_de_url()))}")
+
+    def comprobar(self, nombre, sembrar):
+        max_consultas, max_ms = PRESUPUESTOS[nombre]
+        self.assertSinNMasUno(self.url(nombre), sembrar, TAMANOS, max_consultas, max_ms)
+
+    def crear_pedido(self, usuario):
+        """Un pedido con una línea por producto, para que un N+1 sobre líneas o productos se note"""
+        pedido = crear(Pedido, usuario=usuario)
+        Linea = modelo_linea()
+        if Linea is not None:
+            for producto in self.productos:
+                crear(Linea, **{relacion(Linea, Pedido): pedido, relacion(Linea, Producto): producto})
+        return pedido
+
+    # ---------------------------
+    # Vistas de cliente
+    # ---------------------------
+    def test_carrito_no_crece_con_items(self):
+        """Cada ItemCarrito muestra su producto: debe venir en la misma consulta."""
+        self.client.force_login(self.cliente)
+        carrito, _ = Carrito.objects.get_or_create(usuario=self.cliente)
+
+        def sembrar(n):
+            while ItemCarrito.objects.filter(carrito=carrito).count() < n:
+                producto = Producto.objects.create(nombre='Vino Semilla', descripcion='Semilla', precio=10000, stock=50)
+                ItemCarrito.objects.create(carrito=carrito, producto=producto, cantidad=1)
+
+        self.comprobar('carrito', sembrar)
+
+    def test_mis_pedidos_no_crece_con_pedidos(self):
+        self.client.force_login(self.cliente)
+
+        def sembrar(n):
+            while Pedido.objects.filter(usuario=self.cliente).count() < n:
+                self.crear_pedido(self.cliente)
+
+        self.comprobar('mis_pedidos', sembrar)
+
+    # ---------------------------
+    # Listados de administración
+    # ---------------------------
+    def test_admin_pedidos_no_crece_con_pedidos(self):
+        """Cada pedido es de un cliente distinto, para que pedido.usuario no salga gratis."""
+        self.client.force_login(self.admin)
+
+        def sembrar(n):
+            while Pedido.objects.count() < n:
+                usuario = User.objects.create(username=f'comprador{Pedido.objects.count()}')
+                self.crear_pedido(usuario)
+
+        self.comprobar('admin_pedidos', sembrar)
+
+    def test_admin_clientes_no_crece_con_clientes(self):
+        self.client.force_login(self.admin)
+
+        def sembrar(n):
+            while User.objects.filter(is_staff=False).count() < n:
+                User.objects.create(username=f'cliente_semilla{User.objects.count()}')
+
+        self.comprobar('admin_clientes', sembrar)
@@ -1,10 +1,23 @@
-from django.test import TestCase, Client
+import importlib
+
+from django.db import connection
 from django.urls import reverse
 from shop.models import Producto
+from perfil_rapido import PruebaRapida
+
+
+def indice_fts_disponible():
+    """True si la tienda tiene shop/busqueda.py y su índice FTS5 está creado"""
+    try:
+        busqueda = importlib.import_module('shop.busqueda')
+    except ImportError:
+        return False
+    return busqueda.indice_disponible(connection)
 
-class RegistroBusquedaTest(TestCase):
-    def setUp(self):
-        self.client = Client()
+
+class RegistroBusquedaTest(PruebaRapida):
+    @classmethod
+    def setUpTestData(cls):
         Producto.objects.create(nombre='Vino Tinto Premium', descripcion='Seco', precio=50000, stock=8)
 
     def test_busqueda_producto_existente(self):
@@ -16,3 +29,27 @@ class RegistroBusquedaTest(TestCase):
         response = self.client.get(reverse('busqueda') + '?q=xyz-no-existe')
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'no se encontraron productos')
+
+    def test_busqueda_ignora_tildes_y_mayusculas(self):
+        if not indice_fts_disponible():
+            self.skipTest('sin shop/busqueda.py o sin su índice FTS5, la búsqueda no ignora tildes')
+        Producto.objects.create(nombre='Cabernet Sauvignón', descripcion='Tinto', precio=30000, stock=5)
+        response = self.client.get(reverse('busqueda') + '?q=CABERNET sauvignon')
+        self.assertContains(response, 'Cabernet Sauvignón')
+
+    def test_busqueda_por_prefijo(self):
+        response = self.client.get(reverse('busqueda') + '?q=vin tin')
+        self.assertContains(response, 'Vino Tinto Premium')
+
+    def test_busqueda_prioriza_coincidencia_en_nombre(self):
+        Producto.objects.create(nombre='Espumante Brut', descripcion='Ideal para acompañar un vino tinto', precio=20000, stock=5)
+        response = self.client.get(reverse('busqueda') + '?q=vino tinto')
+        contenido = response.content.decode()
+        self.assertLess(contenido.index('Vino Tinto Premium'), contenido.index('Espumante Brut'))
+
+    def test_busqueda_refleja_cambios_del_producto(self):
+        producto = Producto.objects.create(nombre='Pisco Especial', descripcion='Destilado', precio=15000, stock=5)
+        Producto.objects.filter(pk=producto.pk).update(nombre='Pisco Reservado')
+        self.assertContains(self.client.get(reverse('busqueda') + '?q=reservado'), 'Pisco Reservado')
+        producto.delete()
+        self.assertContains(self.client.get(reverse('busqueda') + '?q=reservado'), 'no se encontraron productos')
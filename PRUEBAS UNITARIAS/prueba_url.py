@@ -1,8 +1,9 @@
 from django.test import SimpleTestCase
 from django.urls import reverse, resolve
 from shop import views
+from perfil_rapido import Cronometrado
 
-class UrlsTest(SimpleTestCase):
+class UrlsTest(Cronometrado, SimpleTestCase):
     def test_url_home_resuelve(self):
         url = reverse('home')
         self.assertEqual(resolve(url).func, views.home)
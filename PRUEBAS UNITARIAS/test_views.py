@@ -1,21 +1,24 @@
-Test_views.py
-
-from django.test import TestCase, Client
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
 from shop.models import Producto, Carrito, ItemCarrito
+from perfil_rapido import PruebaRapida
 
-class ViewsTest(TestCase):
-    def setUp(self):
-        self.client = Client()
-        self.user = User.objects.create_user(username='cliente', password='12345')
-        self.producto = Producto.objects.create(
+class ViewsTest(PruebaRapida):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cliente', password='12345')
+        cls.producto = Producto.objects.create(
             nombre='Vino Blanco',
             descripcion='Vino blanco español',
             precio=40000,
             stock=15
         )
-        self.client.login(username='cliente', password='12345')
+
+    def setUp(self):
+        self.client.force_login(self.user)
 
     # ---------------------------
     # 1. Prueba de la vista principal
@@ -75,4 +78,54 @@ class ViewsTest(TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'Vino Blanco')
-        self.assertContains(response, '2')  # cantidad en el HTML
\ No newline at end of file
+        self.assertContains(response, '2')  # cantidad en el HTML
+
+    def test_agregar_no_supera_stock_sumando_lo_del_carrito(self):
+        """Lo que ya está en el carrito cuenta para el límite de stock."""
+        self.client.post(reverse('agregar_carrito', args=[self.producto.id]), {'cantidad': 10})
+        response = self.client.post(reverse('agregar_carrito', args=[self.producto.id]), {'cantidad': 6})
+        self.assertContains(response, 'cantidad no disponible')
+        item = ItemCarrito.objects.get(carrito__usuario=self.user, producto=self.producto)
+        self.assertEqual(item.cantidad, 10)
+
+    # La copia del carrito en la sesión solo se usa con una cache compartida
+    # entre procesos; en las pruebas hay un solo proceso y basta LocMemCache.
+    @override_settings(CARRITO_EN_SESION=True)
+    def test_ver_carrito_refleja_lo_agregado_despues(self):
+        """La copia del carrito en la sesión se descarta al agregar."""
+        otro = Producto.objects.create(nombre='Vino Espumante', descripcion='Brut', precio=30000, stock=5)
+        self.client.post(reverse('agregar_carrito', args=[self.producto.id]), {'cantidad': 1})
+        self.client.get(reverse('carrito'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('agregar_carrito', args=[otro.id]), {'cantidad': 1})
+        self.assertContains(self.client.get(reverse('carrito')), 'Vino Espumante')
+
+    @override_settings(CARRITO_EN_SESION=True)
+    def test_ver_carrito_refleja_cambios_del_producto(self):
+        """Guardar el producto (p. ej. desde el admin) invalida la copia del carrito."""
+        self.client.post(reverse('agregar_carrito', args=[self.producto.id]), {'cantidad': 1})
+        self.client.get(reverse('carrito'))
+        producto = Producto.objects.get(pk=self.producto.pk)
+        producto.nombre = 'Vino Blanco Reserva'
+        producto.precio = 45000
+        producto.save()
+        self.assertContains(self.client.get(reverse('carrito')), 'Vino Blanco Reserva')
+
+    def consultas_por_vista_de_carrito(self):
+        self.client.post(reverse('agregar_carrito', args=[self.producto.id]), {'cantidad': 2})
+        with CaptureQueriesContext(connection) as primera:
+            self.client.get(reverse('carrito'))
+        with CaptureQueriesContext(connection) as segunda:
+            response = self.client.get(reverse('carrito'))
+        self.assertContains(response, 'Vino Blanco')
+        return len(primera), len(segunda)
+
+    @override_settings(CARRITO_EN_SESION=True)
+    def test_ver_carrito_otra_vez_consulta_menos(self):
+        primera, segunda = self.consultas_por_vista_de_carrito()
+        self.assertLess(segunda, primera)
+
+    def test_sin_cache_compartida_siempre_lee_la_base(self):
+        """Con LocMemCache cada proceso tendría su propia versión del carrito: no se usa la sesión."""
+        primera, segunda = self.consultas_por_vista_de_carrito()
+        self.assertEqual(segunda, primera)
@@ -0,0 +1,139 @@
+"""Indexed product search for the shop Django app.
+
+Create the index from a migration:
+
+    from django.db import migrations
+    from shop import busqueda
+
+    class Migration(migrations.Migration):
+        dependencies = [('shop', '<latest migration>')]
+        operations = [migrations.RunPython(busqueda.crear_indice, busqueda.borrar_indice)]
+
+Then, in the busqueda view:
+
+    productos = busqueda.buscar_productos(request.GET.get('q', ''))
+
+buscar_productos returns a Producto queryset ordered by relevance, and an
+empty one when nothing matches, so the template keeps rendering
+"no se encontraron productos" as before.
+
+On SQLite the index is an FTS5 table over nombre and descripcion. Its
+tokenizer folds case and accents, and it keeps prefix indexes so "tin"
+finds "Tinto". Results are ranked with bm25, and matches in nombre weigh
+more than matches in descripcion. Triggers on the Producto table keep the
+index in sync. They also fire for queryset.update(), bulk_create() and
+writes from other processes, which post_save signals would miss. On other
+databases, or if SQLite was built without FTS5, the search falls back to
+an icontains filter on every word, ranked by how many words are found in
+nombre and in descripcion. That fallback does not fold accents, so
+"sauvignon" does not find "Sauvignón" there.
+
+To check that latency stays flat, grow the catalogue with seed_data.py and
+run prueba_carga.py -s search.
+"""
+import re
+
+from django.apps import apps
+from django.db import DatabaseError, connections, router
+from django.db.models import Case, ExpressionWrapper, FloatField, IntegerField, Q, Value, When
+
+INDICE = 'shop_producto_fts'
+PESO_NOMBRE = 10.0
+PESO_DESCRIPCION = 1.0
+PALABRA_RE = re.compile(r'\w+')
+
+_disponible = {}   # (alias, NAME) -> whether the FTS5 table exists
+
+
+def _producto():
+    return apps.get_model('shop', 'Producto')
+
+
+def crear_indice(apps_migracion, schema_editor):
+    """RunPython step: create the FTS5 table and its triggers, then index every product."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    Producto = apps_migracion.get_model('shop', 'Producto')
+    tabla = Producto._meta.db_table
+    pk = Producto._meta.pk.column
+    nuevo = f"INSERT INTO {INDICE}(rowid, nombre, descripcion) VALUES (new.{pk}, new.nombre, new.descripcion);"
+    viejo = (f"INSERT INTO {INDICE}({INDICE}, rowid, nombre, descripcion) "
+             f"VALUES ('delete', old.{pk}, old.nombre, old.descripcion);")
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {INDICE} USING fts5("
+                f"nombre, descripcion, content='{tabla}', content_rowid='{pk}', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+        except DatabaseError:
+            # SQLite without FTS5: buscar_productos falls back to icontains
+            return
+        cursor.execute(f"CREATE TRIGGER {INDICE}_ai AFTER INSERT ON {tabla} BEGIN {nuevo} END")
+        cursor.execute(f"CREATE TRIGGER {INDICE}_ad AFTER DELETE ON {tabla} BEGIN {viejo} END")
+        cursor.execute(f"CREATE TRIGGER {INDICE}_au AFTER UPDATE OF nombre, descripcion ON {tabla} "
+                       f"BEGIN {viejo} {nuevo} END")
+        cursor.execute(f"INSERT INTO {INDICE}({INDICE}) VALUES ('rebuild')")
+    _disponible.clear()
+
+
+def borrar_indice(apps_migracion, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for sufijo in ('ai', 'ad', 'au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {INDICE}_{sufijo}")
+        cursor.execute(f"DROP TABLE IF EXISTS {INDICE}")
+    _disponible.clear()
+
+
+def indice_disponible(connection):
+    clave = (connection.alias, connection.settings_dict['NAME'])
+    if clave not in _disponible:
+        _disponible[clave] = (connection.vendor == 'sqlite'
+                              and INDICE in connection.introspection.table_names())
+    return _disponible[clave]
+
+
+def palabras(q):
+    return PALABRA_RE.findall(q or '')
+
+
+def buscar_productos(q, limite=200):
+    """Products matching every word of q (each word also as a prefix), best match first."""
+    Producto = _producto()
+    terminos = palabras(q)
+    if not terminos:
+        return Producto.objects.none()
+    connection = connections[router.db_for_read(Producto)]
+    if not indice_disponible(connection):
+        return _buscar_sin_indice(Producto, terminos, limite)
+
+    # Each word quoted (FTS5 syntax characters are not words) and as a prefix
+    consulta = ' '.join(f'"{termino}"*' for termino in terminos)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {INDICE} WHERE {INDICE} MATCH %s "
+            f"ORDER BY bm25({INDICE}, {PESO_NOMBRE}, {PESO_DESCRIPCION}) LIMIT %s",
+            [consulta, limite])
+        ids = [fila[0] for fila in cursor.fetchall()]
+    if not ids:
+        return Producto.objects.none()
+    orden = Case(*[When(pk=pk, then=Value(posicion)) for posicion, pk in enumerate(ids)],
+                 output_field=IntegerField())
+    return Producto.objects.filter(pk__in=ids).order_by(orden)
+
+
+def _buscar_sin_indice(Producto, terminos, limite):
+    """icontains on every word, ranked like bm25 roughly: words found in nombre weigh more."""
+    filtro = Q()
+    relevancia = Value(0.0)
+    for termino in terminos:
+        filtro &= Q(nombre__icontains=termino) | Q(descripcion__icontains=termino)
+        relevancia += (Case(When(nombre__icontains=termino, then=Value(PESO_NOMBRE)), default=Value(0.0))
+                       + Case(When(descripcion__icontains=termino, then=Value(PESO_DESCRIPCION)),
+                              default=Value(0.0)))
+    return (Producto.objects.filter(filtro)
+            .annotate(relevancia=ExpressionWrapper(relevancia, output_field=FloatField()))
+            .order_by('-relevancia', 'pk')[:limite])
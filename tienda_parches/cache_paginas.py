@@ -0,0 +1,197 @@
+"""Page and fragment caching for the shop's catalogue pages.
+
+Decorate the views:
+
+    from shop.cache_paginas import cache_pagina
+
+    @cache_pagina('catalogo')
+    def home(request): ...
+
+    @cache_pagina('catalogo')
+    def catalogo(request): ...
+
+    @cache_pagina('catalogo')
+    def ofertas(request): ...
+
+    @cache_pagina('producto', pk_kwarg='producto_id')
+    def detalle_producto(request, producto_id): ...
+
+Anonymous GET/HEAD requests are served whole from the cache, with the body,
+status and headers the view returned (never its cookies). Responses for
+logged-in users carry their name and cart, so they are rendered every time.
+Those users share the product fragments instead. Add
+'shop.cache_paginas.versiones_cache' to the template context processors
+and wrap the product lists with
+
+    {% load cache %}
+    {% cache None lista_productos catalogo_version request.get_full_path %}...{% endcache %}
+
+Entries never expire on a timer. Every key includes a generation number,
+and saving a Producto bumps it. The "catalogo" generation changes when a
+product is created, deleted, or changes one of CAMPOS_VISIBLES. The
+per-product generation changes only for that product. Old entries fall
+out of the cache through its own eviction. TIEMPO_MAXIMO is only a
+backstop. queryset.update() skips signals, so code that writes Producto
+in bulk must call invalidar_producto()/invalidar_catalogo() itself.
+
+The cache alias comes from settings.CACHE_PAGINAS (default 'default'). It
+works with LocMemCache in a single process, and with Redis or Memcached
+when several processes must see the same generations and counters, e.g.
+
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                          'LOCATION': 'redis://127.0.0.1:6379'}}
+
+Responses carry X-Cache: HIT/MISS, which prueba_carga.py aggregates per
+endpoint. estadisticas_cache is a staff-only JSON view with the shared
+hit/miss counters.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_init, post_save
+from django.http import HttpResponse, JsonResponse
+
+PREFIJO = 'pagina'
+TIEMPO_MAXIMO = 24 * 60 * 60
+CAMPOS_VISIBLES = ('nombre', 'descripcion', 'precio', 'stock', 'en_oferta', 'imagen')
+ALCANCES = ('catalogo', 'producto')
+
+
+def _cache():
+    return caches[getattr(settings, 'CACHE_PAGINAS', 'default')]
+
+
+def _clave_generacion(alcance, pk=None):
+    return f'{PREFIJO}:gen:{alcance}' + (f':{pk}' if pk is not None else '')
+
+
+def generacion(alcance, pk=None):
+    """Current generation of a scope; a missing (evicted) one starts a new generation."""
+    cache = _cache()
+    clave = _clave_generacion(alcance, pk)
+    valor = cache.get(clave)
+    if valor is None:
+        cache.add(clave, time.time_ns(), None)
+        valor = cache.get(clave)
+    return valor
+
+
+def invalidar_catalogo():
+    _cache().set(_clave_generacion('catalogo'), time.time_ns(), None)
+
+
+def invalidar_producto(pk):
+    _cache().set(_clave_generacion('producto', pk), time.time_ns(), None)
+    invalidar_catalogo()
+
+
+def _contar(alcance, resultado):
+    cache = _cache()
+    clave = f'{PREFIJO}:stats:{alcance}:{resultado}'
+    if not cache.add(clave, 1, None):
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, 1, None)
+
+
+def estadisticas():
+    """{alcance: {'hits', 'misses', 'hit_ratio'}} across every process sharing the cache."""
+    cache = _cache()
+    claves = [f'{PREFIJO}:stats:{alcance}:{resultado}' for alcance in ALCANCES for resultado in ('hit', 'miss')]
+    valores = cache.get_many(claves)
+    resultado = {}
+    for alcance in ALCANCES:
+        hits = valores.get(f'{PREFIJO}:stats:{alcance}:hit', 0)
+        misses = valores.get(f'{PREFIJO}:stats:{alcance}:miss', 0)
+        resultado[alcance] = {'hits': hits, 'misses': misses,
+                              'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None}
+    return resultado
+
+
+@staff_member_required
+def estadisticas_cache(request):
+    return JsonResponse(estadisticas())
+
+
+def _del_visitante(request, respuesta):
+    """True when the page holds something tied to this visitor: a CSRF token, shown messages, cookies."""
+    mensajes = getattr(request, '_messages', None)
+    # get_token() flags the request: CSRF_COOKIE_NEEDS_UPDATE since Django 4.0, CSRF_COOKIE_USED before
+    csrf = request.META.get('CSRF_COOKIE_NEEDS_UPDATE') or request.META.get('CSRF_COOKIE_USED')
+    return bool(respuesta.cookies or csrf or (mensajes is not None and mensajes.used))
+
+
+def cache_pagina(alcance, pk_kwarg=None):
+    """Cache the whole response for anonymous GET/HEAD requests, keyed by generation and URL."""
+    if alcance not in ALCANCES:
+        raise ValueError(f'alcance must be one of {ALCANCES}')
+
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return vista(request, *args, **kwargs)
+            pk = kwargs.get(pk_kwarg) if pk_kwarg else None
+            ruta = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            clave = f'{PREFIJO}:{alcance}:{generacion(alcance, pk)}:{ruta}'
+            cache = _cache()
+            guardada = cache.get(clave)
+            if guardada is not None:
+                _contar(alcance, 'hit')
+                contenido, status, cabeceras = guardada
+                respuesta = HttpResponse(contenido, status=status)
+                for cabecera, valor in cabeceras:
+                    respuesta[cabecera] = valor
+                respuesta['X-Cache'] = 'HIT'
+                return respuesta
+            _contar(alcance, 'miss')
+            respuesta = vista(request, *args, **kwargs)
+            if hasattr(respuesta, 'render') and callable(respuesta.render) and not respuesta.is_rendered:
+                respuesta.render()
+            if respuesta.status_code == 200 and not respuesta.streaming and not _del_visitante(request, respuesta):
+                # every header the view set (Vary, Cache-Control, Content-Language...); cookies are
+                # kept apart in respuesta.cookies, and a response with cookies is never stored
+                cache.set(clave, (respuesta.content, respuesta.status_code, list(respuesta.items())),
+                          TIEMPO_MAXIMO)
+            respuesta['X-Cache'] = 'MISS'
+            return respuesta
+        return envoltura
+    return decorador
+
+
+def versiones_cache(request):
+    """Context processor: the catalogue generation, for {% cache %} fragment keys."""
+    return {'catalogo_version': generacion('catalogo')}
+
+
+def _visibles(instancia):
+    # __dict__ rather than getattr so deferred fields are not loaded
+    return {campo: instancia.__dict__.get(campo) for campo in CAMPOS_VISIBLES if campo in instancia.__dict__}
+
+
+def _recordar(sender, instance, **kwargs):
+    instance._cache_visibles = _visibles(instance)
+
+
+def _producto_guardado(sender, instance, created, **kwargs):
+    antes = getattr(instance, '_cache_visibles', {})
+    ahora = _visibles(instance)
+    if created:
+        invalidar_catalogo()
+    elif any(antes.get(campo) != valor for campo, valor in ahora.items() if campo in antes):
+        invalidar_producto(instance.pk)
+    instance._cache_visibles = ahora
+
+
+def _producto_borrado(sender, instance, **kwargs):
+    invalidar_producto(instance.pk)
+
+
+post_init.connect(_recordar, sender='shop.Producto', dispatch_uid='cache_paginas_init')
+post_save.connect(_producto_guardado, sender='shop.Producto', dispatch_uid='cache_paginas_save')
+post_delete.connect(_producto_borrado, sender='shop.Producto', dispatch_uid='cache_paginas_delete')
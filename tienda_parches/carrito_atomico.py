@@ -0,0 +1,354 @@
+"""Atomic cart writes and a per-session cart snapshot for the shop Django app.
+
+Make (carrito, producto) unique from a migration:
+
+    from django.db import migrations
+    from shop import carrito_atomico
+
+    class Migration(migrations.Migration):
+        dependencies = [('shop', '<latest migration>')]
+        operations = [migrations.RunPython(carrito_atomico.crear_indice_unico,
+                                           carrito_atomico.borrar_indice_unico)]
+
+and use it from the cart views:
+
+    from shop import carrito_atomico
+
+    @login_required
+    def agregar_carrito(request, producto_id):
+        try:
+            carrito_atomico.agregar(request, producto_id, int(request.POST.get('cantidad', 1)))
+        except carrito_atomico.ProductoInexistente:
+            raise Http404('producto inexistente')
+        except carrito_atomico.CantidadNoDisponible:
+            producto = get_object_or_404(Producto, pk=producto_id)
+            return render(request, 'detalle_producto.html', {'producto': producto, 'error': 'cantidad no disponible'})
+        except carrito_atomico.CarritoOcupado:
+            messages.error(request, 'La tienda está ocupada, inténtalo de nuevo')
+        return redirect('carrito')
+
+    @login_required
+    def ver_carrito(request):
+        items = carrito_atomico.items_carrito(request)
+        total = sum(item.producto.precio * item.cantidad for item in items)
+        ...
+
+crear_indice_unico first merges any duplicate rows by adding up their
+quantities. With the index in place, an add is a single upsert with the
+stock limit in it:
+
+    INSERT INTO itemcarrito (carrito_id, producto_id, cantidad)
+    SELECT ?, id, n FROM producto WHERE id = ? AND stock >= n
+    ON CONFLICT (carrito_id, producto_id) DO UPDATE SET cantidad = cantidad + n
+    WHERE cantidad + n <= (SELECT stock FROM producto WHERE id = producto_id)
+
+Double clicks can neither lose an update nor insert a second row, and no
+click reads before it writes. The INSERT sets only those three columns.
+If ItemCarrito has another column it cannot leave to the database, such
+as an auto_now_add date or a NOT NULL field without a db_default, an add
+goes through the ORM instead: an UPDATE and, on the first add, create(),
+where the index turns a concurrent second create() into an
+IntegrityError that falls back to the UPDATE. A single statement never holds a read lock
+while waiting for the write lock, so SQLite makes it wait out the busy
+timeout rather than fail. If the database is still locked, agregar
+retries REINTENTOS times and then raises CarritoOcupado. Without the
+index, adds fall back to an UPDATE plus a Carrito row lock for the first
+add. That works only where select_for_update() locks, so SQLite raises
+ImproperlyConfigured instead. The cart id is kept in the session, so the
+Carrito lookup runs once per session.
+
+items_carrito() can keep a snapshot of the items and their products in
+the session. The session is loaded on every request anyway, so rendering
+the cart then makes no query until something changes. Each snapshot is
+tagged with a per-cart version and with the catalogue generation from
+cache_paginas.py, which must be installed too. Both live in the
+CACHE_PAGINAS cache.
+
+- agregar() and confirmar_pedido() in checkout_atomico.py bump the cart
+  version.
+- Any other code that changes ItemCarrito rows must call
+  tocar_carrito(carrito_id).
+- A Producto save that changes its price or stock bumps the catalogue
+  generation, through cache_paginas.
+
+A snapshot is only correct if every worker process sees those bumps.
+The snapshot is therefore used only when that cache is shared, such as
+Redis or Memcached. With LocMemCache or DummyCache, items_carrito reads
+the cart on every render. Set CARRITO_EN_SESION to force the choice, for
+example True in a single-process test run. The snapshot is only for
+display. The checkout always re-reads the cart and the stock from the
+database.
+
+bench_carrito.py measures concurrent clicks on the same product.
+"""
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, OperationalError, connections, router, transaction
+from django.db.models import NOT_PROVIDED, Count, F, Min, Sum
+
+SESION_CARRITO = '_carrito_id'
+SESION_ITEMS = '_carrito_items'
+INDICE_UNICO = 'shop_itemcarrito_carrito_producto_uniq'
+REINTENTOS = 3
+ESPERA_REINTENTO = 0.05
+
+_upsert_disponible = {}   # (alias, NAME) -> whether the ON CONFLICT upsert can be used
+
+
+class CantidadNoDisponible(Exception):
+    def __init__(self, producto_id, disponible):
+        super().__init__(f'cantidad no disponible para el producto {producto_id} (stock {disponible})')
+        self.producto_id = producto_id
+        self.disponible = disponible
+
+
+class ProductoInexistente(Exception):
+    def __init__(self, producto_id):
+        super().__init__(f'producto inexistente: {producto_id}')
+        self.producto_id = producto_id
+
+
+class CarritoOcupado(Exception):
+    """The database stayed locked through every retry; the view should ask to try again."""
+
+
+def _modelos():
+    shop = apps.get_app_config('shop')
+    return (shop.get_model('Producto'), shop.get_model('Carrito'), shop.get_model('ItemCarrito'))
+
+
+def _cache():
+    return caches[getattr(settings, 'CACHE_PAGINAS', 'default')]
+
+
+def _clave_version(carrito_id):
+    return f'carrito:version:{carrito_id}'
+
+
+def version_carrito(carrito_id):
+    cache = _cache()
+    clave = _clave_version(carrito_id)
+    valor = cache.get(clave)
+    if valor is None:
+        cache.add(clave, time.time_ns(), None)
+        valor = cache.get(clave)
+    return valor
+
+
+def tocar_carrito(carrito_id):
+    """Mark every session's snapshot of this cart as stale."""
+    _cache().set(_clave_version(carrito_id), time.time_ns(), None)
+
+
+def _version_catalogo():
+    from .cache_paginas import generacion
+    return generacion('catalogo')
+
+
+def snapshot_activo():
+    """Whether items_carrito may trust the session snapshot: only with a cache all processes share."""
+    activo = getattr(settings, 'CARRITO_EN_SESION', None)
+    if activo is None:
+        activo = not isinstance(_cache(), (LocMemCache, DummyCache))
+    return activo
+
+
+def carrito_id(request):
+    """The user's Carrito pk, looked up (or created) once per session."""
+    _, Carrito, _ = _modelos()
+    guardado = request.session.get(SESION_CARRITO)
+    if guardado and guardado[0] == request.user.pk:
+        return guardado[1]
+    carrito, _ = Carrito.objects.get_or_create(usuario=request.user)
+    request.session[SESION_CARRITO] = [request.user.pk, carrito.pk]
+    return carrito.pk
+
+
+def crear_indice_unico(apps_migracion, schema_editor):
+    """RunPython step: merge duplicate (carrito, producto) rows, then make the pair unique."""
+    ItemCarrito = apps_migracion.get_model('shop', 'ItemCarrito')
+    duplicados = (ItemCarrito.objects.values('carrito_id', 'producto_id')
+                  .annotate(n=Count('pk'), total=Sum('cantidad'), primero=Min('pk')).filter(n__gt=1))
+    for fila in duplicados:
+        ItemCarrito.objects.filter(pk=fila['primero']).update(cantidad=fila['total'])
+        (ItemCarrito.objects.filter(carrito_id=fila['carrito_id'], producto_id=fila['producto_id'])
+         .exclude(pk=fila['primero']).delete())
+    meta = ItemCarrito._meta
+    columnas = ', '.join(schema_editor.quote_name(meta.get_field(campo).column) for campo in ('carrito', 'producto'))
+    schema_editor.execute(f"CREATE UNIQUE INDEX {INDICE_UNICO} ON {schema_editor.quote_name(meta.db_table)} "
+                          f"({columnas})")
+    _upsert_disponible.clear()
+
+
+def borrar_indice_unico(apps_migracion, schema_editor):
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDICE_UNICO}")
+    _upsert_disponible.clear()
+
+
+def upsert_disponible(connection, ItemCarrito):
+    """Whether the backend has INSERT ... ON CONFLICT and (carrito, producto) is unique."""
+    clave = (connection.alias, connection.settings_dict['NAME'])
+    if clave not in _upsert_disponible:
+        meta = ItemCarrito._meta
+        columnas = {meta.get_field('carrito').column, meta.get_field('producto').column}
+        with connection.cursor() as cursor:
+            restricciones = connection.introspection.get_constraints(cursor, meta.db_table)
+        _upsert_disponible[clave] = connection.vendor in ('sqlite', 'postgresql') and any(
+            restriccion['unique'] and set(restriccion['columns']) == columnas
+            for restriccion in restricciones.values())
+    return _upsert_disponible[clave]
+
+
+def upsert_completo(ItemCarrito):
+    """Whether the upsert's INSERT, which sets only carrito, producto and cantidad, leaves the other columns valid."""
+    for campo in ItemCarrito._meta.concrete_fields:
+        if campo.primary_key or campo.name in ('carrito', 'producto', 'cantidad'):
+            continue
+        if getattr(campo, 'db_default', NOT_PROVIDED) is not NOT_PROVIDED:
+            continue
+        # Python defaults and auto_now(_add) are applied by the ORM, never by the database
+        if (not campo.null or campo.has_default() or getattr(campo, 'auto_now', False)
+                or getattr(campo, 'auto_now_add', False)):
+            return False
+    return True
+
+
+def _upsert(connection, Producto, ItemCarrito, carrito, producto_id, cantidad):
+    """Insert the item or add to it in one statement; 0 rows when the stock does not allow it."""
+    q = connection.ops.quote_name
+    item, producto = ItemCarrito._meta, Producto._meta
+    tabla, stock, pk = q(item.db_table), q(producto.get_field('stock').column), q(producto.pk.column)
+    a_carrito, a_producto = q(item.get_field('carrito').column), q(item.get_field('producto').column)
+    n = q(item.get_field('cantidad').column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {tabla} ({a_carrito}, {a_producto}, {n}) "
+            f"SELECT %s, {pk}, %s FROM {q(producto.db_table)} WHERE {pk} = %s AND {stock} >= %s "
+            f"ON CONFLICT ({a_carrito}, {a_producto}) DO UPDATE SET {n} = {tabla}.{n} + excluded.{n} "
+            f"WHERE {tabla}.{n} + excluded.{n} <= "
+            f"(SELECT {stock} FROM {q(producto.db_table)} WHERE {pk} = excluded.{a_producto})",
+            [carrito, cantidad, producto_id, cantidad])
+        return cursor.rowcount
+
+
+def _sumar(ItemCarrito, carrito, producto_id, cantidad):
+    return (ItemCarrito.objects
+            .filter(carrito_id=carrito, producto_id=producto_id, producto__stock__gte=F('cantidad') + cantidad)
+            .update(cantidad=F('cantidad') + cantidad))
+
+
+def _agregar_con_indice(Producto, ItemCarrito, carrito, producto_id, cantidad):
+    """With the unique index but columns the upsert cannot fill: the index stops a second first add."""
+    if _sumar(ItemCarrito, carrito, producto_id, cantidad):
+        return True
+    if not Producto.objects.filter(pk=producto_id, stock__gte=cantidad).exists():
+        return False
+    try:
+        with transaction.atomic():
+            ItemCarrito.objects.create(carrito_id=carrito, producto_id=producto_id, cantidad=cantidad)
+        return True
+    except IntegrityError:
+        # another click inserted the row first
+        return bool(_sumar(ItemCarrito, carrito, producto_id, cantidad))
+
+
+def _agregar_con_bloqueo(Producto, Carrito, ItemCarrito, carrito, producto_id, cantidad):
+    """Without the unique index: a first add takes the Carrito row lock, so two cannot both insert."""
+    if _sumar(ItemCarrito, carrito, producto_id, cantidad):
+        return True
+    with transaction.atomic():
+        list(Carrito.objects.select_for_update().filter(pk=carrito).values_list('pk'))
+        if ItemCarrito.objects.filter(carrito_id=carrito, producto_id=producto_id).exists():
+            return bool(_sumar(ItemCarrito, carrito, producto_id, cantidad))
+        if not Producto.objects.filter(pk=producto_id, stock__gte=cantidad).exists():
+            return False
+        ItemCarrito.objects.create(carrito_id=carrito, producto_id=producto_id, cantidad=cantidad)
+        return True
+
+
+def agregar_item(carrito, producto_id, cantidad):
+    """Add cantidad units of a product to the cart with pk `carrito`, never past the product's stock.
+
+    Raises CantidadNoDisponible when the stock does not allow it and ProductoInexistente for an unknown product.
+    """
+    if cantidad < 1:
+        raise ValueError('cantidad must be at least 1')
+    Producto, Carrito, ItemCarrito = _modelos()
+    connection = connections[router.db_for_write(ItemCarrito)]
+    if upsert_disponible(connection, ItemCarrito) and upsert_completo(ItemCarrito):
+        def agregar_una_vez():
+            return _upsert(connection, Producto, ItemCarrito, carrito, producto_id, cantidad)
+    elif upsert_disponible(connection, ItemCarrito):
+        def agregar_una_vez():
+            return _agregar_con_indice(Producto, ItemCarrito, carrito, producto_id, cantidad)
+    elif connection.features.has_select_for_update:
+        def agregar_una_vez():
+            return _agregar_con_bloqueo(Producto, Carrito, ItemCarrito, carrito, producto_id, cantidad)
+    else:
+        raise ImproperlyConfigured('ItemCarrito needs a unique (carrito, producto) index on this database: '
+                                   'add carrito_atomico.crear_indice_unico to a migration')
+
+    for intento in range(REINTENTOS):
+        try:
+            agregado = agregar_una_vez()
+            break
+        except OperationalError as exc:
+            # A retry is only safe outside a surrounding transaction, which the error has broken
+            if connection.in_atomic_block or intento + 1 == REINTENTOS:
+                raise CarritoOcupado() from exc
+            time.sleep(ESPERA_REINTENTO * (intento + 1))
+    if not agregado:
+        stock = Producto.objects.filter(pk=producto_id).values_list('stock', flat=True).first()
+        if stock is None:
+            raise ProductoInexistente(producto_id)
+        raise CantidadNoDisponible(producto_id, stock)
+
+
+def agregar(request, producto_id, cantidad=1):
+    carrito = carrito_id(request)
+    agregar_item(carrito, producto_id, cantidad)
+    transaction.on_commit(lambda: tocar_carrito(carrito))
+
+
+def _a_json(instancia):
+    datos = {}
+    for campo in instancia._meta.concrete_fields:
+        valor = campo.value_from_object(instancia)
+        datos[campo.attname] = None if valor is None else campo.value_to_string(instancia)
+    return datos
+
+
+def _de_json(modelo, datos):
+    campos = {campo.attname: campo for campo in modelo._meta.concrete_fields}
+    return modelo(**{nombre: None if valor is None else campos[nombre].to_python(valor)
+                     for nombre, valor in datos.items() if nombre in campos})
+
+
+def items_carrito(request):
+    """The cart's items with their products, from the session snapshot while it is current."""
+    Producto, _, ItemCarrito = _modelos()
+    carrito = carrito_id(request)
+    consulta = ItemCarrito.objects.filter(carrito_id=carrito).select_related('producto').order_by('pk')
+    if not snapshot_activo():
+        return list(consulta)
+    etiqueta = [version_carrito(carrito), _version_catalogo()]
+    guardado = request.session.get(SESION_ITEMS)
+    if guardado and guardado['etiqueta'] == etiqueta:
+        items = []
+        for datos in guardado['items']:
+            item = _de_json(ItemCarrito, datos['item'])
+            item.producto = _de_json(Producto, datos['producto'])
+            items.append(item)
+        return items
+    items = list(consulta)
+    request.session[SESION_ITEMS] = {
+        'etiqueta': etiqueta,
+        'items': [{'item': _a_json(item), 'producto': _a_json(item.producto)} for item in items],
+    }
+    return items
@@ -0,0 +1,146 @@
+"""Contention-safe checkout for the shop Django app.
+
+Call it from the checkout view:
+
+    from shop.checkout_atomico import CarritoVacio, StockInsuficiente, confirmar_pedido
+
+    try:
+        pedido = confirmar_pedido(request.user)
+    except StockInsuficiente as e:
+        messages.error(request, f'{e.producto.nombre}: cantidad no disponible')
+        return redirect('carrito')
+    except CarritoVacio:
+        return redirect('carrito')
+
+The stock check and the decrement happen in one statement per product:
+
+    UPDATE producto SET stock = stock - n WHERE id = ? AND stock >= n
+
+A product that would go negative matches no row, and the transaction
+rolls back. Two buyers therefore can never both take the last bottle, and
+no row is locked while Python decides anything. Products are updated in
+id order, so two multi-item checkouts always lock in the same order and
+cannot deadlock. The order lines are written with a single bulk_create,
+and the cart items are removed with a single DELETE. This keeps the
+transaction down to a handful of statements.
+
+Two checkouts of the same cart (a double click on "confirmar") must not
+both go through. The Carrito row is locked with select_for_update()
+before the items are read, so the second checkout waits and then finds
+the cart empty. SQLite ignores select_for_update(), so the DELETE also
+has to remove every item that was read. If it removes fewer, another
+checkout got there first, and the whole transaction rolls back with
+CarritoVacio.
+
+Order lines go into the shop model with foreign keys to both Pedido and
+Producto (the same lookup seed_data.py uses). cantidad and
+precio_unitario/precio are set on them when those fields exist, and
+Pedido.total is set when it exists. Pass any other required Pedido
+fields as keyword arguments.
+
+On SQLite, writers queue on the database lock. Set
+OPTIONS={'transaction_mode': 'IMMEDIATE', 'timeout': 20} (Django 5.1+) so
+they wait instead of failing with "database is locked".
+bench_checkout.py measures this under contention.
+"""
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F
+
+
+class CarritoVacio(Exception):
+    pass
+
+
+class StockInsuficiente(Exception):
+    def __init__(self, producto):
+        super().__init__(f'stock insuficiente para {producto}')
+        self.producto = producto
+
+
+def _modelos():
+    shop = apps.get_app_config('shop')
+    return (shop.get_model('Producto'), shop.get_model('ItemCarrito'), shop.get_model('Pedido'))
+
+
+def _relacion(modelo, destino):
+    for campo in modelo._meta.concrete_fields:
+        if campo.is_relation and campo.related_model is destino:
+            return campo.name
+    return None
+
+
+def linea_pedido(Pedido, Producto):
+    """The shop model with foreign keys to both Pedido and Producto, or None."""
+    for modelo in apps.get_app_config('shop').get_models():
+        if _relacion(modelo, Pedido) and _relacion(modelo, Producto):
+            return modelo
+    return None
+
+
+def _campo(modelo, *nombres):
+    existentes = {campo.name for campo in modelo._meta.concrete_fields}
+    return next((nombre for nombre in nombres if nombre in existentes), None)
+
+
+def confirmar_pedido(usuario, **campos_pedido):
+    """Turn the user's cart into a Pedido, or raise without changing anything."""
+    Producto, ItemCarrito, Pedido = _modelos()
+    Linea = linea_pedido(Pedido, Producto)
+    Carrito = ItemCarrito._meta.get_field('carrito').related_model
+    with transaction.atomic():
+        # A second checkout of the same cart (a double click) waits here and then finds it empty
+        list(Carrito.objects.select_for_update().filter(usuario=usuario).values_list('pk'))
+        items = list(ItemCarrito.objects.filter(carrito__usuario=usuario)
+                     .select_related('producto').order_by('producto_id'))
+        if not items:
+            raise CarritoVacio()
+        for item in items:
+            vendidos = (Producto.objects.filter(pk=item.producto_id, stock__gte=item.cantidad)
+                        .update(stock=F('stock') - item.cantidad))
+            if not vendidos:
+                raise StockInsuficiente(item.producto)
+
+        if _campo(Pedido, 'total') and 'total' not in campos_pedido:
+            campos_pedido['total'] = sum(item.producto.precio * item.cantidad for item in items)
+        pedido = Pedido.objects.create(usuario=usuario, **campos_pedido)
+
+        if Linea is not None:
+            a_pedido, a_producto = _relacion(Linea, Pedido), _relacion(Linea, Producto)
+            cantidad = _campo(Linea, 'cantidad')
+            precio = _campo(Linea, 'precio_unitario', 'precio')
+            lineas = []
+            for item in items:
+                campos = {a_pedido: pedido, a_producto: item.producto}
+                if cantidad:
+                    campos[cantidad] = item.cantidad
+                if precio:
+                    campos[precio] = item.producto.precio
+                lineas.append(Linea(**campos))
+            Linea.objects.bulk_create(lineas)
+
+        _, borrados = ItemCarrito.objects.filter(pk__in=[item.pk for item in items]).delete()
+        if borrados.get(ItemCarrito._meta.label, 0) != len(items):
+            # select_for_update() is a no-op on SQLite: another checkout got these items first
+            raise CarritoVacio()
+        # queryset.update() skips post_save, so cached pages are told directly
+        transaction.on_commit(lambda: _invalidar_paginas([item.producto_id for item in items]))
+        transaction.on_commit(lambda: _invalidar_carrito(items[0].carrito_id))
+    return pedido
+
+
+def _invalidar_paginas(pks):
+    try:
+        from .cache_paginas import invalidar_producto
+    except ImportError:
+        return
+    for pk in pks:
+        invalidar_producto(pk)
+
+
+def _invalidar_carrito(carrito_id):
+    try:
+        from .carrito_atomico import tocar_carrito
+    except ImportError:
+        return
+    tocar_carrito(carrito_id)
@@ -0,0 +1,96 @@
+"""Server-Timing middleware for the shop Django app.
+
+Add it at the top of MIDDLEWARE:
+
+    MIDDLEWARE = ['shop.server_timing.ServerTimingMiddleware', ...]
+
+Every response then carries a header such as
+
+    Server-Timing: db;dur=12.4;desc="7 queries", db_queries;dur=7, template;dur=3.1, view;dur=5.2, total;dur=20.7
+
+which prueba_carga.py aggregates per endpoint next to the client latency.
+db_queries is a count, sent through dur so any Server-Timing parser keeps it.
+Queries run while a template renders, such as lazy querysets evaluated in
+a {% for %}, count towards db only, so db + template + view adds up to total.
+"""
+import contextvars
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from django.template.backends.django import Template
+
+_timer = contextvars.ContextVar('server_timing_timer', default=None)
+_render_depth = contextvars.ContextVar('server_timing_render_depth', default=0)
+
+
+class QueryTimer:
+    """execute_wrapper that counts queries and adds up their time.
+
+    The Template.render patch adds rendering time, less the queries it ran, to template_ms.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.ms = 0.0
+        self.template_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.ms += (time.perf_counter() - start) * 1000
+            self.count += 1
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        timer = _timer.get()
+        depth = _render_depth.get()
+        # only the outermost render is timed, so includes and nested
+        # render_to_string calls are not counted twice
+        if timer is None or depth:
+            return render(self, *args, **kwargs)
+        token = _render_depth.set(depth + 1)
+        db_ms = timer.ms
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timer.template_ms += (time.perf_counter() - start) * 1000 - (timer.ms - db_ms)
+            _render_depth.reset(token)
+    wrapper.server_timing = True
+    return wrapper
+
+
+if not getattr(Template.render, 'server_timing', False):
+    Template.render = _timed_render(Template.render)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryTimer()
+        token = _timer.set(queries)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(queries))
+                response = self.get_response(request)
+        finally:
+            _timer.reset(token)
+        total = (time.perf_counter() - start) * 1000
+        template = max(queries.template_ms, 0)
+        view = max(total - queries.ms - template, 0)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={queries.ms:.1f};desc="{queries.count} queries"',
+            f'db_queries;dur={queries.count}',
+            f'template;dur={template:.1f}',
+            f'view;dur={view:.1f}',
+            f'total;dur={total:.1f}',
+        ])
+        return response